@@ -0,0 +1,4 @@
+from autoformai.cli import service_main as main
+
+if __name__ == "__main__":
+    main()
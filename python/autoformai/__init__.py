@@ -0,0 +1 @@
+"""Shared building blocks for the AutoFormAI command line scripts."""
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+def form_fingerprint(form):
+    """Hash of the parsed form; any change to questions or options gives a new one."""
+    text = json.dumps(form.to_dict(), ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def answer_cache_key(form, generator, compact):
+    """The form hash an AnswerCache is keyed by: the form plus what shapes its answers.
+
+    A hybrid run caches the model's free-text answers only, and compact runs
+    ask with another encoding, so neither may hand its answers to an llm run.
+    """
+    text = f"{form_fingerprint(form)}|{generator}|{'compact' if compact else 'verbose'}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """Persistent ``(form hash, seed, slot, temperature) -> answers`` store in SQLite.
+
+    ``seed`` is the variation seed of an API call and ``slot`` the position of
+    an answer set within that call, so a rerun with the same form, seed and
+    temperature gets the same answers back without calling the model. Safe to
+    share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " form TEXT NOT NULL, seed INTEGER NOT NULL, slot INTEGER NOT NULL, temperature REAL NOT NULL,"
+            " answers TEXT NOT NULL, PRIMARY KEY (form, seed, slot, temperature))"
+        )
+        self._db.commit()
+
+    def get(self, form_hash, seed, slot, temperature):
+        """Cached answers, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answers FROM answers WHERE form=? AND seed=? AND slot=? AND temperature=?",
+                (form_hash, seed, slot, temperature),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, form_hash, temperature, entries):
+        """Store ``(seed, slot, answers)`` entries in one transaction."""
+        rows = [
+            (form_hash, seed, slot, temperature, json.dumps(answers, ensure_ascii=False))
+            for seed, slot, answers in entries
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
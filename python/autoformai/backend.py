@@ -0,0 +1,279 @@
+import importlib.util
+from collections import namedtuple
+
+from .retry import FATAL, RETRYABLE_KINDS, classify_error
+
+
+def _installed(module_name):
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except ImportError:
+        return False
+
+
+# 新版 Client API 是否已安裝；SDK本身要到建立backend時才載入（各需約0.5秒）
+HAVE_CLIENT_API = _installed('google.genai')
+
+
+# 舊版 google.generativeai 的預設生成設定
+LEGACY_GENERATION_CONFIG = {
+    "temperature": 0.9,
+    "top_p": 1,
+    "top_k": 1,
+    "max_output_tokens": 2048,
+}
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+]
+
+
+# 每次呼叫的token用量（來自回應的usage_metadata）
+Usage = namedtuple('Usage', ['prompt_tokens', 'cached_tokens', 'output_tokens'])
+Usage.__doc__ = "Token counts reported by the API for one call; ``cached_tokens`` is the part of the prompt served from a context cache."
+
+# 快取內容的存活時間（秒）
+PROMPT_CACHE_TTL = 3600
+
+
+# 舊版API的Schema不支援的欄位
+LEGACY_UNSUPPORTED_SCHEMA_KEYS = ('minimum', 'maximum', 'property_ordering')
+
+
+def _legacy_schema(schema):
+    """Drop schema keys the legacy ``google.generativeai`` Schema proto does not have."""
+    if isinstance(schema, dict):
+        return {key: _legacy_schema(value) for key, value in schema.items() if key not in LEGACY_UNSUPPORTED_SCHEMA_KEYS}
+    if isinstance(schema, list):
+        return [_legacy_schema(value) for value in schema]
+    return schema
+
+
+def _usage(response):
+    metadata = getattr(response, 'usage_metadata', None)
+    if metadata is None:
+        return None
+    return Usage(
+        getattr(metadata, 'prompt_token_count', None) or 0,
+        getattr(metadata, 'cached_content_token_count', None) or 0,
+        getattr(metadata, 'candidates_token_count', None) or 0,
+    )
+
+
+class GenerationError(Exception):
+    """The model call failed.
+
+    ``kind`` classifies the cause (see ``retry.classify_error``) and
+    ``retry_after`` holds the server's retry hint in seconds, if any.
+    """
+
+    def __init__(self, message, kind=FATAL, retry_after=None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.kind in RETRYABLE_KINDS
+
+
+class EmptyResponseError(GenerationError):
+    """The model call succeeded but returned no text."""
+
+
+class StreamAbortedError(GenerationError):
+    """A streamed reply was cancelled part-way because it could no longer be used.
+
+    ``usage`` holds the token counts reported up to the cancellation, if any.
+    """
+
+    def __init__(self, message, usage=None):
+        super().__init__(message)
+        self.usage = usage
+
+
+def _chunk_text(chunk):
+    # The legacy SDK raises instead of returning None for chunks without text
+    try:
+        return chunk.text
+    except ValueError:
+        return None
+
+
+class GeminiBackend:
+    """Gemini model handle created once per run and shared by every request.
+
+    The client (new ``google.genai`` API) or the configured ``GenerativeModel``
+    (legacy ``google.generativeai`` API) is built in the constructor, so all
+    requests reuse the same pooled connection; the SDK is imported there too,
+    so runs that never call the model do not pay for it. Safe to share
+    between threads.
+    """
+
+    def __init__(self, api_key, model_name):
+        self.model_name = model_name
+        self._client = None
+        self._types = None
+        self._model = None
+        if HAVE_CLIENT_API:
+            # Use new google.genai Client API
+            from google import genai as genai_client
+            self._client = genai_client.Client(api_key=api_key)
+            self._types = genai_client.types
+        else:
+            # Fallback to old google.generativeai API
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            self._model = genai.GenerativeModel(
+                model_name=model_name,
+                generation_config=LEGACY_GENERATION_CONFIG,
+                safety_settings=SAFETY_SETTINGS
+            )
+
+    def generate(self, prompt, config=None):
+        """Send ``prompt`` (a list of text parts) and return the reply text.
+
+        ``config`` holds generation settings such as ``temperature`` and
+        ``max_output_tokens``; unset keys keep each API's defaults.
+        """
+        return self.generate_with_usage(prompt, config)[0]
+
+    def generate_with_usage(self, prompt, config=None):
+        """Like :meth:`generate`, but return ``(text, usage)``; ``usage`` is a Usage or None.
+
+        ``config["cached_content"]`` names a cache made by :meth:`create_cache`;
+        its contents are sent ahead of ``prompt`` without being re-uploaded.
+        ``config["response_schema"]`` is a schema dict (see
+        ``response_schema.form_response_schema``); bounds and property order
+        are dropped for the legacy API, which cannot express them.
+        """
+        config = config or {}
+        try:
+            if self._client is not None:
+                response = self._client.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=self._types.GenerateContentConfig(**config) if config else None
+                )
+            else:
+                if 'response_schema' in config:
+                    config = dict(config, response_schema=_legacy_schema(config['response_schema']))
+                response = self._model.generate_content(
+                    prompt,
+                    generation_config=dict(LEGACY_GENERATION_CONFIG, **config)
+                )
+            response_text = response.text
+        except Exception as e:
+            kind, retry_after = classify_error(e)
+            raise GenerationError(f"Error generating content with model '{self.model_name}': {e}",
+                                  kind, retry_after) from e
+
+        if not response_text:
+            raise EmptyResponseError("No text returned from model response.")
+        return response_text, _usage(response)
+
+    def generate_stream(self, prompt, config=None, on_text=None):
+        """Like :meth:`generate_with_usage`, but stream the reply and return ``(text, usage)``.
+
+        ``on_text`` is called with each chunk of text as it arrives; if it
+        raises ValueError the stream is closed at once, so the model stops
+        generating, and StreamAbortedError is raised with its message.
+        """
+        config = config or {}
+        chunks = []
+        usage = None
+        stream = None
+        problem = None
+        try:
+            if self._client is not None:
+                stream = self._client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=self._types.GenerateContentConfig(**config) if config else None
+                )
+            else:
+                if 'response_schema' in config:
+                    config = dict(config, response_schema=_legacy_schema(config['response_schema']))
+                stream = self._model.generate_content(
+                    prompt,
+                    generation_config=dict(LEGACY_GENERATION_CONFIG, **config),
+                    stream=True
+                )
+            for chunk in stream:
+                usage = _usage(chunk) or usage
+                text = _chunk_text(chunk)
+                if not text:
+                    continue
+                chunks.append(text)
+                if on_text is not None:
+                    try:
+                        on_text(text)
+                    except ValueError as e:
+                        problem = e
+                        break
+        except Exception as e:
+            kind, retry_after = classify_error(e)
+            raise GenerationError(f"Error generating content with model '{self.model_name}': {e}",
+                                  kind, retry_after) from e
+        finally:
+            if problem is not None and hasattr(stream, 'close'):
+                # Closing the generator drops the HTTP response, which cancels the generation
+                stream.close()
+
+        if problem is not None:
+            raise StreamAbortedError(f"Reply abandoned after {sum(map(len, chunks))} characters: {problem}",
+                                     usage) from problem
+        if not chunks:
+            raise EmptyResponseError("No text returned from model response.")
+        return ''.join(chunks), usage
+
+    def count_tokens(self, prompt):
+        """Input tokens of ``prompt`` as counted by the API, or None if it cannot be counted."""
+        try:
+            if self._client is not None:
+                return self._client.models.count_tokens(model=self.model_name, contents=prompt).total_tokens
+            return self._model.count_tokens(prompt).total_tokens
+        except Exception:
+            return None
+
+    def create_cache(self, prompt, ttl=PROMPT_CACHE_TTL):
+        """Upload the static ``prompt`` prefix once as a context cache and return its name.
+
+        Returns None when caching is unavailable: the legacy API, models without
+        caching support or a prefix below the model's minimum cacheable size.
+        Callers then keep sending the prefix with every request.
+        """
+        if self._client is None:
+            return None
+        try:
+            cache = self._client.caches.create(
+                model=self.model_name,
+                config=self._types.CreateCachedContentConfig(contents=prompt, ttl=f"{int(ttl)}s"),
+            )
+        except Exception:
+            return None
+        return cache.name
+
+    def delete_cache(self, name):
+        """Drop a cache made by :meth:`create_cache`; it would expire on its own after the TTL."""
+        if self._client is None or not name:
+            return
+        try:
+            self._client.caches.delete(name=name)
+        except Exception:
+            pass
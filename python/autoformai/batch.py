@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from itertools import islice
+
+
+def chunked(iterable, size):
+    """Yield lists of ``size`` consecutive items of ``iterable`` (the last one may be shorter)."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# 每個階段的輸入佇列可容納的工作單位數（每個worker）
+QUEUE_PER_WORKER = 2
+# 停止時等待佇列的輪詢間隔（秒）
+_POLL = 0.1
+# 停止後最多等待工作執行緒的秒數；仍卡在API呼叫裡的（daemon）執行緒就不等了
+JOIN_TIMEOUT = 2.0
+
+Stage = namedtuple('Stage', ['name', 'task', 'workers'])
+Stage.__doc__ = """One pipeline stage: ``task(payload)`` run by ``workers`` threads."""
+
+
+class StageStats:
+    """Counters of one pipeline stage.
+
+    ``busy`` is the time its workers spent in the task, ``idle`` the time
+    they waited for input and ``blocked`` the time a finished item waited
+    for room in the next stage's queue (backpressure). ``worker_seconds`` is
+    the wall time of the run times the worker count.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.units = 0
+        self.responses = 0
+        self.busy = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self.worker_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, units=0, responses=0, busy=0.0, idle=0.0, blocked=0.0):
+        with self._lock:
+            self.units += units
+            self.responses += responses
+            self.busy += busy
+            self.idle += idle
+            self.blocked += blocked
+
+
+def run_staged(source, stages, window, size=None, stats=None, sink='sink', stop=None):
+    """Pass every item of ``source`` through ``stages`` and yield ``(item, result, error)`` in source order.
+
+    Each stage runs its task on its own worker threads and hands the result
+    to the next stage through a queue holding QUEUE_PER_WORKER items per
+    worker of that stage; a stage that finds the queue full waits, so a slow
+    stage holds back the ones before it. At most ``window`` items are
+    between ``source`` and the consumer at once, counting items that
+    finished out of order and wait for an earlier one, so memory stays flat
+    however long ``source`` is. The consumer's loop is the last, single
+    threaded stage (named ``sink``). ``error`` is the first exception a stage
+    raised for the item; later stages skip it. When ``stats`` (a dict) is
+    given it receives a StageStats per stage name, ``size(item)`` giving the
+    responses an item stands for. ``stop`` (a threading.Event, made here
+    when None) is set once the consumer stops; tasks that wait, such as a
+    retry backoff, should give up when it is set.
+    """
+    size = size or (lambda item: 1)
+    stats = stats if stats is not None else {}
+    for stage in stages:
+        stats[stage.name] = StageStats(stage.workers)
+    stats[sink] = StageStats(1)
+    started = time.perf_counter()
+    stop = stop if stop is not None else threading.Event()
+    slots = threading.Semaphore(max(1, window))
+    queues = [queue.Queue(QUEUE_PER_WORKER * stage.workers) for stage in stages]
+    results = queue.Queue()
+    outlets = queues[1:] + [results]
+    # Workers still running per stage; the last one out tells the next stage
+    running = [stage.workers for stage in stages]
+    running_lock = threading.Lock()
+    source_error = []
+
+    def put(target, message):
+        while not stop.is_set():
+            try:
+                target.put(message, timeout=_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(inlet):
+        while not stop.is_set():
+            try:
+                return inlet.get(timeout=_POLL)
+            except queue.Empty:
+                pass
+        return None
+
+    def feed():
+        try:
+            for sequence, item in enumerate(source):
+                while not slots.acquire(timeout=_POLL):
+                    if stop.is_set():
+                        return
+                if not put(queues[0], (sequence, item, item, None)):
+                    return
+        except Exception as e:
+            source_error.append(e)
+        finally:
+            for _ in range(stages[0].workers):
+                put(queues[0], None)
+
+    def work(number):
+        stage = stages[number]
+        counters = stats[stage.name]
+        inlet, outlet = queues[number], outlets[number]
+        while True:
+            waited = time.perf_counter()
+            message = get(inlet)
+            if message is None:
+                break
+            sequence, item, payload, error = message
+            begun = time.perf_counter()
+            if error is None:
+                try:
+                    payload = stage.task(payload)
+                except Exception as e:
+                    payload, error = None, e
+            finished = time.perf_counter()
+            if not put(outlet, (sequence, item, payload, error)):
+                break
+            counters.add(1, size(item), finished - begun, begun - waited, time.perf_counter() - finished)
+        with running_lock:
+            running[number] -= 1
+            last = running[number] == 0
+        if last:
+            for _ in range(stages[number + 1].workers if number + 1 < len(stages) else 1):
+                put(outlet, None)
+
+    threads = [threading.Thread(target=feed, daemon=True, name='stage-feed')]
+    for number, stage in enumerate(stages):
+        threads += [threading.Thread(target=work, args=(number,), daemon=True, name=f'stage-{stage.name}')
+                    for _ in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+
+    counters = stats[sink]
+    finished = {}
+    next_sequence = 0
+    try:
+        while True:
+            waited = time.perf_counter()
+            while next_sequence not in finished:
+                message = results.get()
+                if message is None:
+                    break
+                finished[message[0]] = message[1:]
+            if next_sequence not in finished:
+                break
+            item, payload, error = finished.pop(next_sequence)
+            next_sequence += 1
+            begun = time.perf_counter()
+            yield item, payload, error
+            slots.release()
+            counters.add(1, size(item), time.perf_counter() - begun, begun - waited)
+        if source_error:
+            raise source_error[0]
+    finally:
+        # Drop queued work on Ctrl-C or when the consumer stops early. Tasks see ``stop`` and
+        # give up their waits; one still inside a call is a daemon thread and is left behind
+        stop.set()
+        deadline = time.monotonic() + JOIN_TIMEOUT
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        elapsed = time.perf_counter() - started
+        for stage_stats in stats.values():
+            stage_stats.worker_seconds += elapsed * stage_stats.workers
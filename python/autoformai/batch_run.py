@@ -0,0 +1,849 @@
+import math
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+from functools import partial
+from itertools import groupby
+
+from .answer_cache import AnswerCache, answer_cache_key
+from .backend import GenerationError, StreamAbortedError
+from .batch import Stage, chunked, run_staged
+from .compact import COMPACT_INSTRUCTIONS, compact_form_string, decode_answers
+from .dedup import AnswerIndex
+from .distributions import load_spec, missing_text
+from .form import objects_to_string, set_answer
+from .form_cache import DEFAULT_TTL
+from .hedge import HedgeCancelled, Hedger
+from .metrics import CallTimer, Metrics
+from .local_gen import LocalAnswerGenerator, merge_answers, text_only_form
+from .output import OUTPUT_FORMATS, ResultWriter, format_record, read_completed, read_records
+from .pool import KEYS_ENV
+from .prefill import PrefillTemplate
+from .ratelimit import estimate_tokens
+from .reply import extract_json_from_response
+from .response_schema import STRUCTURED_INSTRUCTION, form_response_schema, structured_to_answers
+from .retry import RetryPolicy, call_with_retry
+from .stream_check import ReplyChecker
+from .validate import describe_problems, repair_answers, validate_answers
+
+# 設定提示詞
+PROMPT_PARTS = [
+    "You are a form-filling assistant. Fill out the following form questions with realistic, reasonable answers.",
+    "IMPORTANT: Create DIVERSE responses. Vary your choices across ALL questions.",
+    "Instructions:",
+    "- For multiple choice questions, RANDOMLY select ONE option - distribute choices evenly across all options",
+    "- For linear scale questions (1-10), vary between 1-10, don't cluster around middle values",
+    "- For short answer questions, provide varied numeric responses (e.g., '2', '7', '15', '25', '40' for different responses)",
+    "- Answer ALL questions in order",
+    "- Return answers as a JSON array in the EXACT same order as the questions",
+    "- Use empty string \"\" only if a question is optional and you cannot provide an answer",
+    "- Do NOT use null or None - use actual values",
+    "- For date format use: {\"year\": YYYY, \"month\": MM, \"day\": DD}",
+    "- For time format use: {\"hour\": HH, \"minute\": MM}",
+    "",
+    "CRITICAL: Make each response UNIQUE and DIFFERENT. Spread answers across the full range of options.",
+    "Example diverse responses:",
+    "- Scale 1-10: Response 1=\"3\", Response 2=\"7\", Response 3=\"9\", Response 4=\"2\", Response 5=\"8\"",
+    "- Hours: Response 1=\"5\", Response 2=\"20\", Response 3=\"35\", Response 4=\"10\", Response 5=\"50\"",
+    "- Choice [A,B,C,D]: Distribute evenly - don't favor any option",
+]
+
+# 每次回答預估的輸出token數（用於TPM限流）
+ESTIMATED_OUTPUT_TOKENS = 512
+
+GENERATORS = ('llm', 'local', 'hybrid', 'population')
+# interactive：逐次呼叫API；bulk：整批送進Gemini Batch API，完成後再取回
+MODES = ('interactive', 'bulk')
+# 純本地產生時每個工作單位包含的回答數
+LOCAL_CHUNK = 1000
+
+# 靜態前綴已放進context cache時，每次請求只送這一段
+CACHED_PROMPT_PART = "Answer the form above as instructed."
+
+
+def generate_response(backend, prompt_parts, temperature=0.9, variation_seed=0, max_output_tokens=None,
+                      cached_content=None, response_schema=None, on_text=None):
+    """Generate a single form response using the shared model backend; returns (text, usage).
+
+    With ``on_text`` the reply is streamed and each chunk passed to it (see
+    ``GeminiBackend.generate_stream``).
+    """
+    varied_prompt = vary_prompt(prompt_parts, variation_seed)
+    config = generation_config(temperature, max_output_tokens, cached_content, response_schema)
+    if on_text is not None:
+        return backend.generate_stream(varied_prompt, config, on_text)
+    return backend.generate_with_usage(varied_prompt, config)
+
+
+def vary_prompt(prompt_parts, variation_seed=0):
+    """``prompt_parts`` with the variation instruction for ``variation_seed`` in front."""
+    varied_prompt = prompt_parts.copy()
+    if variation_seed > 0:
+        varied_prompt.insert(0, f"Response variation #{variation_seed}: Give unique, different answers from previous responses.")
+    return varied_prompt
+
+
+def generation_config(temperature=0.9, max_output_tokens=None, cached_content=None, response_schema=None):
+    """Generation settings of one call, in the SDK's (snake_case) keys."""
+    config = {"temperature": temperature}
+    if max_output_tokens:
+        config["max_output_tokens"] = max_output_tokens
+    if cached_content:
+        config["cached_content"] = cached_content
+    if response_schema:
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = response_schema
+    return config
+
+
+def form_prompt(form, compact=False, structured=False):
+    """Static prompt prefix for ``form``: instructions plus the encoded questions."""
+    if compact:
+        parts = COMPACT_INSTRUCTIONS + [compact_form_string(form)]
+    else:
+        parts = PROMPT_PARTS + [objects_to_string(form) + "\n用陣列JSON格式回答所有問題"]
+    if structured:
+        parts.append(STRUCTURED_INSTRUCTION)
+    return parts
+
+
+def multi_response_instruction(count):
+    """Prompt suffix asking for several independent answer sets in one call."""
+    return (
+        f"Generate {count} DIFFERENT responses in this single reply. "
+        f"Return a JSON array containing exactly {count} answer sets, "
+        "each one answering ALL questions in order as described above."
+    )
+
+
+def split_answer_sets(parsed_data, count):
+    """Split a parsed model reply into ``count`` ``(answers, error)`` pairs.
+
+    With ``count == 1`` the reply is a single answer array; otherwise it must be
+    an array of answer arrays. Each set is validated on its own later, so one
+    malformed set does not discard the others.
+    """
+    if count == 1:
+        answer_sets = [parsed_data]
+    elif isinstance(parsed_data, list):
+        answer_sets = parsed_data[:count]
+    else:
+        raise ValueError(f"expected a JSON array of {count} answer arrays")
+
+    results = [(answers, None) for answers in answer_sets]
+    while len(results) < count:
+        results.append((None, ValueError(f"model returned only {len(answer_sets)} of {count} answer sets")))
+    return results
+
+
+def usable_reply(response_text, count=None):
+    """Whether a reply parses and, given ``count``, holds at least one of that many answer sets."""
+    try:
+        parsed_data = extract_json_from_response(response_text)
+        return count is None or any(error is None for _, error in split_answer_sets(parsed_data, count))
+    except ValueError:
+        return False
+
+
+def report_prompt_tokens(backend, form, compact, structured=False, log=print, count_tokens=False):
+    """Print the per-call prompt size of the verbose and compact encodings.
+
+    Sizes are local estimates (marked with ``~``); with ``count_tokens`` the
+    API's token counter is asked instead, which costs two requests.
+    """
+    sizes = []
+    for label, is_compact in (("verbose", False), ("compact", True)):
+        parts = form_prompt(form, is_compact, structured)
+        count = backend.count_tokens(parts) if count_tokens else None
+        size = f"{count}" if count is not None else f"~{estimate_tokens(parts)}"
+        sizes.append(f"{label} {size}" + (" (in use)" if is_compact == compact else ""))
+    log("Prompt tokens per call: " + ", ".join(sizes))
+
+
+class BatchSetupError(Exception):
+    """The batch cannot start (bad distributions file, missing API key...)."""
+
+
+BatchResult = namedtuple('BatchResult', ['succeeded', 'failed', 'pending', 'done', 'preview', 'stats', 'population', 'metrics'])
+BatchResult.__doc__ = """Outcome of one form's batch: counts, the first URLs, the run counters and timings."""
+
+
+def add_batch_arguments(parser):
+    """Register the batch options on ``parser``; shared by ai_batch_form.py and the jobs runner."""
+    parser.add_argument('--model-name', dest='model_name',
+                        help='Generative model name; a comma-separated list pools every key with every model',
+                        required=False, default=os.getenv('MODEL_NAME', 'gemini-2.0-flash-exp'))
+    parser.add_argument('--batch', type=int, default=1, help='Number of responses to generate (default: 1)')
+    parser.add_argument('--mode', choices=MODES, default='interactive',
+                        help='interactive: one API call per work unit; bulk: submit every prompt as one '
+                             'Gemini Batch API job and collect the results when it finishes (default: interactive)')
+    parser.add_argument('--poll-interval', dest='poll_interval', type=float, default=30,
+                        help='Seconds between status checks of a --mode bulk job (default: 30)')
+    parser.add_argument('--output', dest='output_file', default=None,
+                        help='Output file, written as each response completes (default: responses.txt, '
+                             'responses.jsonl with --format jsonl)')
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='txt',
+                        help='txt: one URL per line; jsonl: index, seed, answers and URL per line, '
+                             'needed by --resume (default: txt)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Keep the responses already in the --output file and generate only the missing ones '
+                             '(needs --format jsonl)')
+    parser.add_argument('--generator', choices=GENERATORS, default='llm',
+                        help='llm: the model answers everything; local: sample every answer locally, no API calls; '
+                             'hybrid: sample choice/scale/grid/date answers locally, the model writes free text only; '
+                             'population: vectorised NumPy sampling with target marginals and correlations (default: llm)')
+    parser.add_argument('--distributions', default=None,
+                        help='JSON file with per-question answer distributions for local/hybrid/population generation')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for local sampling; the same seed and index give the same answers (default: 0)')
+    parser.add_argument('--per-call', dest='per_call', type=int, default=1,
+                        help='Answer sets requested per API call (default: 1)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Number of requests in flight at once (default: 4)')
+    parser.add_argument('--validator-workers', dest='validator_workers', type=int, default=2,
+                        help='Threads validating and de-duplicating answers (their re-asks call the model) (default: 2)')
+    parser.add_argument('--renderer-workers', dest='renderer_workers', type=int, default=1,
+                        help='Threads building pre-filled URLs (default: 1)')
+    parser.add_argument('--max-in-flight', dest='max_in_flight', type=int, default=0,
+                        help='Work units between the answer source and the output file at once; caps memory '
+                             '(default: 0, two per source/validator/renderer thread)')
+    parser.add_argument('--rpm', type=float, default=None,
+                        help='Requests per minute allowed by your quota (default: 15, free tier)')
+    parser.add_argument('--tpm', type=float, default=1000000,
+                        help='Tokens per minute allowed by your quota, 0 to disable (default: 1000000)')
+    parser.add_argument('--rpd', type=int, default=None,
+                        help='Requests per day allowed per key/model; a provider that reaches it is retired for the run')
+    parser.add_argument('--providers', default=None,
+                        help=f'JSON file listing API keys/models with their own rpm/tpm/rpd budgets '
+                             f'(default: {KEYS_ENV} or GEMINI_API_KEY with --model-name)')
+    parser.add_argument('--delay', type=float, default=None,
+                        help='Deprecated: fixed delay between requests; converted to --rpm 60/DELAY, 0 for no pacing')
+    parser.add_argument('--compact', action='store_true',
+                        help='Send a compact form encoding (options answered by index, decoded locally) to cut prompt tokens')
+    parser.add_argument('--count-prompt-tokens', dest='count_prompt_tokens', action='store_true',
+                        help='Count the prompt sizes printed at start-up with the API (two extra requests) '
+                             'instead of estimating them locally')
+    parser.add_argument('--no-prompt-cache', dest='no_prompt_cache', action='store_true',
+                        help='Do not upload the static instructions/form prefix as a Gemini context cache')
+    parser.add_argument('--no-schema', dest='no_schema', action='store_true',
+                        help='Do not constrain replies with a JSON response schema built from the form')
+    parser.add_argument('--retries', type=int, default=4,
+                        help='Retries per API call on rate-limit (429), 5xx and network errors, with backoff (default: 4)')
+    parser.add_argument('--dedup-attempts', dest='dedup_attempts', type=int, default=2,
+                        help='Times to regenerate an answer set that repeats an earlier one; 0 keeps repeats (default: 2)')
+    parser.add_argument('--dedup-distance', dest='dedup_distance', type=int, default=0,
+                        help='Also treat sets differing in at most N choice/scale/grid answers as repeats (default: 0, exact only)')
+    parser.add_argument('--answer-cache', dest='answer_cache', default=None,
+                        help='SQLite file caching answers by (form, seed, temperature); reruns reuse them without API calls')
+    parser.add_argument('--metrics', default=None,
+                        help='JSONL file of per-call stage timings and token counts, ending with a p50/p95/p99 summary')
+    parser.add_argument('--prometheus', default=None,
+                        help='Write the run summary to this file in Prometheus textfile format')
+    parser.add_argument('--repair-attempts', dest='repair_attempts', type=int, default=1,
+                        help='Times to re-ask the model about answers that cannot be fixed locally (default: 1)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream replies and check them as they arrive, cancelling a reply as soon as it '
+                             'cannot be used (with --repair-attempts 0, also at its first invalid answer)')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Send a second copy of a request that is slower than most, keep the first usable '
+                             'reply and cancel the other (replies are then streamed)')
+    parser.add_argument('--hedge-percentile', dest='hedge_percentile', type=float, default=95,
+                        help='Percentile of recent request latencies after which a request is copied (default: 95)')
+    parser.add_argument('--hedge-budget', dest='hedge_budget', type=float, default=0.05,
+                        help='Most copies sent, as a fraction of requests (default: 0.05)')
+    parser.add_argument('--temperature', type=float, default=1.8, 
+                        help='AI temperature for randomness 0.0-2.0 (default: 1.8 for maximum variation)')
+    add_form_cache_arguments(parser)
+
+
+def add_form_cache_arguments(parser):
+    """Register the form cache options (also used by ai_form.py)."""
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true',
+                        help='Always download the form and do not touch the local form cache')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-download the form even if the cached copy is still fresh')
+    parser.add_argument('--cache-ttl', dest='cache_ttl', type=float, default=DEFAULT_TTL,
+                        help=f'Seconds a cached form is used without revalidation (default: {DEFAULT_TTL})')
+
+
+def batch_argument_error(args):
+    """Why the batch options cannot be used together, or None."""
+    if args.rpm <= 0 or args.concurrency < 1 or args.per_call < 1:
+        return "--rpm, --concurrency and --per-call must be positive"
+    if args.retries < 0 or args.dedup_attempts < 0 or args.dedup_distance < 0:
+        return "--retries, --dedup-attempts and --dedup-distance cannot be negative"
+    if args.validator_workers < 1 or args.renderer_workers < 1 or args.max_in_flight < 0:
+        return "--validator-workers and --renderer-workers must be positive, --max-in-flight cannot be negative"
+    if args.resume and args.output_format != 'jsonl':
+        return "--resume needs --format jsonl"
+    if args.mode == 'bulk' and (args.generator != 'llm' or args.stream or args.hedge):
+        return "--mode bulk works with --generator llm only, without --stream or --hedge"
+    if not 0 < args.hedge_percentile < 100 or not 0 <= args.hedge_budget <= 1:
+        return "--hedge-percentile must be between 0 and 100, --hedge-budget between 0 and 1"
+    if args.poll_interval <= 0:
+        return "--poll-interval must be positive"
+    return None
+
+
+def check_batch_arguments(parser, args):
+    """Validate the batch options in place; ``--delay`` is folded into ``args.rpm``."""
+    if args.output_file is None:
+        args.output_file = f"responses.{args.output_format}"
+    if args.delay is not None and args.delay < 0:
+        parser.error("--delay cannot be negative")
+    if args.rpm is None:
+        if args.delay is None:
+            args.rpm = 15.0
+        else:
+            # --delay 0 meant no pause between requests: an unpaced limiter
+            args.rpm = 60.0 / args.delay if args.delay else math.inf
+    problem = batch_argument_error(args)
+    if problem:
+        parser.error(problem)
+
+
+def needs_model(args):
+    """True when the chosen generator calls the model (and so needs an API key)."""
+    return args.generator not in ('local', 'population')
+
+
+def run_batch(form, target_url, args, pool=None, log=print, progress=None, metrics=None, label=None,
+              bulk_client=None):
+    """Generate ``args.batch`` responses for ``form`` and write them to ``args.output_file``.
+
+    ``pool`` is the ProviderPool used for model calls (it may be shared with
+    other forms); ``log`` receives every status line. ``progress``, when
+    given, is called with the error (or None) of each response instead of
+    logging one line per response. Stage timings go to ``metrics`` (a new
+    Metrics when None), tagged with ``label``. With ``--mode bulk`` the work
+    goes to ``bulk.run_bulk`` and ``bulk_client`` (see GeminiBulkClient).
+    Raises BatchSetupError when the batch cannot start and returns a
+    BatchResult otherwise.
+    """
+    if args.mode == 'bulk':
+        # Imported here: it shares nothing with the request loop below
+        from .bulk import run_bulk
+        return run_bulk(form, target_url, args, pool, log, progress, metrics, label, bulk_client)
+
+    # 決定哪些題目交給AI回答：全部、只有文字題、或完全不用
+    local = None
+    population = None
+    llm_form = form
+    llm_positions = None
+    if args.generator != 'llm':
+        try:
+            spec = load_spec(args.distributions)
+            if args.generator == 'population':
+                # Imported here: it loads NumPy, which no other generator needs
+                from .population import PopulationEngine
+                population = PopulationEngine(form, spec, args.seed)
+            else:
+                local = LocalAnswerGenerator(form, spec, args.seed)
+        except RuntimeError as e:
+            raise BatchSetupError(str(e)) from e
+        except (OSError, ValueError, KeyError) as e:
+            raise BatchSetupError(f"invalid --distributions file: {e}") from e
+        if args.generator == 'hybrid':
+            llm_form, llm_positions = text_only_form(form)
+            if not llm_form:
+                llm_form = None
+        else:
+            llm_form = None
+        if llm_form is None:
+            missing = missing_text(form, (population or local).distributions)
+            if missing:
+                raise BatchSetupError(f"required text questions need 'values' in --distributions: {missing}")
+
+    # 將form_string添加到prompt_parts
+    prompt_parts = None
+    if llm_form is not None:
+        prompt_parts = form_prompt(llm_form, args.compact, structured=not args.no_schema)
+
+    # Compile the URL template once; each response only fills in its answers
+    template = PrefillTemplate(target_url, form)
+    batch_size = args.batch
+    per_call = args.per_call if llm_form is not None else LOCAL_CHUNK
+    concurrency = args.concurrency if llm_form is not None else 1
+
+    # Every call reserves a request slot and its estimated tokens on the least-loaded
+    # provider of the (possibly shared) pool
+    if llm_form is None:
+        pool = None
+    elif pool is None:
+        raise BatchSetupError("this generator needs an API key (GEMINI_API_KEY)")
+    retry_policy = RetryPolicy(args.retries)
+    stats = Counter()
+    stats_lock = threading.Lock()
+    if metrics is None:
+        metrics = Metrics()
+    # The CallTimer of the work unit running on this thread
+    current = threading.local()
+    # Set when the pipeline stops (Ctrl-C, or the consumer gives up): calls stop retrying
+    stopping = threading.Event()
+
+    def record_retry(event):
+        with stats_lock:
+            stats[event] += 1
+
+    def record_hedge_latency(observed, first_copy):
+        metrics.add('hedged', observed)
+        metrics.add('unhedged', first_copy)
+
+    hedger = None
+    if args.hedge and llm_form is not None:
+        # Every request runs on the hedger's threads: one per model-calling thread, and as many for copies
+        hedger = Hedger(2 * (concurrency + args.validator_workers), args.hedge_percentile, args.hedge_budget,
+                        record_retry, record_hedge_latency, stopping)
+
+    def call_model(prompt, estimated_tokens, cached=False, checker=None, accept=None, **options):
+        """One paced API call, retried with backoff on transient errors; returns the reply text.
+
+        ``cached`` sends the call against the provider's cached prompt prefix.
+        ``checker`` makes a ReplyChecker for each attempt; the reply is then
+        streamed through it and cancelled once it cannot be used. With
+        ``--hedge`` a slow attempt gets a second copy and the first reply
+        ``accept`` approves is used.
+        """
+        timer = current.timer
+
+        def send(provider, cancelled=None):
+            """One request on ``provider`` (already acquired, released here); returns (text, usage)."""
+            check = checker() if checker is not None else None
+            on_text = None
+            if check is not None or cancelled is not None:
+                def on_text(text):
+                    if cancelled is not None and cancelled.is_set():
+                        raise HedgeCancelled("the other copy of this request answered first")
+                    if check is not None:
+                        check.feed(text)
+            try:
+                result = generate_response(provider.backend, prompt, args.temperature,
+                                           cached_content=cache_names.get(provider) if cached else None,
+                                           on_text=on_text, **options)
+            except StreamAbortedError as e:
+                pool.release(provider, usage=e.usage, error=e)
+                record_usage(e.usage)
+                timer.add_usage(e.usage)
+                with stats_lock:
+                    stats['hedges_cancelled' if isinstance(e.__cause__, HedgeCancelled) else 'streams_aborted'] += 1
+                raise
+            except Exception as e:
+                # Throttles or retires this provider; the retry may go to another one
+                pool.release(provider, error=e)
+                raise
+            pool.release(provider, usage=result[1])
+            return result
+
+        def reserve(cancelled):
+            # The second copy of a hedged request; it may land on another provider.
+            # Hedger.call settles it before returning, so ``attempts`` is final by then
+            provider = pool.acquire(estimated_tokens, cancelled)
+            timer.attempts += 1
+            return provider
+
+        def unreserve(provider):
+            pool.cancel(provider)
+            timer.attempts -= 1
+
+        def attempt():
+            if stopping.is_set():
+                raise GenerationError("the run is stopping")
+            with timer.stage('rate_wait'):
+                provider = pool.acquire(estimated_tokens, stopping)
+            timer.attempts += 1
+            with timer.stage('api'):
+                if hedger is None:
+                    return send(provider)
+                return hedger.call(send, provider, reserve, accept and (lambda result: accept(result[0])),
+                                   unreserve)
+        # What is left of this stage once waiting and API time are taken out is retry backoff
+        with timer.stage('backoff'):
+            response_text, usage = call_with_retry(attempt, retry_policy, None, record_retry, stopping)
+        record_usage(usage)
+        timer.add_usage(usage)
+        return response_text
+
+    def record_usage(usage):
+        if usage is None:
+            return
+        with stats_lock:
+            stats['calls'] += 1
+            stats['prompt_tokens'] += usage.prompt_tokens
+            stats['cached_tokens'] += usage.cached_tokens
+            stats['output_tokens'] += usage.output_tokens
+
+    def ask_repair(repair_parts):
+        """Re-ask only the failing questions; the reply is a JSON object keyed by question number."""
+        response_text = call_model(repair_parts, estimate_tokens(repair_parts) + ESTIMATED_OUTPUT_TOKENS,
+                                   accept=usable_reply)
+        return extract_json_from_response(response_text)
+
+    def check_answer_set(answers):
+        """Validate one answer set, fixing it locally or via targeted re-asks; raises if still invalid."""
+        answers = structured_to_answers(llm_form, answers)
+        if args.compact:
+            answers = decode_answers(llm_form, answers)
+        result = validate_answers(llm_form, answers)
+        if result.problems and args.repair_attempts > 0:
+            result = repair_answers(llm_form, result, ask_repair, args.repair_attempts)
+        with stats_lock:
+            stats['fixed'] += result.fixed
+            stats['repaired'] += result.repaired
+        if result.problems:
+            raise ValueError(f"invalid answers: {describe_problems(result.problems)}")
+        return result.answers
+
+    # Replies are constrained to the form's schema, built once per answer-set count in use
+    schemas = {}
+
+    def response_schema(count):
+        if args.no_schema:
+            return None
+        if count not in schemas:
+            schemas[count] = form_response_schema(llm_form, count, args.compact)
+        return schemas[count]
+
+    def ask_model(count, seed):
+        """One API call for ``count`` answer sets; returns unchecked (answers, error) pairs."""
+        call_prompt = request_parts if count == 1 else request_parts + [multi_response_instruction(count)]
+        estimated_tokens = estimate_tokens(call_prompt) + cached_estimate + ESTIMATED_OUTPUT_TOKENS * count
+
+        checker = None
+        if args.stream:
+            # A set that fails validation is only lost for good when it cannot be repaired
+            checker = partial(ReplyChecker, llm_form, count, args.compact, args.repair_attempts == 0)
+
+        # Generate response with variation seed
+        response_text = call_model(call_prompt, estimated_tokens, variation_seed=seed,
+                                   max_output_tokens=2048 * count if count > 1 else None,
+                                   cached=True, response_schema=response_schema(count), checker=checker,
+                                   accept=partial(usable_reply, count=count))
+
+        # Parse JSON
+        with current.timer.stage('parse'):
+            return split_answer_sets(extract_json_from_response(response_text), count)
+
+    def fill(indices, answer_sets, seeds, positions, seed):
+        """Ask the model (with variation ``seed``) for the answer sets at ``positions``, unchecked."""
+        fresh = ask_model(len(positions), seed)
+        for position, answer_set in zip(positions, fresh):
+            answer_sets[position] = answer_set
+            seeds[position] = seed
+
+    def check_positions(indices, answer_sets, positions):
+        """Validate the answer sets at ``positions`` in place; hybrid runs then merge in their local answers."""
+        for position in positions:
+            answers, error = answer_sets[position]
+            if error is None:
+                try:
+                    with current.timer.stage('validate'):
+                        answers = check_answer_set(answers)
+                except Exception as e:
+                    error = e
+            if error is None and local is not None:
+                answers = merge_answers(local.generate(indices[position]), answers, llm_positions)
+            answer_sets[position] = (answers, error)
+
+    # The population block the (single) source thread is slicing: [block number, PopulationBlock]
+    current_block = [None, None]
+
+    # The batch runs as a pipeline of stages, each on its own threads (see run_staged).
+    # A work unit travels as a tuple led by its CallTimer, which is current on the
+    # thread working on it; waits between stages count as its queue time.
+    def stage_task(task):
+        def run(unit):
+            timer = unit[0]
+            timer.dequeued()
+            current.timer = timer
+            try:
+                return task(*unit)
+            finally:
+                current.timer = None
+                timer.queued()
+        return run
+
+    def produce(timer):
+        """Source stage: a unit's answer sets from the answer cache, one API call or local sampling."""
+        indices = timer.indices
+        count = len(indices)
+        # Variation seed of the API call, or the sampling seed for pure local runs
+        seed = indices[0] if llm_form is not None else args.seed
+        seeds = [seed] * count
+        if llm_form is None:
+            with timer.stage('generate'):
+                if population is not None:
+                    # Units are slices of one vectorised block; the block is generated for
+                    # its first unit and rows are decoded on the way out
+                    block_number = indices[0] // population.block_size
+                    if current_block[0] != block_number:
+                        current_block[:] = [block_number, population.generate_block(block_number)]
+                    block = current_block[1]
+                    offsets = [index - block_number * population.block_size for index in indices]
+                    population.tally(block, offsets)
+                    answer_sets = [(block.row(offset), None) for offset in offsets]
+                else:
+                    answer_sets = [(local.generate(index), None) for index in indices]
+            return timer, seeds, answer_sets, []
+
+        answer_sets = [None] * count
+        if answer_cache is not None:
+            for position in range(count):
+                cached = answer_cache.get(form_hash, seed, position, args.temperature)
+                if cached is not None:
+                    answer_sets[position] = (cached, None)
+            with stats_lock:
+                stats['cache_hits'] += sum(1 for answer_set in answer_sets if answer_set is not None)
+        missing = [position for position in range(count) if answer_sets[position] is None]
+        if missing:
+            fill(indices, answer_sets, seeds, missing, seed)
+        return timer, seeds, answer_sets, missing
+
+    def check(timer, seeds, answer_sets, missing):
+        """Validator stage: check the fresh answer sets (re-asking if needed) and regenerate repeats."""
+        if llm_form is None:
+            return timer, seeds, answer_sets
+        indices = timer.indices
+        count = len(indices)
+        seed = indices[0]
+        check_positions(indices, answer_sets, missing)
+
+        if answer_index is not None:
+            # Cached sets were accepted by an earlier run; only fresh ones are checked
+            for position in range(count):
+                if position not in missing:
+                    answer_index.add(answer_sets[position][0])
+            unchecked = missing
+            for attempt in range(args.dedup_attempts + 1):
+                repeats = [
+                    position for position in unchecked
+                    if answer_sets[position][1] is None and answer_index.add(answer_sets[position][0])
+                ]
+                with stats_lock:
+                    stats['duplicates'] += len(repeats)
+                if not repeats:
+                    break
+                if attempt == args.dedup_attempts:
+                    with stats_lock:
+                        stats['duplicates_kept'] += len(repeats)
+                    break
+                # Regenerate only the repeated slots, with variation seeds no other call uses
+                try:
+                    fill(indices, answer_sets, seeds, repeats, seed + batch_size * (attempt + 1))
+                    check_positions(indices, answer_sets, repeats)
+                    with stats_lock:
+                        stats['regenerated'] += len(repeats)
+                except Exception:
+                    with stats_lock:
+                        stats['duplicates_kept'] += len(repeats)
+                    break
+                unchecked = repeats
+
+        if answer_cache is not None:
+            answer_cache.put_many(form_hash, args.temperature, [
+                (seed, position, answers)
+                for position, (answers, error) in enumerate(answer_sets)
+                if error is None and (position in missing or seeds[position] != seed)
+            ])
+        return timer, seeds, answer_sets
+
+    def render(timer, seeds, answer_sets):
+        """Renderer stage: the pre-filled URL and output line of every valid answer set.
+
+        Returns the (index, seed, answers, url, error) results and the lines to write.
+        """
+        results = []
+        lines = []
+        with timer.stage('url'):
+            for index, seed, (answers, error) in zip(timer.indices, seeds, answer_sets):
+                url = None
+                if error is None:
+                    # Answers live beside the shared form; nothing is copied per response
+                    url = template.render(set_answer(form, answers))
+                    lines.append(format_record(args.output_format, index, seed, answers, url))
+                results.append((index, seed, answers, url, error))
+        return timer, results, lines
+
+    # Repeated answer sets are regenerated; on --resume the earlier output counts too
+    answer_index = None
+    if llm_form is not None:
+        answer_index = AnswerIndex(form, args.dedup_distance)
+        if args.resume:
+            for record in read_records(args.output_file):
+                answer_index.add(record["answers"])
+    answer_cache = AnswerCache(args.answer_cache) if args.answer_cache and llm_form is not None else None
+    form_hash = answer_cache_key(form, args.generator, args.compact) if answer_cache is not None else None
+
+    # Batch processing; work units are cut from the pending indices as the pipeline takes them
+    done = read_completed(args.output_file) if args.resume else set()
+    pending_count = batch_size - sum(1 for index in done if index < batch_size)
+    pending = (i for i in range(batch_size) if i not in done)
+    if population is not None:
+        # Work units stay within the engine's blocks so every index keeps its seeded answers
+        calls = (chunk for _, block in groupby(pending, key=lambda index: index // population.block_size)
+                 for chunk in chunked(block, per_call))
+    else:
+        calls = chunked(pending, per_call)
+    call_count = -(-pending_count // per_call)
+    generator_label = {
+        'llm': 'the model',
+        'local': 'local sampling',
+        'hybrid': 'local sampling + the model for free text',
+        'population': 'the vectorised population engine',
+    }
+    success_count = 0
+    failed_count = 0
+    preview = []
+
+    log(f"Generating {batch_size} response(s) with {generator_label[args.generator]}...")
+    if done:
+        log(f"Resuming: {batch_size - pending_count} already in {args.output_file}, {pending_count} to go")
+    # The static prefix goes up once per key/model as a context cache; each call then
+    # sends only its own parts. Caches belong to a key, so all providers need one.
+    cache_names = {}
+    request_parts = prompt_parts
+    cached_estimate = 0
+    if llm_form is not None:
+        report_prompt_tokens(pool.providers[0].backend, llm_form, args.compact, structured=not args.no_schema,
+                             log=log, count_tokens=args.count_prompt_tokens)
+        if not args.no_prompt_cache and call_count > 1:
+            for provider in pool.providers:
+                cache_name = provider.backend.create_cache(prompt_parts)
+                if not cache_name:
+                    break
+                cache_names[provider] = cache_name
+            if len(cache_names) == len(pool):
+                request_parts = [CACHED_PROMPT_PART]
+                # The cached prefix is still part of every request's input, so keep reserving it
+                cached_estimate = estimate_tokens(prompt_parts)
+                log(f"Prompt prefix cached ({len(cache_names)} cache(s))")
+            else:
+                for provider in pool.providers:
+                    provider.backend.delete_cache(cache_names.pop(provider, None))
+                log("Context caching unavailable for this model/prompt size; sending the prefix with every call")
+
+    if llm_form is not None:
+        log(f"Temperature: {args.temperature}")
+        if per_call > 1:
+            log(f"Requesting {per_call} responses per call ({call_count} API calls)")
+        if len(pool) > 1:
+            log(f"Provider pool: {len(pool)} key/model pairs, {pool.rpm:g} RPM combined")
+        rate_limit = f"{args.rpm:g} RPM" if math.isfinite(args.rpm) else "no RPM cap"
+        log(f"Concurrency: {concurrency}, rate limit: {rate_limit}" + (f", {args.tpm:g} TPM" if args.tpm else "")
+            + (" per key/model" if len(pool) > 1 else ""))
+    # Answer source -> validator -> URL renderer -> writer (this thread), connected by bounded queues
+    stages = [
+        Stage('source', stage_task(produce), concurrency),
+        Stage('validator', stage_task(check), args.validator_workers if llm_form is not None else 1),
+        Stage('renderer', stage_task(render), args.renderer_workers),
+    ]
+    max_in_flight = args.max_in_flight or 2 * sum(stage.workers for stage in stages)
+    log(f"Pipeline: {' / '.join(f'{stage.workers} {stage.name}' for stage in stages)} thread(s), "
+        f"up to {max_in_flight} work unit(s) in flight")
+    log(f"Output will be saved to: {args.output_file}")
+    log("-" * 60)
+
+    def work_units():
+        for call_indices in calls:
+            timer = CallTimer(call_indices)
+            timer.queued()
+            yield (timer,)
+
+    # Results come back in request order even though units overlap,
+    # and each unit is on disk before its responses are reported
+    stage_stats = {}
+    pipeline = run_staged(work_units(), stages, max_in_flight, lambda unit: len(unit[0].indices), stage_stats,
+                          'writer', stopping)
+    try:
+        with ResultWriter(args.output_file, args.output_format, append=args.resume) as writer:
+            for (timer,), unit, unit_error in pipeline:
+                if unit_error is not None:
+                    results = [(i, timer.indices[0], None, None, unit_error) for i in timer.indices]
+                    lines = []
+                else:
+                    _, results, lines = unit
+                timer.failed = sum(1 for result in results if result[4] is not None)
+                metrics.record(timer, label)
+                write_started = time.perf_counter()
+                # One flush per work unit; a crash loses at most the unit being written
+                writer.write_lines(lines)
+                for i, seed, answers, url, error in results:
+                    if error is None:
+                        success_count += 1
+                        if len(preview) < 3:
+                            preview.append(url)
+                    else:
+                        failed_count += 1
+                    if progress is not None:
+                        progress(error)
+                    elif error is None:
+                        log(f"[{i+1}/{batch_size}] ✓ Success")
+                    else:
+                        log(f"[{i+1}/{batch_size}] ✗ Failed: {error}")
+                metrics.add('write', time.perf_counter() - write_started)
+    finally:
+        pipeline.close()
+        metrics.add_pipeline(stage_stats)
+        if hedger is not None:
+            hedger.close()
+        if answer_cache is not None:
+            answer_cache.close()
+        for provider in pool.providers if pool is not None else ():
+            provider.backend.delete_cache(cache_names.get(provider))
+
+    return BatchResult(success_count, failed_count, pending_count, len(done), preview, stats, population, metrics)
+
+
+def print_summary(result, args, pool=None, log=print):
+    """Print the end-of-run report of one batch."""
+    log("-" * 60)
+    log(f"\n✓ Completed: {result.succeeded}/{result.pending} successful, {result.failed} failed")
+    if result.population is not None and result.succeeded:
+        log("\nTarget vs achieved marginals:")
+        log(result.population.report())
+    report_stats(result.stats, args.answer_cache, pool, log)
+    timings = result.metrics.report()
+    if timings:
+        log(timings)
+
+    if result.succeeded or result.done:
+        log(f"✓ Results saved to: {args.output_file}")
+        if result.failed and args.output_format == 'jsonl':
+            log("  Re-run with --resume to generate the failed responses.")
+
+        # Also print first few URLs as preview
+        if result.preview:
+            log(f"\nPreview (first {len(result.preview)} URLs):")
+            for i, url in enumerate(result.preview, 1):
+                log(f"{i}. {url[:100]}...")
+    else:
+        log("✗ No URLs generated successfully.")
+
+
+def report_stats(stats, answer_cache=None, pool=None, log=print):
+    """Print the fix/dedup/cache/retry/token counters of a run."""
+    if stats['fixed'] or stats['repaired']:
+        log(f"  Answers fixed locally: {stats['fixed']}, recovered by re-asking: {stats['repaired']}")
+    if stats['duplicates']:
+        log(f"  Repeated answer sets: {stats['duplicates']} detected, "
+            f"{stats['regenerated']} regenerated, {stats['duplicates_kept']} kept")
+    if stats['cache_hits']:
+        log(f"  Answer sets reused from {answer_cache}: {stats['cache_hits']}")
+    if stats['streams_aborted']:
+        log(f"  Streamed replies cancelled early as unusable: {stats['streams_aborted']}")
+    if stats['hedge_requests']:
+        log(f"  Hedged requests: {stats['hedged']} of {stats['hedge_requests']} copied "
+            f"({stats['hedged'] / stats['hedge_requests']:.1%}), the copy answered first {stats['hedge_won']} time(s), "
+            f"{stats['hedges_cancelled']} losing copies cancelled")
+    if stats['retried'] or stats['failed']:
+        log(f"  API calls retried: {stats['retried']} (recovered {stats['recovered']}), "
+            f"gave up on transient errors: {stats['failed']}")
+        if pool is not None and pool.current_rpm < pool.rpm:
+            log(f"  Request rate adapted to rate limits: ended at {pool.current_rpm:g} of {pool.rpm:g} RPM")
+    if pool is not None and len(pool) > 1:
+        log("  Usage per key/model:")
+        log(pool.report())
+    if stats['calls']:
+        calls_made = stats['calls']
+        log(f"  Measured tokens per call: {stats['prompt_tokens'] / calls_made:.0f} prompt "
+            f"({stats['cached_tokens'] / calls_made:.0f} from cache), {stats['output_tokens'] / calls_made:.0f} output")
@@ -0,0 +1,368 @@
+import json
+import os
+import time
+from collections import Counter
+
+from .answer_cache import form_fingerprint
+from .backend import HAVE_CLIENT_API, Usage
+from .batch_run import (BatchResult, BatchSetupError, form_prompt, generation_config, multi_response_instruction,
+                        split_answer_sets, vary_prompt)
+from .compact import decode_answers
+from .dedup import AnswerIndex
+from .form import set_answer
+from .metrics import CallTimer, Metrics
+from .output import ResultWriter, read_completed, read_records
+from .prefill import PrefillTemplate
+from .reply import extract_json_from_response
+from .response_schema import form_response_schema, structured_to_answers
+from .retry import RETRYABLE_KINDS, classify_error
+from .validate import describe_problems, validate_answers
+
+# 批次工作結束時的狀態；只有前兩種有結果可取
+RESULT_STATES = ('succeeded', 'partially_succeeded')
+FINISHED_STATES = RESULT_STATES + ('failed', 'cancelled', 'expired')
+
+# 狀態檔與請求檔放在輸出檔旁邊
+STATE_SUFFIX = '.bulk.json'
+REQUESTS_SUFFIX = '.requests.jsonl'
+RESULTS_SUFFIX = '.results.jsonl'
+
+
+def job_state(state):
+    """``JOB_STATE_SUCCEEDED`` / ``BATCH_STATE_RUNNING`` / an enum of either → ``succeeded`` / ``running``."""
+    name = getattr(state, 'name', None) or str(state)
+    return name.rsplit('STATE_', 1)[-1].lower()
+
+
+def _camel(key):
+    head, *rest = key.split('_')
+    return head + ''.join(part.title() for part in rest)
+
+
+def _rest_schema(schema):
+    """A response schema with its keys in the REST API's camelCase (property names are kept)."""
+    if not isinstance(schema, dict):
+        return schema
+    result = {}
+    for key, value in schema.items():
+        if key == 'properties':
+            result[key] = {name: _rest_schema(sub) for name, sub in value.items()}
+        elif isinstance(value, dict):
+            result[_camel(key)] = _rest_schema(value)
+        else:
+            result[_camel(key)] = value
+    return result
+
+
+def request_line(key, prompt_parts, config):
+    """One line of a batch request file: a ``GenerateContentRequest`` in REST JSON under ``key``."""
+    rest_config = {_camel(name): value for name, value in config.items()}
+    if 'responseSchema' in rest_config:
+        rest_config['responseSchema'] = _rest_schema(rest_config['responseSchema'])
+    return json.dumps({
+        'key': key,
+        'request': {
+            'contents': [{'role': 'user', 'parts': [{'text': part} for part in prompt_parts]}],
+            'generationConfig': rest_config,
+        },
+    }, ensure_ascii=False)
+
+
+def result_text(record):
+    """``(text, usage, error)`` of one line of a batch result file."""
+    if record.get('error'):
+        error = record['error']
+        return None, None, error.get('message', str(error)) if isinstance(error, dict) else str(error)
+    response = record.get('response') or {}
+    metadata = response.get('usageMetadata') or {}
+    usage = Usage(metadata.get('promptTokenCount', 0), metadata.get('cachedContentTokenCount', 0),
+                  metadata.get('candidatesTokenCount', 0)) if metadata else None
+    candidates = response.get('candidates') or []
+    parts = (candidates[0].get('content') or {}).get('parts', []) if candidates else []
+    text = ''.join(part.get('text', '') for part in parts)
+    if not text:
+        reason = candidates[0].get('finishReason') if candidates else None
+        return None, usage, f"no text in the reply{f' ({reason})' if reason else ''}"
+    return text, usage, None
+
+
+class GeminiBulkClient:
+    """Submits request files to the Gemini Batch API (asynchronous, half the interactive price).
+
+    ``submit`` uploads the file and starts the job, ``poll`` returns ``(state,
+    error message)`` and ``fetch`` downloads the result file to disk. Any
+    object with these three methods can take its place, e.g. the local stub
+    in benchmarks/bulk_stub.py.
+    """
+
+    def __init__(self, api_key, model_name):
+        from google import genai as genai_client
+        self.model_name = model_name
+        self._client = genai_client.Client(api_key=api_key)
+        self._types = genai_client.types
+
+    def submit(self, request_path, display_name):
+        uploaded = self._client.files.upload(
+            file=request_path,
+            config=self._types.UploadFileConfig(display_name=display_name, mime_type='jsonl'),
+        )
+        job = self._client.batches.create(model=self.model_name, src=uploaded.name,
+                                          config={'display_name': display_name})
+        return job.name
+
+    def poll(self, name):
+        job = self._client.batches.get(name=name)
+        error = getattr(job.error, 'message', None) if job.error else None
+        return job_state(job.state), error
+
+    def fetch(self, name, destination):
+        job = self._client.batches.get(name=name)
+        if job.dest is None or not job.dest.file_name:
+            raise RuntimeError(f"batch job {name} has no result file")
+        # Streamed to disk in chunks rather than held in memory
+        self._client.files.download(file=job.dest.file_name, destination=destination)
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise BatchSetupError(f"corrupt bulk job state in {path}: {e}") from e
+
+
+def _save_state(path, state):
+    # Written atomically: losing this file means losing track of a paid job
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def check_bulk_answers(form, answers, compact=False):
+    """Validate one answer set of a bulk reply, fixing what can be fixed locally; returns (answers, fixed).
+
+    There is no repair re-ask in bulk mode, so remaining problems raise ValueError.
+    """
+    answers = structured_to_answers(form, answers)
+    if compact:
+        answers = decode_answers(form, answers)
+    result = validate_answers(form, answers)
+    if result.problems:
+        raise ValueError(f"invalid answers: {describe_problems(result.problems)}")
+    return result.answers, result.fixed
+
+
+def submit_job(client, form, args, calls, request_path, log=print):
+    """Write one request per work unit of ``calls`` to ``request_path`` and submit it; returns the job name."""
+    prompt_parts = form_prompt(form, args.compact, structured=not args.no_schema)
+    schemas = {}
+    with open(request_path, 'w', encoding='utf-8') as f:
+        for indices in calls:
+            count = len(indices)
+            if not args.no_schema and count not in schemas:
+                schemas[count] = form_response_schema(form, count, args.compact)
+            parts = prompt_parts if count == 1 else prompt_parts + [multi_response_instruction(count)]
+            config = generation_config(args.temperature, 2048 * count if count > 1 else None,
+                                       response_schema=schemas.get(count))
+            f.write(request_line(str(indices[0]), vary_prompt(parts, indices[0]), config) + '\n')
+    size = os.path.getsize(request_path)
+    log(f"Wrote {len(calls)} request(s) to {request_path} ({size / 1024 / 1024:.1f} MB)")
+    return client.submit(request_path, f"autoformai-{form_fingerprint(form)[:12]}-{len(calls)}")
+
+
+def wait_for_job(client, name, interval, log=print):
+    """Poll job ``name`` every ``interval`` seconds until it finishes; returns its final state.
+
+    Transient errors while polling (rate limits, 5xx, network) are logged and
+    polled through; anything else is raised.
+    """
+    last = None
+    while True:
+        try:
+            state, error = client.poll(name)
+        except Exception as e:
+            kind, _ = classify_error(e)
+            if kind not in RETRYABLE_KINDS:
+                raise
+            log(f"  Polling {name} failed ({e}); trying again in {interval:g}s")
+            time.sleep(interval)
+            continue
+        if state != last:
+            log(f"  Batch job {name}: {state}" + (f" ({error})" if error else ""))
+            last = state
+        if state in FINISHED_STATES:
+            return state
+        time.sleep(interval)
+
+
+def run_bulk(form, target_url, args, pool=None, log=print, progress=None, metrics=None, label=None, client=None):
+    """``run_batch`` for ``--mode bulk``: one batch job instead of a loop of interactive calls.
+
+    All prompts go into a request file submitted as a single job through
+    ``client`` (a GeminiBulkClient on the pool's first key/model when None).
+    The job name is kept in ``<output>.bulk.json`` until its results are
+    written, so a run interrupted while waiting picks the same job up again
+    when restarted with the same options. Results are read back line by line
+    and go through the usual parse, validation and URL steps; answers are only
+    fixed locally, as there is no interactive call to re-ask with.
+    """
+    if metrics is None:
+        metrics = Metrics()
+    state_path = args.output_file + STATE_SUFFIX
+    request_path = args.output_file + REQUESTS_SUFFIX
+    result_path = args.output_file + RESULTS_SUFFIX
+    fingerprint = form_fingerprint(form)
+    state = _load_state(state_path)
+    if state is not None and state.get('form') != fingerprint:
+        raise BatchSetupError(f"{state_path} tracks bulk job {state.get('job')} for another form; "
+                              "delete it to submit a new job")
+
+    if client is None:
+        if pool is None:
+            raise BatchSetupError("--mode bulk needs an API key (GEMINI_API_KEY)")
+        if not HAVE_CLIENT_API:
+            raise BatchSetupError("--mode bulk needs the google-genai package (pip install google-genai)")
+        provider = pool.providers[0]
+        if len(pool) > 1:
+            log(f"Bulk jobs run on one key/model; using {provider.name} / {provider.model_name}")
+        client = GeminiBulkClient(provider.api_key, provider.model_name)
+
+    batch_size = args.batch
+    if state is None:
+        done = read_completed(args.output_file) if args.resume else set()
+        pending = [i for i in range(batch_size) if i not in done]
+        calls = [pending[i:i + args.per_call] for i in range(0, len(pending), args.per_call)]
+        if not calls:
+            log(f"Nothing to do: all {batch_size} response(s) are already in {args.output_file}")
+            return BatchResult(0, 0, 0, len(done), [], Counter(), None, metrics)
+        if not args.resume:
+            # Results are appended as they are read back, possibly over several attempts
+            ResultWriter(args.output_file).close()
+        log(f"Submitting {len(pending)} response(s) as one batch job ({len(calls)} request(s))...")
+        try:
+            with metrics.timed('submit'):
+                job = submit_job(client, form, args, calls, request_path, log)
+        except Exception as e:
+            raise BatchSetupError(f"could not submit the batch job: {e}") from e
+        state = {'job': job, 'form': fingerprint, 'submitted': time.time(), 'batch': batch_size,
+                 'calls': {str(indices[0]): indices for indices in calls}}
+        _save_state(state_path, state)
+        log(f"Submitted batch job {job}; its state is kept in {state_path}.")
+        log("If this run is interrupted, run the same command again to keep waiting for it.")
+    else:
+        waited = time.time() - state['submitted']
+        log(f"Resuming batch job {state['job']} from {state_path} (submitted {waited / 60:.0f} min ago)")
+
+    try:
+        with metrics.timed('job_wait'):
+            final = wait_for_job(client, state['job'], args.poll_interval, log)
+    except Exception as e:
+        raise BatchSetupError(f"could not check batch job {state['job']}: {e}; run again to retry") from e
+    if final not in RESULT_STATES:
+        _remove(state_path)
+        _remove(request_path)
+        raise BatchSetupError(f"batch job {state['job']} ended as {final}; nothing to collect")
+
+    try:
+        with metrics.timed('fetch'):
+            client.fetch(state['job'], result_path)
+    except Exception as e:
+        raise BatchSetupError(f"could not download the results of {state['job']}: {e}; run again to retry") from e
+
+    calls = state['calls']
+    done = read_completed(args.output_file)
+    pending = sum(1 for indices in calls.values() for index in indices if index not in done)
+    template = PrefillTemplate(target_url, form)
+    answer_index = AnswerIndex(form, args.dedup_distance)
+    for record in read_records(args.output_file):
+        answer_index.add(record["answers"])
+    stats = Counter()
+    success_count = 0
+    failed_count = 0
+    preview = []
+    missing = dict(calls)
+
+    def outcome(error, index):
+        if progress is not None:
+            progress(error)
+        elif error is None:
+            log(f"[{index + 1}/{state['batch']}] ✓ Success")
+        else:
+            log(f"[{index + 1}/{state['batch']}] ✗ Failed: {error}")
+
+    with ResultWriter(args.output_file, args.output_format, append=True) as writer, \
+            open(result_path, encoding='utf-8') as results:
+        for line in results:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            indices = missing.pop(str(record.get('key')), None)
+            if indices is None:
+                continue
+            todo = [index for index in indices if index not in done]
+            if not todo:
+                continue
+            timer = CallTimer(indices)
+            timer.attempts = 1
+            text, usage, error = result_text(record)
+            timer.add_usage(usage)
+            if usage is not None:
+                stats['calls'] += 1
+                stats['prompt_tokens'] += usage.prompt_tokens
+                stats['cached_tokens'] += usage.cached_tokens
+                stats['output_tokens'] += usage.output_tokens
+            answer_sets = [(None, RuntimeError(error))] * len(indices)
+            if error is None:
+                try:
+                    with timer.stage('parse'):
+                        answer_sets = split_answer_sets(extract_json_from_response(text), len(indices))
+                except ValueError as e:
+                    answer_sets = [(None, e)] * len(indices)
+            seed = indices[0]
+            for index, (answers, error) in zip(indices, answer_sets):
+                if index in done:
+                    continue
+                if error is None:
+                    try:
+                        with timer.stage('validate'):
+                            answers, fixed = check_bulk_answers(form, answers, args.compact)
+                        stats['fixed'] += fixed
+                    except ValueError as e:
+                        error = e
+                if error is None and answer_index.add(answers):
+                    # Too late to regenerate: the repeat is kept, as after the last --dedup-attempts
+                    stats['duplicates'] += 1
+                    stats['duplicates_kept'] += 1
+                if error is None:
+                    with timer.stage('url'):
+                        url = template.render(set_answer(form, answers))
+                    writer.write(index, seed, answers, url)
+                    success_count += 1
+                    if len(preview) < 3:
+                        preview.append(url)
+                else:
+                    failed_count += 1
+                    timer.failed += 1
+                outcome(error, index)
+            metrics.record(timer, label)
+        for indices in missing.values():
+            for index in indices:
+                if index not in done:
+                    failed_count += 1
+                    outcome(RuntimeError("no result for this request"), index)
+
+    # The job is collected; later runs (with --resume) submit a new one for what failed
+    _remove(state_path)
+    _remove(request_path)
+    _remove(result_path)
+    return BatchResult(success_count, failed_count, pending, len(done), preview, stats, None, metrics)
@@ -0,0 +1,281 @@
+"""Entry points of ai_form.py, ai_batch_form.py, ai_jobs.py and ai_form_service.py.
+
+The scripts only call these functions. The Gemini SDKs, requests and NumPy
+are imported by the code that uses them (backend creation, form download,
+population sampling), so ``--help``, argument errors and runs served from
+the caches start without loading them.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from .backend import EmptyResponseError, GeminiBackend
+from .batch_run import (
+    BatchSetupError, add_batch_arguments, add_form_cache_arguments, check_batch_arguments, needs_model,
+    print_summary, run_batch,
+)
+from .form import get_form, objects_to_result_strings, objects_to_string, set_answer
+from .form_cache import DEFAULT_TTL, FormCache, form_id_from_url
+from .metrics import Metrics
+from .jobs import fetch_forms, load_manifest, make_jobs, print_jobs_summary, run_jobs
+from .pool import ProviderPool, load_providers
+from .reply import extract_json_from_response
+from .response_schema import STRUCTURED_INSTRUCTION, form_response_schema, structured_to_answers
+from .retry import RetryPolicy, call_with_retry
+from .validate import describe_problems, repair_answers, validate_answers
+
+# 設定Google Form URL
+URL = 'https://docs.google.com/forms/d/e/1FAIpQLScuPmKJ0tP8_3bXYRsXbtITNXPJ3rON4RK99u8C9nWCm6-rlA/viewform'
+
+# 單次填寫的提示詞
+SINGLE_PROMPT_PARTS = [
+    "You are a form-filling assistant. Fill out the following form questions with realistic, reasonable answers.",
+    "Instructions:",
+    "- For multiple choice questions, select ONE option from the provided choices",
+    "- For linear scale questions (1-10), pick a number in the middle range (e.g., 5-7)",
+    "- For short answer questions, provide brief, realistic responses (e.g., numbers like '3', '20', '7' for count/hour questions)",
+    "- Answer ALL questions in order",
+    "- Return answers as a JSON array in the EXACT same order as the questions",
+    "- Use empty string \"\" only if a question is optional and you cannot provide an answer",
+    "- Do NOT use null or None - use actual values",
+    "- For date format use: {\"year\": YYYY, \"month\": MM, \"day\": DD}",
+    "- For time format use: {\"hour\": HH, \"minute\": MM}",
+    "",
+    "Example responses:",
+    "- For 'How many movies?': \"5\"",
+    "- For 'Hours per week?': \"20\"",
+    "- For 'Favorite item?' with options ['A', 'B', 'C']: \"B\"",
+    "- For scale 1-10: \"7\"",
+]
+
+
+def load_pool_providers(args):
+    """Providers for ``--providers``/the environment; exits on a bad file, raises without any key."""
+    try:
+        providers = load_providers(args.providers, args.model_name.split(','), args.rpm, args.tpm or None, args.rpd)
+    except (OSError, ValueError, KeyError, AttributeError) as e:
+        print(f"Error: invalid --providers file: {e}")
+        sys.exit(2)
+    if not providers:
+        raise ValueError("未設定GEMINI_API_KEY環境變數")
+    return providers
+
+
+def form_main():
+    # 載入環境變數
+    load_dotenv()
+
+    # CLI: allow overriding the URL and model name
+    parser = argparse.ArgumentParser(description='Auto fill Google Forms via AI')
+    parser.add_argument('--form-url', dest='form_url', help='Google Form URL to process', required=False)
+    parser.add_argument('--model-name', dest='model_name', help='Generative model name',
+                        required=False, default=os.getenv('MODEL_NAME', 'gemini-2.0-flash-exp'))
+    parser.add_argument('--no-schema', dest='no_schema', action='store_true',
+                        help='Do not constrain the reply with a JSON response schema built from the form')
+    add_form_cache_arguments(parser)
+    args = parser.parse_args()
+
+    # 從環境變數獲取API金鑰
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("未設定GEMINI_API_KEY環境變數")
+
+    target_url = args.form_url if args.form_url else URL
+
+    cache = None if args.no_cache else FormCache(ttl=args.cache_ttl)
+    form = get_form(target_url, cache=cache, refresh=args.refresh)
+    if not form:
+        print(f"Error: failed to fetch or parse the Google Form at: {target_url}")
+        sys.exit(2)
+
+    form_string = objects_to_string(form)
+
+    # 將form_string添加到prompt_parts
+    prompt_parts = SINGLE_PROMPT_PARTS + [form_string + "\n用陣列JSON格式回答所有問題"]
+    config = None
+    if not args.no_schema:
+        prompt_parts.append(STRUCTURED_INSTRUCTION)
+        config = {"response_mime_type": "application/json", "response_schema": form_response_schema(form)}
+
+    print("\n" + form_string + "\n")
+
+    model_name = args.model_name
+    try:
+        backend = GeminiBackend(api_key, model_name)
+        # 429、5xx與連線錯誤會退避後重試
+        response_text = call_with_retry(lambda: backend.generate(prompt_parts, config), RetryPolicy())
+    except EmptyResponseError as e:
+        print(e)
+        sys.exit(4)
+    except Exception as e:
+        print(e)
+        print("Tip: Make sure you have the correct model name and API access.")
+        sys.exit(3)
+
+    print(response_text)
+
+    try:
+        parsed_data = extract_json_from_response(response_text)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON response: {e}")
+        print(f"Response text: {response_text}")
+        sys.exit(5)
+
+    def ask_repair(repair_parts):
+        return extract_json_from_response(call_with_retry(lambda: backend.generate(repair_parts), RetryPolicy()))
+
+    # 檢查答案，能在本地修正就修正，其餘只針對錯誤題目重新詢問
+    try:
+        result = validate_answers(form, structured_to_answers(form, parsed_data))
+        if result.problems:
+            result = repair_answers(form, result, ask_repair)
+    except Exception as e:
+        print(f"Error validating answers: {e}")
+        sys.exit(5)
+    if result.problems:
+        print(f"Invalid answers: {describe_problems(result.problems)}")
+        sys.exit(5)
+
+    answers = set_answer(form, result.answers)
+    print("Google Form自動填寫網址：\n" + objects_to_result_strings(target_url, form, answers))
+
+
+def batch_main():
+    # 載入環境變數
+    load_dotenv()
+
+    # CLI: allow overriding the URL and model name
+    parser = argparse.ArgumentParser(description='Auto fill Google Forms via AI (Batch Mode)')
+    parser.add_argument('--form-url', dest='form_url', help='Google Form URL to process', required=False)
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    check_batch_arguments(parser, args)
+
+    # 從設定檔或環境變數取得API金鑰與模型（純本地產生時不需要）
+    providers = load_pool_providers(args) if needs_model(args) else []
+
+    target_url = args.form_url if args.form_url else URL
+    metrics = Metrics(args.metrics)
+
+    print(f"Fetching Google Form from: {target_url}")
+    cache = None if args.no_cache else FormCache(ttl=args.cache_ttl)
+    with metrics.timed('get_form'):
+        form = get_form(target_url, cache=cache, refresh=args.refresh)
+    if not form:
+        print(f"Error: failed to fetch or parse the Google Form at: {target_url}")
+        sys.exit(2)
+
+    print(f"✓ Form parsed successfully ({len(form)} sections)\n")
+
+    # One backend (client + pooled connection) per key/model for the whole run, each
+    # with its own limiter
+    pool = ProviderPool(providers) if providers else None
+    try:
+        result = run_batch(form, target_url, args, pool, metrics=metrics)
+    except BatchSetupError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    finally:
+        metrics.close()
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus, {'form': form_id_from_url(target_url)})
+
+    print_summary(result, args, pool)
+    if not (result.succeeded or result.done):
+        sys.exit(1)
+
+
+def jobs_main():
+    # 載入環境變數
+    load_dotenv()
+
+    # CLI: the manifest lists the forms; the batch options are defaults for every form
+    parser = argparse.ArgumentParser(description='Auto fill many Google Forms via AI from one job manifest')
+    parser.add_argument('manifest',
+                        help='YAML or JSON file with "defaults" and a "forms" list (url, name, batch, output, ...)')
+    parser.add_argument('--parallel-forms', dest='parallel_forms', type=int, default=2,
+                        help='Forms processed at the same time; they share one rate limit (default: 2)')
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    check_batch_arguments(parser, args)
+    if args.parallel_forms < 1:
+        parser.error("--parallel-forms must be positive")
+
+    try:
+        jobs = make_jobs(load_manifest(args.manifest), args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: invalid manifest {args.manifest}: {e}")
+        sys.exit(2)
+
+    # 從設定檔或環境變數取得API金鑰與模型（全部純本地產生時不需要）
+    providers = load_pool_providers(args) if any(needs_model(job.args) for job in jobs) else []
+
+    started = time.monotonic()
+    metrics = Metrics(args.metrics)
+    urls = {job.url for job in jobs}
+    print(f"Fetching {len(urls)} Google Form(s) for {len(jobs)} job(s)...")
+    cache = None if args.no_cache else FormCache(ttl=args.cache_ttl)
+    with metrics.timed('get_form'):
+        forms = fetch_forms([job.url for job in jobs], cache=cache, refresh=args.refresh)
+    print(f"✓ {sum(1 for form in forms.values() if form)}/{len(forms)} form(s) parsed\n")
+
+    # One provider pool (clients, connections and rate limiters) and one set of metrics for every form
+    pool = ProviderPool(providers) if providers else None
+    try:
+        outcomes = run_jobs(jobs, forms, pool, args.parallel_forms, metrics=metrics)
+    finally:
+        metrics.close()
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
+
+    print_jobs_summary(outcomes, pool, time.monotonic() - started, metrics)
+    if not any(outcome.result and (outcome.result.succeeded or outcome.result.done) for outcome in outcomes):
+        sys.exit(1)
+
+
+def service_main():
+    # Imported here: asyncio and the thread pool are only needed by the service
+    import asyncio
+
+    from .form_service import (
+        DEFAULT_ALLOWED_HOSTS, DEFAULT_MAX_ENTRIES, DEFAULT_WORKERS, FormService, FormServiceServer,
+    )
+
+    # CLI: where to listen and how long parsed forms are kept
+    parser = argparse.ArgumentParser(description='Local form fetch/parse service for the web UI (replaces public CORS proxies)')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                        help=f'Seconds a parsed form is served from memory (default: {DEFAULT_TTL})')
+    parser.add_argument('--max-forms', dest='max_forms', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'Parsed forms kept in memory, least recently used dropped first (default: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Form pages downloaded at the same time (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--allow-origin', dest='allow_origin', default='*',
+                        help='Access-Control-Allow-Origin sent to browsers, e.g. https://your.site (default: *)')
+    parser.add_argument('--allow-host', dest='allow_hosts', action='append', default=None,
+                        help=f'Form host the service may fetch from; repeat for more '
+                             f'(default: {", ".join(DEFAULT_ALLOWED_HOSTS)})')
+    args = parser.parse_args()
+    if args.ttl <= 0 or args.max_forms < 1 or args.workers < 1:
+        parser.error("--ttl, --max-forms and --workers must be positive")
+
+    service = FormService(args.ttl, args.max_forms, args.workers, args.allow_hosts or DEFAULT_ALLOWED_HOSTS)
+    server = FormServiceServer(service, args.allow_origin)
+
+    def ready(listening):
+        host, port = listening.sockets[0].getsockname()[:2]
+        print(f"Form service on http://{host}:{port}/form?url=<Google Form URL>")
+        print("Point the web UI at it with <meta name=\"form-service-url\" content=\"http://"
+              f"{host}:{port}\"> or localStorage.formServiceUrl")
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,104 @@
+import json
+
+# 精簡題目編碼：選項以索引代替原文，回答再在本地還原
+COMPACT_INSTRUCTIONS = [
+    "Fill out the form below with realistic, DIVERSE answers; spread choices across all options and the full scale range.",
+    "Questions are numbered #N; * marks required ones. Reply with a JSON array holding one answer per #N, in order.",
+    "choice/dropdown/grid: the 0-based index of one listed option. checkbox: an array of indexes. "
+    "scale: a number in the range. text: a short string. "
+    "date: {\"year\": YYYY, \"month\": MM, \"day\": DD}. time: {\"hour\": HH, \"minute\": MM}.",
+    "Use \"\" only for optional questions you skip; never null.",
+]
+
+KIND_NAMES = {0: "text", 1: "text", 2: "choice", 3: "dropdown", 4: "checkbox", 5: "scale", 9: "date", 10: "time"}
+
+# 以索引作答的題型
+CODED_TYPES = (2, 3, 4, 7)
+
+
+def _options(options):
+    return json.dumps(list(options or ()), ensure_ascii=False)
+
+
+def _scale_range(question):
+    numbers = [option for option in question.options or () if option.lstrip('-').isdigit()]
+    if not numbers:
+        return _options(question.options)
+    text = f"{numbers[0]}..{numbers[-1]}"
+    if question.min or question.max:
+        text += f" ({numbers[0]}={question.min or ''}, {numbers[-1]}={question.max or ''})"
+    return text
+
+
+def compact_form_string(form):
+    """Encode ``form`` for the prompt with one short line per answer.
+
+    Option lists are printed once per question (once per grid) and answered by
+    index; :func:`decode_answers` maps the indexes back to the option text.
+    """
+    lines = []
+    position = 0
+    for section in form.sections:
+        questions = section.questions
+        required = "*" if any(question.required for question in questions) else ""
+        if section.type == 7:
+            first = questions[0]
+            kind = "checkbox grid" if first.selection_type == 1 else "grid"
+            last = position + len(questions) - 1
+            lines.append(f"#{position}-{last} {section.title} [{kind}{required}] {_options(first.options)}")
+            for question in questions:
+                lines.append(f"  #{position} {question.columns}")
+                position += 1
+            continue
+        kind = KIND_NAMES.get(section.type, "text")
+        for question in questions:
+            line = f"#{position} {section.title} [{kind}{'*' if question.required else ''}]"
+            if section.type == 5:
+                line += " " + _scale_range(question)
+            elif section.type in CODED_TYPES:
+                line += " " + _options(question.options)
+            lines.append(line)
+            position += 1
+    return "\n".join(lines)
+
+
+def _decode_code(value, options):
+    """Option text for an index answer; anything that is not a valid index is returned unchanged."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        if not text.isdigit() or text in options:
+            return value
+        value = int(text)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and 0 <= value < len(options):
+        return options[value]
+    return value
+
+
+def decode_answers(form, answers):
+    """Map the index answers of a compact reply back to option text.
+
+    Only choice, dropdown, checkbox and grid answers are decoded; values that
+    are not valid indexes (e.g. the option text itself) are left for the
+    validator to match.
+    """
+    if not isinstance(answers, list):
+        return answers
+    decoded = list(answers)
+    for index, (section, question) in enumerate(form.iter_questions()):
+        if index < len(decoded):
+            decoded[index] = decode_answer(section, question, decoded[index])
+    return decoded
+
+
+def decode_answer(section, question, value):
+    """:func:`decode_answers` for the answer to one question."""
+    if section.type not in CODED_TYPES:
+        return value
+    options = question.options or ()
+    if isinstance(value, list):
+        return [_decode_code(item, options) for item in value]
+    return _decode_code(value, options)
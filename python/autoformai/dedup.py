@@ -0,0 +1,84 @@
+import hashlib
+import json
+import threading
+
+from .compact import CODED_TYPES
+
+
+def answers_digest(answers):
+    """Stable 128-bit digest of one answer set (key order and spacing do not matter)."""
+    text = json.dumps(answers, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def choice_positions(form):
+    """Answer positions of choice, dropdown, checkbox, scale and grid questions."""
+    return [
+        index for index, (section, _) in enumerate(form.iter_questions())
+        if section.type in CODED_TYPES or section.type == 5
+    ]
+
+
+class AnswerIndex:
+    """Remembers every accepted answer set and rejects repeats.
+
+    Exact duplicates are found by digest. With ``max_distance > 0`` an answer
+    set whose choice answers differ from an earlier one in at most that many
+    questions is a near duplicate (Hamming distance over the choice answers;
+    free text is ignored). Candidates are found through the pigeonhole
+    principle: the choice answers are split into ``max_distance + 1`` bands,
+    and two sets within the distance must agree on at least one whole band,
+    so only sets sharing a band are compared. Safe to share between threads.
+    """
+
+    def __init__(self, form, max_distance=0):
+        self.max_distance = max_distance
+        self._positions = choice_positions(form) if max_distance > 0 else []
+        self._digests = set()
+        self._signatures = []
+        self._bands = {}
+        self._lock = threading.Lock()
+        bands = max_distance + 1
+        size = len(self._positions)
+        self._band_slices = [
+            slice(size * band // bands, size * (band + 1) // bands) for band in range(bands)
+        ] if size > max_distance else []
+
+    def __len__(self):
+        return len(self._digests)
+
+    def _signature(self, answers):
+        signature = []
+        for position in self._positions:
+            value = answers[position] if position < len(answers) else None
+            signature.append(tuple(value) if isinstance(value, list) else value)
+        return tuple(signature)
+
+    def _near(self, signature):
+        candidates = set()
+        for band, band_slice in enumerate(self._band_slices):
+            candidates.update(self._bands.get((band, signature[band_slice]), ()))
+        for candidate in candidates:
+            other = self._signatures[candidate]
+            if sum(1 for a, b in zip(signature, other) if a != b) <= self.max_distance:
+                return True
+        return False
+
+    def add(self, answers):
+        """Record ``answers`` and return None, or return why it was rejected (then nothing is recorded)."""
+        digest = answers_digest(answers)
+        with self._lock:
+            if digest in self._digests:
+                return "duplicate"
+            signature = None
+            if self._band_slices:
+                signature = self._signature(answers)
+                if self._near(signature):
+                    return "near duplicate"
+            self._digests.add(digest)
+            if signature is not None:
+                number = len(self._signatures)
+                self._signatures.append(signature)
+                for band, band_slice in enumerate(self._band_slices):
+                    self._bands.setdefault((band, signature[band_slice]), []).append(number)
+        return None
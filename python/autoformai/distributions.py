@@ -0,0 +1,138 @@
+import datetime
+import json
+import math
+from dataclasses import dataclass
+
+# Section types answered from a fixed option list
+CHOICE_TYPES = (2, 3, 5)
+TEXT_TYPES = (0, 1)
+
+
+@dataclass(frozen=True)
+class QuestionDistribution:
+    """Resolved answer distribution for one question.
+
+    ``kind`` is ``choice`` (one of ``values`` with probabilities ``weights``),
+    ``multi`` (each of ``values`` picked independently with probability
+    ``weights[i]``), ``text`` (one of ``values``, empty if there are none),
+    ``date``/``time`` (uniform between ``low`` and ``high``, as day ordinals
+    or minutes after midnight) or ``none`` (always left blank).
+    """
+    __slots__ = ('kind', 'values', 'weights', 'low', 'high', 'required', 'skip')
+
+    kind: str
+    values: tuple
+    weights: tuple
+    low: int
+    high: int
+    required: bool
+    skip: float
+
+
+def load_spec(path):
+    """Read a distribution spec file; None or '' gives the empty (all uniform) spec."""
+    if not path:
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _normalise(weights):
+    total = float(sum(weights))
+    if total <= 0 or any(weight < 0 for weight in weights):
+        raise ValueError("weights must be non-negative and not all zero")
+    return tuple(weight / total for weight in weights)
+
+
+def _option_weights(options, config, label):
+    """Probability per option from ``weights`` ({option: weight}) or ``normal`` ({mean, sd})."""
+    if 'weights' in config:
+        weights = config['weights']
+        unknown = set(weights) - set(options)
+        if unknown:
+            raise ValueError(f"{label}: unknown options in weights: {sorted(unknown)}")
+        return _normalise([weights.get(option, 0) for option in options])
+    if 'normal' in config:
+        # Discretised normal over numeric scale options
+        mean = float(config['normal']['mean'])
+        sd = float(config['normal']['sd'])
+        try:
+            points = [float(option) for option in options]
+        except ValueError:
+            raise ValueError(f"{label}: 'normal' needs numeric options") from None
+        return _normalise([math.exp(-((point - mean) ** 2) / (2 * sd * sd)) for point in points])
+    return _normalise([1] * len(options))
+
+
+def _parse_date(text):
+    return datetime.date.fromisoformat(text).toordinal()
+
+
+def _parse_time(text):
+    hour, minute = text.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def _question_config(spec, section, question):
+    questions = spec.get('questions', {})
+    return questions.get(str(question.entry_id)) or questions.get(section.title) or {}
+
+
+def resolve_distributions(form, spec):
+    """Resolve ``spec`` against ``form``: one QuestionDistribution per question, in answer order.
+
+    Questions are looked up in ``spec["questions"]`` by entry ID, then by
+    title (a grid title covers all of its rows). Anything not listed gets a
+    uniform distribution over its options. ``spec["skip_optional"]`` is the
+    probability of leaving an optional question blank.
+    """
+    skip_optional = float(spec.get('skip_optional', 0))
+    today = datetime.date.today().toordinal()
+    distributions = []
+    for section, question in form.iter_questions():
+        config = _question_config(spec, section, question)
+        label = f"{section.title} (entry {question.entry_id})"
+        type = section.type
+        values = weights = ()
+        low = high = 0
+        if type in CHOICE_TYPES or (type == 7 and question.selection_type != 1):
+            kind = 'choice'
+            values = question.options
+            weights = _option_weights(values, config, label)
+        elif type == 4 or type == 7:
+            kind = 'multi'
+            values = question.options
+            probabilities = config.get('probabilities', {})
+            unknown = set(probabilities) - set(values)
+            if unknown:
+                raise ValueError(f"{label}: unknown options in probabilities: {sorted(unknown)}")
+            weights = tuple(float(probabilities.get(option, 0.5)) for option in values)
+        elif type in TEXT_TYPES:
+            kind = 'text'
+            values = tuple(str(value) for value in config.get('values', ()))
+            if values:
+                weights = _normalise(config.get('weights') or [1] * len(values))
+        elif type == 9:
+            kind = 'date'
+            low = _parse_date(config['start']) if 'start' in config else today - 365
+            high = _parse_date(config['end']) if 'end' in config else today
+        elif type == 10:
+            kind = 'time'
+            low = _parse_time(config.get('start', '00:00'))
+            high = _parse_time(config.get('end', '23:59'))
+        else:
+            kind = 'none'
+        if low > high:
+            raise ValueError(f"{label}: start is after end")
+        skip = 0.0 if question.required else float(config.get('skip', skip_optional))
+        distributions.append(QuestionDistribution(kind, values, weights, low, high, bool(question.required), skip))
+    return distributions
+
+
+def missing_text(form, distributions):
+    """Titles of required free-text questions that have no ``values`` to sample from."""
+    return [
+        section.title
+        for (section, _), distribution in zip(form.iter_questions(), distributions)
+        if distribution.kind == 'text' and distribution.required and not distribution.values
+    ]
@@ -0,0 +1,191 @@
+import re
+import json
+
+from .prefill import PrefillTemplate
+from .schema import Form, Question, Section
+
+SECTION_TYPE = ["簡答","詳答","選擇題","下拉式選單","核取方塊","線性刻度","標題","單選方格/核取方格","區段","日期","時間","圖片","12","檔案"]
+REQUIRED_TYPE = ["非必填","必填"]
+SELECTION_TYPE = ["單選方格","核取方格"]
+
+LOAD_DATA_MARKER = 'FB_PUBLIC_LOAD_DATA_'
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'\s*')
+
+
+def extract_load_data(text):
+    """Decode the FB_PUBLIC_LOAD_DATA_ array embedded in a form page.
+
+    Finds the marker, skips to the value after ``=`` and lets
+    ``JSONDecoder.raw_decode`` parse in place up to the matching closing
+    bracket, so semicolons inside titles or options are handled and no copy
+    of the page or the constant is made. Returns None if the page has none.
+    """
+    start = text.find(LOAD_DATA_MARKER)
+    while start != -1:
+        equals = text.find('=', start + len(LOAD_DATA_MARKER))
+        if equals == -1:
+            break
+        value_start = _whitespace.match(text, equals + 1).end()
+        if text.startswith('[', value_start):
+            try:
+                return _decoder.raw_decode(text, value_start)[0]
+            except ValueError:
+                pass
+        start = text.find(LOAD_DATA_MARKER, equals)
+    return None
+
+
+# 字串轉題目列表
+def string_to_object_list(js_constant):
+    return array_to_object_list(json.loads(js_constant))
+
+
+# 陣列轉題目列表
+def array_to_object_list(array):
+    """Build a Form from the decoded FB_PUBLIC_LOAD_DATA_ array."""
+    sections = []
+    for section in array[1][1]:
+        if section[4]:
+            type = section[3]
+            question_list = []
+            for tmpe_question in section[4]:
+                options = min_value = max_value = columns = selection_type = None
+
+                if type == 2 or type == 3 or type == 4:
+                    options = tuple(sub_array[0] for sub_array in tmpe_question[1])
+                elif type == 5:
+                    options = tuple(sub_array[0] for sub_array in tmpe_question[1])
+                    min_value = tmpe_question[3][0]
+                    max_value = tmpe_question[3][1]
+                elif type == 7:
+                    selection_type = tmpe_question[11][0]
+                    columns = tmpe_question[3][0]
+                    options = tuple(sub_array[0] for sub_array in tmpe_question[1])
+
+                question_list.append(Question(
+                    entry_id=tmpe_question[0],
+                    required=tmpe_question[2],
+                    options=options,
+                    min=min_value,
+                    max=max_value,
+                    columns=columns,
+                    selection_type=selection_type,
+                ))
+
+            sections.append(Section(section[1], type, tuple(question_list)))
+    return Form(tuple(sections))
+
+
+# 題目列表 轉 作答參數
+def objects_to_result_strings(url, form, answers):
+    """Build the pre-filled URL for one response.
+
+    Compiles the form on every call; when rendering many responses build a
+    PrefillTemplate once and call its ``render`` instead.
+    """
+    return PrefillTemplate(url, form).render(answers)
+
+
+# 把物件變成文字問題，方便去問AI
+def objects_to_string(form):
+    """Convert a parsed form into a human-readable string for the AI prompt.
+
+    Accepts None or an empty form and returns an empty string in that case to
+    avoid TypeError when no form was parsed.
+    """
+    if not form:
+        return ""
+
+    return "\n\n".join(question_to_string(section, question) for section, question in form.iter_questions())
+
+
+# 單一題目轉文字
+def question_to_string(section, question):
+    type = section.type
+    text = f"問題:{section.title}"
+    text += f"\n類型:{SECTION_TYPE[type]}"
+    text += f"\n是否必填:{REQUIRED_TYPE[question.required]}"
+
+    if type == 2 or type == 3 or type == 4:
+        text += f"\n選項:{list(question.options)}"
+    elif type == 5:
+        text += f"\n選項:{list(question.options)}"
+        text += f"\n最小為:{question.min}"
+        text += f"\n最大為:{question.max}"
+    elif type == 7:
+        text += f"\n題目:{question.columns}"
+        text += f"\n選項類型:{SELECTION_TYPE[question.selection_type or 0]}"
+        text += f"\n選項:{list(question.options)}"
+    return text
+
+
+# 陣列作答題目
+def set_answer(form, answer_list):
+    """Return the answers for ``form`` as a tuple aligned with its question order.
+
+    The form itself is never modified, so one parsed form serves every
+    response. Extra trailing answers are ignored.
+    """
+    question_count = form.question_count
+    if len(answer_list) < question_count:
+        raise ValueError(f"expected {question_count} answers, got {len(answer_list)}")
+    return tuple(answer_list[:question_count])
+
+
+def parse_form_page(text):
+    """Extract and parse the FB_PUBLIC_LOAD_DATA_ constant from a form page."""
+    array = extract_load_data(text)
+    if array is not None:
+        return array_to_object_list(array)
+    print("No FB_PUBLIC_LOAD_DATA_ JS constants found on the page.")
+    return None
+
+
+# 獲取Google Form
+def get_form(url, cache=None, refresh=False, session=None):
+    """Fetch and parse a Google Form, going through ``cache`` when one is given.
+
+    A fresh cache entry is returned without touching the network. A stale one
+    is revalidated with If-None-Match / If-Modified-Since, and is used as is
+    when the network is unreachable. ``refresh`` forces a full download.
+    ``session`` (a requests.Session) reuses connections across forms.
+    """
+    entry = cache.load(url) if cache is not None and not refresh else None
+    if entry is not None and cache.is_fresh(entry):
+        return Form.from_dict(entry['form'])
+
+    # requests is only needed when the cache cannot answer
+    import requests
+
+    headers = {}
+    if entry is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        response = (session or requests).get(url, headers=headers)
+    except requests.RequestException as e:
+        if entry is None:
+            raise
+        print(f"Could not reach the form ({e}); using the cached copy.")
+        return Form.from_dict(entry['form'])
+
+    if response.status_code == 304 and entry is not None:
+        cache.touch(url, entry)
+        return Form.from_dict(entry['form'])
+
+    # 检查是否成功获取网页内容
+    if response.status_code == 200:
+        form = parse_form_page(response.text)
+        if form and cache is not None:
+            cache.store(url, form.to_dict(), response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return form
+
+    print("Failed to retrieve the webpage. Status code:", response.status_code)
+    if entry is not None:
+        print("Using the cached copy.")
+        return Form.from_dict(entry['form'])
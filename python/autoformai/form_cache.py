@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "autoformai", "forms")
+DEFAULT_TTL = 3600
+
+FORM_ID_PATTERN = re.compile(r"/forms/d/(?:e/)?([\w-]+)")
+
+
+def form_id_from_url(url):
+    """Return the form ID in a Google Form URL, or a hash of the URL if there is none."""
+    match = FORM_ID_PATTERN.search(url)
+    if match:
+        return match.group(1)
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+class FormCache:
+    """Parsed forms stored as one JSON file per form ID.
+
+    Each entry keeps the parsed form together with the ``ETag`` and
+    ``Last-Modified`` validators of the page it came from, so a stale entry
+    can be revalidated with a conditional request instead of a full download.
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL):
+        self.directory = directory or os.getenv("AUTOFORMAI_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.ttl = ttl
+
+    def _path(self, url):
+        return os.path.join(self.directory, form_id_from_url(url) + ".json")
+
+    def load(self, url):
+        """Return the cached entry for ``url`` or None when missing or unreadable."""
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    def store(self, url, form, etag=None, last_modified=None):
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "form": form,
+        }
+        self._write(url, entry)
+        return entry
+
+    def touch(self, url, entry):
+        """Mark a revalidated entry as fresh again."""
+        entry["fetched_at"] = time.time()
+        self._write(url, entry)
+
+    def _write(self, url, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temp file first so a concurrent reader never sees half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(url))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
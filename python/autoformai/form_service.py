@@ -0,0 +1,221 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from .form import get_form
+from .form_cache import DEFAULT_TTL, form_id_from_url
+
+# 只代理這些網域，避免服務變成任何人都能用的開放代理
+DEFAULT_ALLOWED_HOSTS = ('docs.google.com', 'forms.gle')
+DEFAULT_MAX_ENTRIES = 256
+# 同時下載的表單數（每個執行緒一個連線池）
+DEFAULT_WORKERS = 8
+# 請求行與標頭的大小上限
+MAX_HEADER_BYTES = 16384
+
+STATUS_TEXT = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 502: 'Bad Gateway'}
+
+
+class FormLookupError(Exception):
+    """The form could not be served; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+
+class ParsedFormCache:
+    """Compact JSON of parsed forms, evicted least-recently-used beyond ``max_entries`` and after ``ttl`` seconds."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, body):
+        self._entries[key] = (time.monotonic() + self.ttl, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class FormService:
+    """Fetches and parses Google Forms for the web UI, in place of public CORS proxies.
+
+    Pages are downloaded on a small thread pool, each thread keeping one
+    requests.Session (and its connection pool), and parsed with the same
+    code as the scripts. Concurrent requests for one form share a single
+    download, and the compact JSON of each parsed form (``Form.to_dict()``,
+    the layout the web UI builds itself) is kept in a ParsedFormCache.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, workers=DEFAULT_WORKERS,
+                 allowed_hosts=DEFAULT_ALLOWED_HOSTS):
+        self.cache = ParsedFormCache(max_entries, ttl)
+        self.allowed_hosts = tuple(allowed_hosts)
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='form-fetch')
+        self._sessions = threading.local()
+        self._in_flight = {}
+
+    def _session(self):
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            import requests
+            session = self._sessions.session = requests.Session()
+        return session
+
+    def _fetch(self, url):
+        """Download and parse ``url`` (on a worker thread); returns the compact JSON body."""
+        try:
+            form = get_form(url, session=self._session())
+        except Exception as e:
+            raise FormLookupError(f"could not fetch the form: {e}") from e
+        if not form:
+            raise FormLookupError("no form found at this URL (is it public?)", 404)
+        return json.dumps(form.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def check_url(self, url):
+        parts = urlsplit(url or '')
+        if parts.scheme not in ('http', 'https') or parts.hostname not in self.allowed_hosts:
+            raise FormLookupError(f"only Google Forms URLs are served ({', '.join(self.allowed_hosts)})", 400)
+
+    async def lookup(self, url):
+        """``(body, source)`` for ``url``; ``source`` is ``hit``, ``miss`` or ``coalesced``."""
+        self.check_url(url)
+        key = form_id_from_url(url)
+        body = self.cache.get(key)
+        if body is not None:
+            self.stats['hits'] += 1
+            return body, 'hit'
+        future = self._in_flight.get(key)
+        source = 'coalesced'
+        if future is None:
+            source = 'miss'
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._fetch, url)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        self.stats['misses' if source == 'miss' else 'coalesced'] += 1
+        try:
+            # Shielded: one client hanging up must not cancel the download others wait for
+            body = await asyncio.shield(future)
+        except FormLookupError:
+            self.stats['errors'] += 1
+            raise
+        if source == 'miss':
+            self.cache.put(key, body)
+        return body, source
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FormServiceServer:
+    """A minimal HTTP/1.1 front end for a FormService, on asyncio streams.
+
+    ``GET /form?url=<form URL>`` answers with the parsed form as compact JSON
+    (``X-Cache`` tells hit, miss or coalesced); ``GET /health`` with the
+    cache size and counters. Errors are ``{"error": ...}`` with a 4xx/5xx
+    status. Every response carries CORS headers for ``allow_origin``.
+    Request bodies are never read, so a request that has one is answered
+    and its connection closed.
+    """
+
+    def __init__(self, service, allow_origin='*'):
+        self.service = service
+        self.allow_origin = allow_origin
+
+    async def serve(self, host, port, ready=None):
+        """Serve until cancelled; ``ready`` is called with the listening server."""
+        server = await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                except (ValueError, asyncio.LimitOverrunError):
+                    await self._send(writer, 400, {'error': 'request header too large'}, keep_alive=False)
+                    break
+                parts = request_line.decode('latin-1').split()
+                keep_alive = headers.get('connection', '').lower() != 'close' and parts[-1:] == ['HTTP/1.1']
+                if headers.get('content-length', '0').strip() not in ('', '0') or 'transfer-encoding' in headers:
+                    # The body is never read; left on the connection it would parse as the next request
+                    keep_alive = False
+                if len(parts) != 3:
+                    await self._send(writer, 400, {'error': 'malformed request line'}, keep_alive=False)
+                    break
+                await self._route(writer, parts[0], parts[1], keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer, method, target, keep_alive):
+        path = urlsplit(target)
+        if method == 'OPTIONS':
+            return await self._send(writer, 204, None, keep_alive)
+        if method != 'GET':
+            return await self._send(writer, 405, {'error': 'only GET is supported'}, keep_alive)
+        if path.path == '/health':
+            body = dict(self.service.stats, entries=len(self.service.cache))
+            return await self._send(writer, 200, body, keep_alive)
+        if path.path != '/form':
+            return await self._send(writer, 404, {'error': 'unknown path; use /form?url=...'}, keep_alive)
+        url = parse_qs(path.query).get('url', [''])[0]
+        try:
+            body, source = await self.service.lookup(url)
+        except FormLookupError as e:
+            return await self._send(writer, e.status, {'error': str(e)}, keep_alive)
+        await self._send(writer, 200, body, keep_alive, {'X-Cache': source})
+
+    async def _send(self, writer, status, body, keep_alive, extra_headers=None):
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        headers = {
+            'Access-Control-Allow-Origin': self.allow_origin,
+            'Access-Control-Allow-Methods': 'GET, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            'Content-Length': str(len(body or b'')),
+        }
+        if body is not None:
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+        headers.update(extra_headers or {})
+        head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        writer.write(head.encode('latin-1') + (body or b''))
+        await writer.drain()
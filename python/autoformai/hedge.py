@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .metrics import percentile
+
+# 門檻取最近這麼多次請求延遲的百分位數
+HEDGE_WINDOW = 200
+# 樣本少於此數時不送出備援請求
+HEDGE_MIN_SAMPLES = 20
+# 等待兩份請求時，每隔這麼久檢查一次是否要停止
+STOP_POLL = 0.1
+
+
+class HedgeCancelled(ValueError):
+    """Raised into a streamed copy of a request once the other copy has answered."""
+
+
+class Hedger:
+    """Sends a second copy of a slow request and keeps whichever copy answers first.
+
+    A request still running after the ``percentile``-th percentile of recent
+    request latencies gets a copy, as long as copies stay within ``budget``
+    (a fraction of all requests); nothing is copied until HEDGE_MIN_SAMPLES
+    requests have finished. The first reply that ``accept`` approves wins
+    and the other copy is told to stop: ``send`` receives a threading.Event
+    that is set when its copy lost, and a streamed call checks it at every
+    chunk. A copy still waiting for its slot is not sent at all, and neither
+    is one still waiting when ``stop`` (a threading.Event) is set.
+    ``on_event`` is told ``hedge_requests`` for every request, ``hedged``
+    for every copy sent and ``hedge_won`` when the copy won;
+    ``on_latency(observed, first_copy)`` gets, per request, the latency with
+    hedging and that of the first copy alone (a lower bound when the first
+    copy was cancelled, which it is at its next chunk).
+    """
+
+    def __init__(self, workers, percentile=95.0, budget=0.05, on_event=None, on_latency=None, stop=None):
+        self.percentile = percentile
+        self.budget = budget
+        self.on_event = on_event
+        self.on_latency = on_latency
+        self.stop = stop
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+        # First copies that lost and are still running: future -> (start, latency with hedging)
+        self._losers = {}
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='hedge')
+
+    def threshold(self):
+        """Seconds after which a request gets a copy, or None while there are too few samples."""
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            return percentile(self._latencies, self.percentile)
+
+    def _spend(self):
+        with self._lock:
+            if self._hedges + 1 > self.budget * self._requests:
+                return False
+            self._hedges += 1
+            return True
+
+    def _send(self, send, slot, cancelled):
+        begun = time.perf_counter()
+        try:
+            result = send(slot, cancelled)
+        except Exception:
+            if cancelled.is_set():
+                # A cancelled copy took at least this long; keep the slow tail in the window
+                with self._lock:
+                    self._latencies.append(time.perf_counter() - begun)
+            raise
+        with self._lock:
+            self._latencies.append(time.perf_counter() - begun)
+        return result
+
+    def _copy(self, send, reserve, unreserve, settled, cancelled):
+        try:
+            try:
+                slot = reserve(cancelled)
+            except Exception:
+                with self._lock:
+                    self._hedges -= 1
+                raise
+            if cancelled.is_set():
+                # The first copy answered while this one waited for its slot: send nothing
+                with self._lock:
+                    self._hedges -= 1
+                if unreserve is not None:
+                    unreserve(slot)
+                raise HedgeCancelled("the first copy answered before this one was sent")
+            if self.on_event is not None:
+                self.on_event('hedged')
+        finally:
+            # ``call`` returns only once the copy is either sent or dropped
+            settled.set()
+        return self._send(send, slot, cancelled)
+
+    def call(self, send, slot, reserve, accept=None, unreserve=None):
+        """Run ``send(slot, cancelled)``, plus ``send(reserve(cancelled), cancelled)`` if it is slow; return the winner's result.
+
+        ``reserve`` should give up once ``cancelled`` is set, which happens
+        when the first copy answers or ``stop`` is set. A copy whose
+        ``cancelled`` is set after ``reserve`` returned is not sent either;
+        its slot goes back through ``unreserve``. Either way this returns
+        only after the copy has been sent or dropped. When no copy gives
+        an accepted result, the first copy's result is returned (the second
+        copy's if the first raised) or the first copy's error raised.
+        """
+        with self._lock:
+            self._requests += 1
+        if self.on_event is not None:
+            self.on_event('hedge_requests')
+        started = time.perf_counter()
+        finished = {}
+        cancels = {}
+
+        def submit(task, *task_args):
+            cancelled = threading.Event()
+            future = self._executor.submit(task, *task_args, cancelled)
+            future.add_done_callback(lambda done: finished.setdefault(done, time.perf_counter()))
+            cancels[future] = cancelled
+            return future
+
+        first = submit(self._send, send, slot)
+        threshold = self.threshold()
+        if threshold is not None:
+            wait([first], threshold)
+        if first.done() or threshold is None or not self._spend():
+            try:
+                return first.result()
+            finally:
+                if self.on_latency is not None:
+                    elapsed = time.perf_counter() - started
+                    self.on_latency(elapsed, elapsed)
+        settled = threading.Event()
+        second = submit(self._copy, send, reserve, unreserve, settled)
+
+        winner = None
+        pending = {first, second}
+        while pending and winner is None:
+            done, pending = wait(pending, STOP_POLL if self.stop is not None else None, FIRST_COMPLETED)
+            if self.stop is not None and self.stop.is_set() and not settled.is_set():
+                cancels[second].set()
+            for future in (first, second):
+                if future in done and future.exception() is None and (accept is None or accept(future.result())):
+                    winner = future
+                    break
+        for future in pending:
+            cancels[future].set()
+        ended = time.perf_counter()
+        settled.wait()
+        if self.on_latency is not None:
+            if first.done():
+                self.on_latency(ended - started, finished.get(first, ended) - started)
+            else:
+                # Wait for the first copy to stop (at its next chunk) to learn how long it would have taken
+                with self._lock:
+                    self._losers[first] = (started, ended - started)
+                first.add_done_callback(self._loser_done)
+        if winner is second and self.on_event is not None:
+            self.on_event('hedge_won')
+        if winner is not None:
+            return winner.result()
+        if first.exception() is not None and second.exception() is None:
+            return second.result()
+        return first.result()
+
+    def _loser_done(self, future):
+        with self._lock:
+            entry = self._losers.pop(future, None)
+        if entry is not None:
+            started, observed = entry
+            self.on_latency(observed, time.perf_counter() - started)
+
+    def close(self):
+        # Losers still streaming stop at their next chunk; nothing waits for them,
+        # and the first copies among them count with the time they have taken so far
+        with self._lock:
+            losers, self._losers = self._losers, {}
+        now = time.perf_counter()
+        for started, observed in losers.values():
+            self.on_latency(observed, now - started)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,250 @@
+import argparse
+import importlib.util
+import json
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .batch_run import GENERATORS, BatchSetupError, batch_argument_error, report_stats, run_batch
+from .form import get_form
+from .output import OUTPUT_FORMATS
+
+# YAML is optional (and loaded only for YAML manifests); JSON manifests always work
+HAVE_YAML = importlib.util.find_spec('yaml') is not None
+
+# 清單欄位的別名；其他欄位與命令列選項同名（- 或 _ 皆可）
+KEY_ALIASES = {'url': 'form_url', 'output': 'output_file', 'format': 'output_format'}
+# 所有表單共用的選項，只能在命令列設定
+SHARED_OPTIONS = (
+    'model_name', 'rpm', 'tpm', 'rpd', 'providers', 'delay', 'no_cache', 'refresh', 'cache_ttl', 'metrics', 'prometheus',
+)
+# 同時下載的表單數
+FETCH_WORKERS = 8
+
+Job = namedtuple('Job', ['name', 'url', 'args'])
+Job.__doc__ = """One form of a manifest with its own batch options (an argparse namespace)."""
+
+JobOutcome = namedtuple('JobOutcome', ['job', 'result', 'error'])
+JobOutcome.__doc__ = """A finished job: its BatchResult, or the reason it could not run."""
+
+
+def load_manifest(path):
+    """Read a job manifest (YAML for .yaml/.yml files, JSON otherwise).
+
+    The manifest is ``{"defaults": {...}, "forms": [{...}, ...]}`` or just the
+    list of forms; a form is a URL string or an object with ``url`` and any
+    per-form options.
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith(('.yaml', '.yml')):
+        if not HAVE_YAML:
+            raise RuntimeError("YAML manifests need PyYAML: pip install pyyaml")
+        import yaml
+        manifest = yaml.safe_load(text)
+    else:
+        manifest = json.loads(text)
+    if isinstance(manifest, list):
+        manifest = {'forms': manifest}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('forms'), list) or not manifest['forms']:
+        raise ValueError("the manifest needs a non-empty 'forms' list")
+    return manifest
+
+
+def _option(key, value, base_args):
+    """Map a manifest key to its argparse dest and coerce ``value`` to that option's type."""
+    dest = key.replace('-', '_')
+    dest = KEY_ALIASES.get(dest, dest)
+    if dest in SHARED_OPTIONS:
+        raise ValueError(f"'{key}' is shared by all forms; set it on the command line")
+    if dest == 'form_url':
+        return dest, str(value)
+    if not hasattr(base_args, dest):
+        raise ValueError(f"unknown option '{key}'")
+    current = getattr(base_args, dest)
+    if isinstance(current, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"'{key}' must be true or false")
+    elif isinstance(current, int):
+        value = int(value)
+    elif isinstance(current, float):
+        value = float(value)
+    elif value is not None:
+        value = str(value)
+    if dest == 'generator' and value not in GENERATORS:
+        raise ValueError(f"generator must be one of {', '.join(GENERATORS)}")
+    if dest == 'output_format' and value not in OUTPUT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(OUTPUT_FORMATS)}")
+    return dest, value
+
+
+def make_jobs(manifest, base_args):
+    """Build one Job per manifest form.
+
+    Options are layered: the command line, then the manifest's ``defaults``,
+    then the form's own entry. A form without ``output`` writes to
+    ``<name>.<format>``, where ``name`` defaults to ``form<N>``.
+    """
+    defaults = manifest.get('defaults') or {}
+    jobs = []
+    outputs = {}
+    for number, entry in enumerate(manifest['forms'], 1):
+        if isinstance(entry, str):
+            entry = {'url': entry}
+        name = str(entry.get('name') or f"form{number}")
+        label = f"form #{number} ({name})"
+        args = argparse.Namespace(**vars(base_args))
+        url = None
+        has_output = False
+        for source in (defaults, entry):
+            for key, value in source.items():
+                if key == 'name':
+                    continue
+                try:
+                    dest, value = _option(key, value, base_args)
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"{label}: {e}") from e
+                if dest == 'form_url':
+                    url = value
+                else:
+                    setattr(args, dest, value)
+                    has_output = has_output or dest == 'output_file'
+        if not url:
+            raise ValueError(f"{label} has no url")
+        if not has_output:
+            args.output_file = f"{name}.{args.output_format}"
+        problem = batch_argument_error(args)
+        if problem:
+            raise ValueError(f"{label}: {problem}")
+        if args.output_file in outputs:
+            raise ValueError(f"{label} writes to {args.output_file}, like {outputs[args.output_file]}")
+        outputs[args.output_file] = label
+        jobs.append(Job(name, url, args))
+    return jobs
+
+
+def fetch_forms(urls, cache=None, refresh=False, log=print):
+    """Fetch and parse every distinct URL concurrently over one HTTP session.
+
+    Returns ``{url: form}``, with None for forms that could not be fetched.
+    """
+    import requests
+
+    urls = list(dict.fromkeys(urls))
+
+    def fetch(url):
+        try:
+            return get_form(url, cache=cache, refresh=refresh, session=session)
+        except requests.RequestException as e:
+            log(f"Error: could not reach {url}: {e}")
+            return None
+
+    with requests.Session() as session, ThreadPoolExecutor(min(FETCH_WORKERS, len(urls))) as executor:
+        return dict(zip(urls, executor.map(fetch, urls)))
+
+
+class JobProgress:
+    """Response counts over all jobs, printed as one line at most every ``interval`` seconds."""
+
+    def __init__(self, total, forms, log=print, interval=2.0):
+        self.total = total
+        self.forms = forms
+        self.log = log
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.forms_done = 0
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, error=None):
+        with self._lock:
+            self.done += 1
+            if error is not None:
+                self.failed += 1
+            now = time.monotonic()
+            if now - self._last >= self.interval or self.done == self.total:
+                self._last = now
+                self._print()
+
+    def job_finished(self, skipped=0):
+        """Count a finished form; ``skipped`` responses (not run or resumed) leave the total."""
+        with self._lock:
+            self.forms_done += 1
+            self.total -= skipped
+            self._print()
+
+    def _print(self):
+        self.log(f"Progress: {self.done}/{self.total} responses ({self.failed} failed), "
+                 f"{self.forms_done}/{self.forms} forms finished")
+
+
+def run_jobs(jobs, forms, pool=None, parallel=2, log=print, metrics=None):
+    """Run every job, ``parallel`` forms at a time, all sharing ``pool`` and ``metrics``.
+
+    Each job's status lines are prefixed with its name; per-response lines
+    are replaced by one combined progress line. Returns JobOutcomes in
+    manifest order.
+    """
+    lock = threading.Lock()
+
+    def locked_log(line):
+        with lock:
+            log(line)
+
+    progress = JobProgress(sum(job.args.batch for job in jobs), len(jobs), locked_log)
+
+    def run(job):
+        def job_log(line):
+            locked_log(f"[{job.name}] {line.strip()}")
+
+        form = forms.get(job.url)
+        try:
+            if not form:
+                raise BatchSetupError(f"failed to fetch or parse the Google Form at: {job.url}")
+            result = run_batch(form, job.url, job.args, pool, job_log, progress, metrics, job.name)
+        except BatchSetupError as e:
+            job_log(f"✗ Error: {e}")
+            outcome = JobOutcome(job, None, str(e))
+        except Exception as e:
+            job_log(f"✗ Stopped: {e}")
+            outcome = JobOutcome(job, None, str(e))
+        else:
+            job_log(f"✓ {result.succeeded}/{result.pending} successful, {result.failed} failed "
+                    f"-> {job.args.output_file}")
+            outcome = JobOutcome(job, result, None)
+        progress.job_finished(job.args.batch - outcome.result.pending if outcome.result else job.args.batch)
+        return outcome
+
+    with ThreadPoolExecutor(max(1, min(parallel, len(jobs)))) as executor:
+        return list(executor.map(run, jobs))
+
+
+def print_jobs_summary(outcomes, pool=None, elapsed=None, metrics=None, log=print):
+    """One table row per form, then the totals and counters of the whole job."""
+    width = max([len(outcome.job.name) for outcome in outcomes] + [4])
+    log("=" * 60)
+    log(f"  {'form':<{width}}  {'ok':>7}  {'failed':>6}  output")
+    totals = Counter()
+    stats = Counter()
+    for outcome in outcomes:
+        job, result = outcome.job, outcome.result
+        if result is None:
+            log(f"  {job.name:<{width}}  {'-':>7}  {'-':>6}  not run: {outcome.error}")
+            totals['not_run'] += 1
+            continue
+        ok = f"{result.succeeded}/{result.pending}"
+        log(f"  {job.name:<{width}}  {ok:>7}  {result.failed:>6}  {job.args.output_file}")
+        totals['succeeded'] += result.succeeded
+        totals['failed'] += result.failed
+        totals['pending'] += result.pending
+        stats.update(result.stats)
+    log(f"\n✓ Completed: {totals['succeeded']}/{totals['pending']} successful, {totals['failed']} failed "
+        f"across {len(outcomes)} form(s)" + (f", {totals['not_run']} not run" if totals['not_run'] else ""))
+    if elapsed:
+        log(f"  Elapsed: {elapsed:.1f}s ({totals['succeeded'] / elapsed:.1f} responses/s)")
+    report_stats(stats, "the answer cache", pool, log)
+    timings = metrics.report() if metrics is not None else ""
+    if timings:
+        log(timings)
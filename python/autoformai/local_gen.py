@@ -0,0 +1,66 @@
+import datetime
+import random
+
+from .distributions import TEXT_TYPES, resolve_distributions
+from .schema import Form
+
+
+class LocalAnswerGenerator:
+    """Samples answer sets from per-question distributions without calling a model.
+
+    Each response index gets its own RNG seeded from ``(seed, index)``, so the
+    same index always produces the same answers; ``--resume`` and reruns are
+    reproducible.
+    """
+
+    def __init__(self, form, spec=None, seed=0):
+        self.form = form
+        self.seed = seed
+        self.distributions = resolve_distributions(form, spec or {})
+
+    def generate(self, index):
+        rng = random.Random(f"{self.seed}:{index}")
+        return [self._sample(rng, distribution) for distribution in self.distributions]
+
+    def _sample(self, rng, distribution):
+        kind = distribution.kind
+        if kind == 'none' or (distribution.skip and rng.random() < distribution.skip):
+            return [] if kind == 'multi' else ""
+        if kind == 'choice':
+            return rng.choices(distribution.values, distribution.weights)[0]
+        if kind == 'multi':
+            picked = [value for value, p in zip(distribution.values, distribution.weights) if rng.random() < p]
+            if not picked and distribution.required and any(distribution.weights):
+                picked = rng.choices(distribution.values, distribution.weights)
+            return picked
+        if kind == 'text':
+            if not distribution.values:
+                return ""
+            return rng.choices(distribution.values, distribution.weights)[0]
+        if kind == 'date':
+            day = datetime.date.fromordinal(rng.randint(distribution.low, distribution.high))
+            return {"year": day.year, "month": day.month, "day": day.day}
+        minutes = rng.randint(distribution.low, distribution.high)
+        return {"hour": minutes // 60, "minute": minutes % 60}
+
+
+def text_only_form(form):
+    """The free-text part of ``form`` plus the answer positions it covers.
+
+    Used by the hybrid generator: the model answers only these questions and
+    everything else is sampled locally.
+    """
+    sections = tuple(section for section in form.sections if section.type in TEXT_TYPES)
+    positions = [
+        index for index, (section, _) in enumerate(form.iter_questions())
+        if section.type in TEXT_TYPES
+    ]
+    return Form(sections), positions
+
+
+def merge_answers(local_answers, model_answers, positions):
+    """Overlay ``model_answers`` onto ``local_answers`` at ``positions``."""
+    merged = list(local_answers)
+    for position, answer in zip(positions, model_answers):
+        merged[position] = answer
+    return merged
@@ -0,0 +1,287 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# 每個工作單位（一次API呼叫或一批本地產生）的計時階段
+CALL_STAGES = ('queue', 'rate_wait', 'api', 'backoff', 'generate', 'parse', 'validate', 'url', 'total')
+# 整次執行只量一次、或不屬於單一呼叫的階段（submit/job_wait/fetch：--mode bulk的批次工作）
+RUN_STAGES = ('get_form', 'write', 'submit', 'job_wait', 'fetch')
+# --hedge時每次請求的延遲：實際得到回覆的時間、以及只靠第一份請求的時間（被取消時為下限）
+HEDGE_STAGES = ('hedged', 'unhedged')
+# --mode interactive的處理管線階段（見batch.run_staged），依資料流動順序
+PIPELINE_STAGES = ('source', 'validator', 'renderer', 'writer')
+PIPELINE_COUNTERS = ('units', 'responses', 'busy', 'idle', 'blocked', 'worker_seconds')
+PERCENTILES = (50, 95, 99)
+TOKEN_KINDS = ('prompt_tokens', 'cached_tokens', 'output_tokens')
+
+
+def percentile(values, q):
+    """Nearest-rank percentile ``q`` (0-100) of ``values``; 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class CallTimer:
+    """Stage timings, attempts and token counts of one work unit.
+
+    Stages are exclusive: time spent in a stage nested inside another (an
+    API call made while validating, say) counts only for the inner one, so
+    the stages of a call add up to its total. Time between :meth:`queued`
+    and :meth:`dequeued` (waiting for the next pipeline stage) counts as
+    ``queue``.
+    """
+
+    def __init__(self, indices, submitted=None):
+        self.indices = list(indices)
+        self.started = time.perf_counter()
+        self.origin = self.started if submitted is None else min(submitted, self.started)
+        self.stages = Counter()
+        if submitted is not None:
+            self.stages['queue'] = self.started - self.origin
+        self.attempts = 0
+        self.tokens = Counter()
+        self.failed = 0
+        self._children = []
+        self._queued = None
+
+    def queued(self):
+        self._queued = time.perf_counter()
+
+    def dequeued(self):
+        if self._queued is not None:
+            self.stages['queue'] += time.perf_counter() - self._queued
+            self._queued = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] += elapsed - self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+
+    def add_usage(self, usage):
+        if usage is not None:
+            for kind, count in zip(TOKEN_KINDS, usage):
+                self.tokens[kind] += count
+
+    def finish(self):
+        self.dequeued()
+        self.stages['total'] = time.perf_counter() - self.origin
+
+
+class Metrics:
+    """Timings and token usage of a run, optionally streamed to a JSONL file.
+
+    Every finished work unit becomes one ``{"type": "call", ...}`` line with
+    its stage times in seconds; :meth:`close` appends a ``{"type":
+    "summary", ...}`` line with p50/p95/p99 per stage, achieved request rate
+    and tokens per response. Safe to share between threads and between the
+    forms of a jobs run.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.started = time.perf_counter()
+        self.samples = defaultdict(list)
+        self.tokens = Counter()
+        self.requests = 0
+        self.responses = 0
+        self.failed = 0
+        self.pipeline = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8') if path else None
+
+    def add(self, stage, seconds):
+        """Record a run-level stage such as ``get_form``."""
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add_pipeline(self, stage_stats):
+        """Add the StageStats of one pipeline run (``{stage name: StageStats}``)."""
+        with self._lock:
+            for name, stats in stage_stats.items():
+                self.pipeline[name].update({counter: getattr(stats, counter) for counter in PIPELINE_COUNTERS})
+
+    def record(self, timer, label=None):
+        """Record a finished CallTimer; ``label`` names the form in jobs runs."""
+        timer.finish()
+        with self._lock:
+            for stage, seconds in timer.stages.items():
+                self.samples[stage].append(seconds)
+            self.tokens.update(timer.tokens)
+            self.requests += timer.attempts
+            self.responses += len(timer.indices) - timer.failed
+            self.failed += timer.failed
+            if self._file is not None:
+                record = {'type': 'call'}
+                if label is not None:
+                    record['form'] = label
+                record.update({'indices': timer.indices, 'attempts': timer.attempts, 'failed': timer.failed})
+                record.update((stage, round(timer.stages[stage], 6)) for stage in CALL_STAGES if stage in timer.stages)
+                record.update(timer.tokens)
+                self._file.write(json.dumps(record) + '\n')
+                self._file.flush()
+
+    def summary(self):
+        """Aggregates of everything recorded so far, as a JSON-ready dict."""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            stages = {}
+            for stage, values in self.samples.items():
+                stages[stage] = dict(
+                    {f'p{q}': round(percentile(values, q), 6) for q in PERCENTILES},
+                    count=len(values), sum=round(sum(values), 6),
+                )
+            return {
+                'type': 'summary',
+                'elapsed': round(elapsed, 3),
+                'requests': self.requests,
+                'responses': self.responses,
+                'failed': self.failed,
+                'requests_per_minute': round(self.requests / elapsed * 60, 2) if elapsed else 0.0,
+                'responses_per_minute': round(self.responses / elapsed * 60, 2) if elapsed else 0.0,
+                'tokens': dict(self.tokens),
+                'tokens_per_response': round(
+                    (self.tokens['prompt_tokens'] + self.tokens['output_tokens']) / self.responses, 1
+                ) if self.responses else 0.0,
+                'stages': stages,
+                'pipeline': {
+                    name: {counter: round(value, 6) for counter, value in counters.items()}
+                    for name, counters in self.pipeline.items()
+                },
+            }
+
+    def report(self):
+        """Console lines: percentiles of the stages that took time, achieved rates."""
+        summary = self.summary()
+        lines = []
+        for stage in CALL_STAGES + RUN_STAGES + HEDGE_STAGES:
+            values = summary['stages'].get(stage)
+            if values and values['sum'] >= 0.0005:
+                lines.append(f"    {stage:<10} " + " / ".join(f"{values[f'p{q}']:.3f}" for q in PERCENTILES)
+                             + f" s  (n={values['count']})")
+        if lines:
+            lines.insert(0, "  Stage times p50 / p95 / p99:")
+        if 'hedged' in summary['stages']:
+            hedged, unhedged = (summary['stages'][stage] for stage in HEDGE_STAGES)
+            lines.append(f"  Hedging: p99 request latency {hedged['p99']:.3f} s, "
+                         f"at least {unhedged['p99']:.3f} s from first copies alone")
+        pipeline = [name for name in PIPELINE_STAGES if name in summary['pipeline']]
+        if pipeline:
+            lines.append("  Pipeline stages (responses per busy worker-second, share of worker time busy, "
+                         "time blocked on a full queue):")
+            for name in pipeline:
+                counters = summary['pipeline'][name]
+                # A stage with next to no work (the validator of local runs) has no meaningful rate
+                rate = (f"{counters['responses'] / counters['busy']:.1f}/s"
+                        if counters['busy'] >= 0.001 * counters['worker_seconds'] else "-")
+                busy = counters['busy'] / counters['worker_seconds'] if counters['worker_seconds'] else 0.0
+                lines.append(f"    {name:<10} {counters['responses']:>8g} responses  {rate:>11}  "
+                             f"{busy:>4.0%} busy  {counters['blocked']:.2f} s blocked")
+        if summary['requests']:
+            lines.append(f"  Achieved {summary['requests_per_minute']:g} requests/min, "
+                         f"{summary['responses_per_minute']:g} responses/min, "
+                         f"{summary['tokens_per_response']:g} tokens per response")
+        return "\n".join(lines)
+
+    def prometheus(self, labels=None):
+        """The summary in Prometheus text exposition format."""
+        summary = self.summary()
+        base = ''.join(f'{key}="{value}",' for key, value in sorted((labels or {}).items()))
+
+        def sample(name, value, extra=''):
+            inner = (base + extra).rstrip(',')
+            return f"{name}{{{inner}}} {value}" if inner else f"{name} {value}"
+
+        lines = [
+            "# HELP autoformai_stage_seconds Time per work unit spent in each stage.",
+            "# TYPE autoformai_stage_seconds summary",
+        ]
+        for stage, values in sorted(summary['stages'].items()):
+            for q in PERCENTILES:
+                lines.append(sample('autoformai_stage_seconds', values[f'p{q}'],
+                                    f'stage="{stage}",quantile="{q / 100:g}",'))
+            lines.append(sample('autoformai_stage_seconds_sum', values['sum'], f'stage="{stage}",'))
+            lines.append(sample('autoformai_stage_seconds_count', values['count'], f'stage="{stage}",'))
+        lines += [
+            "# HELP autoformai_responses_total Responses generated, by result.",
+            "# TYPE autoformai_responses_total counter",
+            sample('autoformai_responses_total', summary['responses'], 'result="ok",'),
+            sample('autoformai_responses_total', summary['failed'], 'result="failed",'),
+            "# HELP autoformai_api_requests_total API requests sent, retries included.",
+            "# TYPE autoformai_api_requests_total counter",
+            sample('autoformai_api_requests_total', summary['requests']),
+            "# HELP autoformai_tokens_total Tokens reported by the API, by kind.",
+            "# TYPE autoformai_tokens_total counter",
+        ]
+        for kind in TOKEN_KINDS:
+            lines.append(sample('autoformai_tokens_total', summary['tokens'].get(kind, 0),
+                                f'kind="{kind[:-len("_tokens")]}",'))
+        if summary['pipeline']:
+            lines += [
+                "# HELP autoformai_pipeline_responses_total Responses that passed through each pipeline stage.",
+                "# TYPE autoformai_pipeline_responses_total counter",
+            ]
+            lines += [sample('autoformai_pipeline_responses_total', counters['responses'], f'stage="{name}",')
+                      for name, counters in sorted(summary['pipeline'].items())]
+            lines += [
+                "# HELP autoformai_pipeline_seconds_total Worker time of each pipeline stage, by state.",
+                "# TYPE autoformai_pipeline_seconds_total counter",
+            ]
+            for name, counters in sorted(summary['pipeline'].items()):
+                for state in ('busy', 'idle', 'blocked'):
+                    lines.append(sample('autoformai_pipeline_seconds_total', counters[state],
+                                        f'stage="{name}",state="{state}",'))
+        lines += [
+            "# HELP autoformai_requests_per_minute API requests per minute achieved over the run.",
+            "# TYPE autoformai_requests_per_minute gauge",
+            sample('autoformai_requests_per_minute', summary['requests_per_minute']),
+            "# HELP autoformai_tokens_per_response Prompt plus output tokens per generated response.",
+            "# TYPE autoformai_tokens_per_response gauge",
+            sample('autoformai_tokens_per_response', summary['tokens_per_response']),
+            "# HELP autoformai_run_seconds Wall time of the run.",
+            "# TYPE autoformai_run_seconds gauge",
+            sample('autoformai_run_seconds', summary['elapsed']),
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, labels=None):
+        """Write :meth:`prometheus` to ``path`` atomically (for node_exporter's textfile collector)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus(labels))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def close(self):
+        """Append the summary line and close the JSONL file."""
+        if self._file is not None:
+            summary = self.summary()
+            with self._lock:
+                self._file.write(json.dumps(summary) + '\n')
+                self._file.close()
+                self._file = None
@@ -0,0 +1,85 @@
+import json
+import os
+
+OUTPUT_FORMATS = ("jsonl", "txt")
+
+
+def read_records(path):
+    """Yield the complete response records of a JSONL output file.
+
+    A truncated last line (the run was killed mid-write) is ignored.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "index" in record and record.get("url"):
+                yield record
+
+
+def read_completed(path):
+    """Return the set of response indices already recorded in a JSONL output file."""
+    return {record["index"] for record in read_records(path)}
+
+
+def format_record(fmt, index, seed, answers, url):
+    """The output line of one response, without the newline."""
+    if fmt == "jsonl":
+        return json.dumps({"index": index, "seed": seed, "answers": answers, "url": url}, ensure_ascii=False)
+    return url
+
+
+class ResultWriter:
+    """Write each finished response to disk as soon as it is available.
+
+    ``jsonl`` writes one object per line with the response index, variation
+    seed, raw answers and URL, which is what ``--resume`` reads back; ``txt``
+    writes bare URLs, one per line. Every :meth:`write` is flushed
+    immediately so a crash loses at most the response being written;
+    :meth:`write_lines` flushes once for the whole group.
+    """
+
+    def __init__(self, path, fmt="jsonl", append=False):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"unknown output format: {fmt}")
+        self.path = path
+        self.format = fmt
+        needs_newline = append and _ends_mid_line(path)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def write(self, index, seed, answers, url):
+        self.write_lines([format_record(self.format, index, seed, answers, url)])
+
+    def write_lines(self, lines):
+        """Write lines made by :func:`format_record` (for this format) with a single flush."""
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _ends_mid_line(path):
+    """True when ``path`` exists and its last byte is not a newline."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except OSError:
+        return False
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+
+from .backend import HAVE_CLIENT_API, GeminiBackend, GenerationError
+from .ratelimit import RateLimiter
+from .retry import FATAL, RATE_LIMIT
+
+# 多組金鑰以逗號分隔，例如 GEMINI_API_KEYS=key1,key2
+KEYS_ENV = 'GEMINI_API_KEYS'
+
+
+class PoolExhaustedError(GenerationError):
+    """Every provider in the pool has used up its daily quota."""
+
+
+def daily_quota_exhausted(error):
+    """True for a 429 caused by a per-day quota (e.g. ``GenerateRequestsPerDayPerProjectPerModel``)."""
+    text = str(error).lower().replace(' ', '').replace('_', '')
+    return 'perday' in text or 'dailylimit' in text
+
+
+class Provider:
+    """One API key + model with its own rate budget and usage counters."""
+
+    def __init__(self, name, api_key, model_name, rpm, tpm=None, rpd=None):
+        self.name = name
+        self.api_key = api_key
+        self.model_name = model_name
+        self.rpd = rpd
+        self.limiter = RateLimiter(rpm, tpm)
+        self.backend = None
+        self.in_flight = 0
+        self.requests = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.tokens = 0
+        self.exhausted = False
+
+    def load(self):
+        """Queued work relative to this provider's current rate; the pool picks the lowest."""
+        return (self.in_flight + 1) / self.limiter.current_rpm
+
+
+class ProviderPool:
+    """Spreads API calls over several keys/models, each paced by its own limiter.
+
+    ``acquire`` picks the least-loaded provider that still has quota and waits
+    for its limiter; ``release`` records the outcome. A 429 throttles only the
+    provider that got it, and one caused by a per-day quota (or reaching the
+    provider's ``rpd``) takes the provider out of rotation for the rest of the
+    run, so the retry lands on another one.
+    """
+
+    def __init__(self, providers):
+        if not providers:
+            raise ValueError("the provider pool is empty")
+        keys = {provider.api_key for provider in providers}
+        if len(keys) > 1 and not HAVE_CLIENT_API:
+            raise ValueError("several API keys need the google-genai package (pip install google-genai)")
+        self.providers = list(providers)
+        self._lock = threading.Lock()
+        for provider in self.providers:
+            provider.backend = GeminiBackend(provider.api_key, provider.model_name)
+
+    def __len__(self):
+        return len(self.providers)
+
+    @property
+    def rpm(self):
+        return sum(provider.limiter.rpm for provider in self.providers)
+
+    @property
+    def current_rpm(self):
+        return sum(provider.limiter.current_rpm for provider in self.providers if not provider.exhausted)
+
+    def acquire(self, tokens=0, cancelled=None):
+        """Reserve a call on the least-loaded available provider, wait for its limiter and return it.
+
+        Once ``cancelled`` (a threading.Event) is set the wait ends, the
+        reservation is undone and GenerationError is raised.
+        """
+        with self._lock:
+            available = [provider for provider in self.providers if not provider.exhausted]
+            if not available:
+                raise PoolExhaustedError("all API keys/models have used up their daily quota")
+            provider = min(available, key=lambda p: (p.load(), p.requests))
+            provider.in_flight += 1
+            provider.requests += 1
+            if provider.rpd and provider.requests >= provider.rpd:
+                provider.exhausted = True
+        waited = provider.limiter.acquire(tokens, cancelled)
+        if waited is None or (cancelled is not None and cancelled.is_set()):
+            self.cancel(provider)
+            raise GenerationError("the call was cancelled before it was sent")
+        return provider
+
+    def cancel(self, provider):
+        """Undo an ``acquire`` whose call was never made (its rate slot is not given back)."""
+        with self._lock:
+            provider.in_flight -= 1
+            provider.requests -= 1
+
+    def release(self, provider, usage=None, error=None):
+        """Record the outcome of a call made on ``provider``."""
+        with self._lock:
+            provider.in_flight -= 1
+            if usage is not None:
+                provider.tokens += usage.prompt_tokens + usage.output_tokens
+            if error is None:
+                provider.succeeded += 1
+            else:
+                provider.failed += 1
+        if error is None:
+            provider.limiter.recover()
+            return
+        if getattr(error, 'kind', None) == RATE_LIMIT:
+            with self._lock:
+                provider.rate_limited += 1
+                daily = daily_quota_exhausted(error)
+                if daily:
+                    provider.exhausted = True
+                failover = any(not p.exhausted for p in self.providers if p is not provider)
+            if daily:
+                # Another provider can take the retry right away; without one, waiting is pointless
+                error.retry_after = None
+                if not failover:
+                    error.kind = FATAL
+            else:
+                provider.limiter.throttle(error.retry_after)
+                if failover:
+                    error.retry_after = None
+
+    def report(self):
+        """Per-provider usage table."""
+        lines = []
+        for provider in self.providers:
+            state = "daily quota used up" if provider.exhausted else f"{provider.limiter.current_rpm:g} RPM"
+            lines.append(
+                f"  {provider.name:<14} {provider.model_name:<24} {provider.requests:>6} calls  "
+                f"{provider.succeeded:>6} ok  {provider.failed:>4} failed  {provider.rate_limited:>4} x429  "
+                f"{provider.tokens:>9} tokens  ({state})"
+            )
+        return "\n".join(lines)
+
+
+def _mask(api_key):
+    return f"key …{api_key[-4:]}" if len(api_key) > 8 else "key"
+
+
+def load_providers(path=None, model_names=(), rpm=15.0, tpm=None, rpd=None, environ=None):
+    """Build the provider list from a pool file, ``GEMINI_API_KEYS`` or ``GEMINI_API_KEY``.
+
+    The pool file is JSON: ``{"providers": [{"api_key": ..., "model": ...,
+    "rpm": ..., "tpm": ..., "rpd": ..., "name": ...}, ...]}``, where
+    ``api_key_env`` may name an environment variable instead of inlining the
+    key and missing budgets default to ``rpm``/``tpm``/``rpd``. Without a file,
+    every key of the environment is paired with every name in ``model_names``
+    (each key/model pair has its own quota). Returns an empty list when no key
+    is configured.
+    """
+    environ = os.environ if environ is None else environ
+    model_names = [name for name in model_names if name]
+    providers = []
+    if path:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        entries = config.get('providers', []) if isinstance(config, dict) else config
+        for number, entry in enumerate(entries, 1):
+            api_key = entry.get('api_key') or environ.get(entry.get('api_key_env', ''), '')
+            if not api_key:
+                raise ValueError(f"provider #{number} has no api_key (or its api_key_env is not set)")
+            model_name = entry.get('model') or (model_names[0] if model_names else None)
+            if not model_name:
+                raise ValueError(f"provider #{number} has no model")
+            providers.append(Provider(
+                entry.get('name') or _mask(api_key),
+                api_key,
+                model_name,
+                float(entry.get('rpm', rpm)),
+                entry.get('tpm', tpm),
+                entry.get('rpd', rpd),
+            ))
+        return providers
+
+    keys = [key.strip() for key in environ.get(KEYS_ENV, '').split(',') if key.strip()]
+    if not keys and environ.get('GEMINI_API_KEY'):
+        keys = [environ['GEMINI_API_KEY']]
+    for api_key in keys:
+        for model_name in model_names:
+            providers.append(Provider(_mask(api_key), api_key, model_name, rpm, tpm, rpd))
+    return providers
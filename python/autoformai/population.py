@@ -0,0 +1,207 @@
+import datetime
+import math
+
+from .distributions import resolve_distributions
+
+# NumPy is optional; only the population generator needs it
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+# Responses generated per vectorised block
+BLOCK_SIZE = 10000
+
+
+def _normal_cdf(x):
+    """Standard normal CDF (Abramowitz & Stegun 7.1.26, absolute error < 1.5e-7)."""
+    z = np.abs(x) / math.sqrt(2)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return 0.5 * (1.0 + np.sign(x) * (1.0 - poly * np.exp(-z * z)))
+
+
+class PopulationBlock:
+    """``size`` generated responses held column-wise as NumPy arrays.
+
+    ``columns[i]`` is, per question, an int array of option/value codes
+    (-1 = left blank) or, for checkbox questions, a boolean (size, options)
+    matrix; date/time columns hold day ordinals / minutes.
+    """
+
+    def __init__(self, engine, columns, size):
+        self.engine = engine
+        self.columns = columns
+        self.size = size
+
+    def row(self, offset):
+        """Decode one response into an answer list aligned with the form's questions."""
+        answers = []
+        for distribution, column in zip(self.engine.distributions, self.columns):
+            kind = distribution.kind
+            if kind == 'multi':
+                answers.append([value for value, picked in zip(distribution.values, column[offset]) if picked])
+                continue
+            code = int(column[offset])
+            if kind == 'none' or code < 0:
+                answers.append("")
+            elif kind == 'date':
+                day = datetime.date.fromordinal(code)
+                answers.append({"year": day.year, "month": day.month, "day": day.day})
+            elif kind == 'time':
+                answers.append({"hour": code // 60, "minute": code % 60})
+            else:
+                answers.append(distribution.values[code])
+        return answers
+
+
+class PopulationEngine:
+    """Generates whole answer populations in vectorised NumPy passes.
+
+    Marginals come from the same distribution spec as the local generator.
+    ``spec["correlations"]`` (``[{"a": key, "b": key, "rho": 0.6}, ...]``,
+    keys being entry IDs or titles of single-choice/scale questions) links
+    questions through a Gaussian copula: correlated normals are mapped to
+    uniforms and then to options by each question's inverse CDF, so the
+    marginals stay as specified. Blocks are seeded by ``(seed, block)``, so a
+    response index always gets the same answers.
+    """
+
+    def __init__(self, form, spec=None, seed=0, block_size=BLOCK_SIZE):
+        if not HAVE_NUMPY:
+            raise RuntimeError("the population generator needs NumPy: pip install numpy")
+        spec = spec or {}
+        self.form = form
+        self.seed = seed
+        self.block_size = block_size
+        self.distributions = resolve_distributions(form, spec)
+        self.titles = [section.title for section, _ in form.iter_questions()]
+        self._choice = [i for i, d in enumerate(self.distributions) if d.kind == 'choice']
+        self._cumulative = [np.cumsum(self.distributions[i].weights) for i in self._choice]
+        self.correlations = self._resolve_correlations(form, spec.get('correlations', ()))
+        self._cholesky = self._correlation_factor()
+        # Running tallies of emitted responses for the marginal report
+        self._emitted = 0
+        self._counts = [
+            np.zeros(len(d.values), dtype=np.int64) if d.kind in ('choice', 'multi', 'text') else None
+            for d in self.distributions
+        ]
+        self._pair_sums = [np.zeros(6) for _ in self.correlations]
+
+    def _resolve_correlations(self, form, correlations):
+        lookup = {}
+        for index, (section, question) in enumerate(form.iter_questions()):
+            lookup.setdefault(str(question.entry_id), index)
+            lookup.setdefault(section.title, index)
+        resolved = []
+        for pair in correlations:
+            indices = []
+            for key in (pair['a'], pair['b']):
+                index = lookup.get(str(key))
+                if index is None or self.distributions[index].kind != 'choice':
+                    raise ValueError(f"correlation: {key!r} is not a single-choice or scale question")
+                indices.append(index)
+            rho = float(pair['rho'])
+            if not -1 < rho < 1:
+                raise ValueError(f"correlation: rho must be between -1 and 1, got {rho}")
+            resolved.append((indices[0], indices[1], rho))
+        return resolved
+
+    def _correlation_factor(self):
+        if not self.correlations:
+            return None
+        position = {index: i for i, index in enumerate(self._choice)}
+        matrix = np.eye(len(self._choice))
+        for a, b, rho in self.correlations:
+            matrix[position[a], position[b]] = matrix[position[b], position[a]] = rho
+        try:
+            return np.linalg.cholesky(matrix)
+        except np.linalg.LinAlgError:
+            raise ValueError("correlations are inconsistent (matrix is not positive definite)") from None
+
+    def generate_block(self, block):
+        """Generate responses ``block * block_size`` ... ``(block + 1) * block_size - 1``."""
+        rng = np.random.default_rng([self.seed, block])
+        n = self.block_size
+        columns = [None] * len(self.distributions)
+
+        if self._choice:
+            # Correlated standard normals -> uniforms -> options via each inverse CDF
+            latent = rng.standard_normal((n, len(self._choice)))
+            if self._cholesky is not None:
+                latent = latent @ self._cholesky.T
+            uniforms = _normal_cdf(latent)
+            for j, (index, cumulative) in enumerate(zip(self._choice, self._cumulative)):
+                codes = np.searchsorted(cumulative, uniforms[:, j], side='right')
+                columns[index] = np.minimum(codes, len(cumulative) - 1).astype(np.int32)
+
+        for index, distribution in enumerate(self.distributions):
+            kind = distribution.kind
+            if kind == 'multi':
+                probabilities = np.asarray(distribution.weights)
+                picked = rng.random((n, len(probabilities))) < probabilities
+                if distribution.required and probabilities.any():
+                    # Required checkboxes get one weighted pick when nothing was ticked
+                    empty = ~picked.any(axis=1)
+                    fallback = rng.choice(len(probabilities), size=int(empty.sum()),
+                                          p=probabilities / probabilities.sum())
+                    picked[np.flatnonzero(empty), fallback] = True
+                columns[index] = picked
+            elif kind == 'text':
+                if distribution.values:
+                    columns[index] = rng.choice(len(distribution.values), size=n,
+                                                p=distribution.weights).astype(np.int32)
+                else:
+                    columns[index] = np.full(n, -1, dtype=np.int32)
+            elif kind in ('date', 'time'):
+                columns[index] = rng.integers(distribution.low, distribution.high + 1, size=n)
+            elif kind == 'none':
+                columns[index] = np.full(n, -1, dtype=np.int32)
+
+            if distribution.skip and kind != 'multi':
+                columns[index] = np.where(rng.random(n) < distribution.skip, -1, columns[index])
+            elif distribution.skip:
+                columns[index][rng.random(n) < distribution.skip] = False
+
+        return PopulationBlock(self, columns, n)
+
+    def tally(self, block, offsets):
+        """Count the responses at ``offsets`` of ``block`` towards the achieved marginals."""
+        offsets = np.asarray(offsets, dtype=np.int64)
+        self._emitted += len(offsets)
+        for counts, column in zip(self._counts, block.columns):
+            if counts is None:
+                continue
+            selected = column[offsets]
+            if selected.dtype == bool:
+                counts += selected.sum(axis=0)
+            else:
+                counts += np.bincount(selected[selected >= 0], minlength=len(counts))
+        for sums, (a, b, _) in zip(self._pair_sums, self.correlations):
+            x = block.columns[a][offsets]
+            y = block.columns[b][offsets]
+            answered = (x >= 0) & (y >= 0)
+            x = x[answered].astype(float)
+            y = y[answered].astype(float)
+            sums += (len(x), x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum())
+
+    def report(self):
+        """Target vs achieved marginals (and correlations) of everything tallied so far."""
+        lines = []
+        n = max(self._emitted, 1)
+        for title, distribution, counts in zip(self.titles, self.distributions, self._counts):
+            if counts is None or not distribution.values:
+                continue
+            targets = [p * (1 - distribution.skip) for p in distribution.weights]
+            lines.append(f"{title}")
+            for value, target, count in zip(distribution.values, targets, counts):
+                lines.append(f"    {str(value)[:30]:<30} target {target:6.1%}   achieved {count / n:6.1%}")
+        for (a, b, rho), (n, sx, sy, sxx, syy, sxy) in zip(self.correlations, self._pair_sums):
+            n = max(n, 1)
+            covariance = sxy / n - (sx / n) * (sy / n)
+            spread = math.sqrt(max(sxx / n - (sx / n) ** 2, 0) * max(syy / n - (sy / n) ** 2, 0))
+            achieved = covariance / spread if spread else float('nan')
+            lines.append(f"{self.titles[a]} ~ {self.titles[b]}: latent rho {rho:+.2f}, achieved code correlation {achieved:+.2f}")
+        return "\n".join(lines)
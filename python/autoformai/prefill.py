@@ -0,0 +1,75 @@
+from urllib.parse import quote
+
+DATE_FIELDS = ('year', 'month', 'day')
+TIME_FIELDS = ('hour', 'minute')
+
+# Encoded free-text values kept per template; answers repeat a lot across a run
+MEMO_LIMIT = 65536
+
+
+def encode_value(value):
+    """Percent-encode one answer value for a query string (``&``, ``#``, ``=``, spaces, CJK...)."""
+    return quote(str(value), safe='')
+
+
+class PrefillTemplate:
+    """A form compiled once into a pre-filled URL template.
+
+    Every question becomes a slot holding its ``entry.N=`` key and, for choice
+    questions, a map from each option to its complete percent-encoded
+    ``entry.N=option`` pair. Rendering a response is then a dictionary lookup
+    per answer and a single join; only values that are not known options are
+    encoded at render time (and memoised).
+    """
+    __slots__ = ('base', '_slots', '_memo')
+
+    def __init__(self, url, form):
+        self.base = url + ('&' if '?' in url else '?')
+        slots = []
+        for section, question in form.iter_questions():
+            key_base = f"entry.{question.entry_id}"
+            if section.type == 9 or section.type == 10:
+                fields = DATE_FIELDS if section.type == 9 else TIME_FIELDS
+                keys = tuple((field, f"{key_base}_{field}=") for field in fields)
+                slots.append((keys, None, None))
+            else:
+                key = key_base + '='
+                pairs = {option: key + encode_value(option) for option in question.options or ()}
+                slots.append((None, key, pairs))
+        self._slots = tuple(slots)
+        self._memo = {}
+
+    def _encode(self, key, value):
+        if value.__class__ is int:
+            return key + str(value)
+        if value.__class__ is not str:
+            return key + encode_value(value)
+        encoded = self._memo.get(value)
+        if encoded is None:
+            encoded = encode_value(value)
+            if len(self._memo) < MEMO_LIMIT:
+                self._memo[value] = encoded
+        return key + encoded
+
+    def render(self, answers):
+        """Return the pre-filled URL for ``answers`` (aligned with the form's question order)."""
+        parts = []
+        out = parts.append
+        for (fields, key, pairs), value in zip(self._slots, answers):
+            if fields is not None:
+                if value.__class__ is dict:
+                    for field, field_key in fields:
+                        # 0 is a valid hour/minute, only missing or blank fields are skipped
+                        field_value = value.get(field)
+                        if field_value is not None and field_value != '':
+                            out(self._encode(field_key, field_value))
+            elif not value:
+                continue
+            elif value.__class__ is list:
+                for item in value:
+                    pair = pairs.get(item) if item.__class__ is str else None
+                    out(pair or self._encode(key, item))
+            else:
+                pair = pairs.get(value) if value.__class__ is str else None
+                out(pair or self._encode(key, value))
+        return self.base + "&".join(parts)
@@ -0,0 +1,136 @@
+import threading
+import time
+
+# 自適應限流：遇到429時速率減半，之後每次成功加回一小步（AIMD）
+MIN_RATE_SCALE = 1 / 16
+RATE_INCREASE_STEP = 0.05
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second.
+
+    Callers reserve tokens up front: the balance may go negative and the
+    caller is told how long to wait before its reservation is covered. This
+    keeps waiting callers in FIFO order without polling.
+    """
+
+    def __init__(self, rate, capacity):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def set_rate(self, rate, now):
+        """Change the refill rate from ``now`` on; tokens accrued so far are kept."""
+        self._refill(now)
+        self.rate = float(rate)
+
+    def reserve(self, amount, now):
+        """Take ``amount`` tokens and return the seconds to wait before using them."""
+        self._refill(now)
+        self._tokens -= amount
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def refund(self, amount, now, due):
+        """Give back ``amount`` tokens of an unused reservation that became usable at ``due``.
+
+        Only the latest reservation is given back: callers queued behind an
+        earlier one already sleep until their own time, and a refund would
+        let a new caller go out together with one of them.
+        """
+        self._refill(now)
+        latest = now + max(0.0, -self._tokens) / self.rate
+        if self._tokens < 0 and due >= latest - 1e-6:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter shared by worker threads.
+
+    ``acquire`` blocks the calling thread until both budgets allow the request.
+    The request bucket holds a single token, so requests are spaced 60/rpm
+    seconds apart and no 60 second window sees more than ``rpm + 1`` of them
+    (after an idle spell the next request goes out without waiting). A wait
+    cut short gives its slot back only if nobody reserved after it; otherwise
+    the slot goes unused, so that callers queued behind keep their spacing.
+
+    The request rate adapts to the server: ``throttle`` (called on a 429)
+    halves it, at most once per request interval so a burst of concurrent
+    429s counts once, and pauses everyone for the server's retry hint;
+    ``recover`` (called on success) adds it back in small steps up to ``rpm``.
+    """
+
+    def __init__(self, rpm, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(rpm / 60.0, 1)
+        self._tokens = TokenBucket(tpm / 60.0, tpm / 60.0) if tpm else None
+        self._scale = 1.0
+        self._cooldown_until = 0.0
+        self._paused_until = 0.0
+
+    @property
+    def current_rpm(self):
+        return self.rpm * self._scale
+
+    def acquire(self, tokens=0, cancelled=None):
+        """Block until one request carrying ``tokens`` estimated tokens may be sent.
+
+        Returns the seconds waited, or None when ``cancelled`` (a
+        threading.Event) ended the wait; the request must then not be sent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            request_wait = self._requests.reserve(1, now)
+            token_wait = self._tokens.reserve(tokens, now) if self._tokens is not None and tokens else 0.0
+            wait = max(request_wait, token_wait, self._paused_until - now)
+        if wait > 0:
+            if cancelled is None:
+                time.sleep(wait)
+            elif cancelled.wait(wait):
+                with self._lock:
+                    later = time.monotonic()
+                    self._requests.refund(1, later, now + request_wait)
+                    if self._tokens is not None and tokens:
+                        self._tokens.refund(tokens, later, now + token_wait)
+                return None
+        return wait
+
+    def throttle(self, retry_after=None):
+        """Slow down after a rate-limit error; ``retry_after`` pauses all callers that long."""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._cooldown_until:
+                self._scale = max(MIN_RATE_SCALE, self._scale / 2)
+                self._requests.set_rate(self.rpm / 60.0 * self._scale, now)
+                self._cooldown_until = now + max(1.0, 60.0 / self.current_rpm)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+    def recover(self):
+        """Ramp the request rate back up after a successful request."""
+        if self._scale >= 1.0:
+            return
+        with self._lock:
+            self._scale = min(1.0, self._scale + RATE_INCREASE_STEP)
+            self._requests.set_rate(self.rpm / 60.0 * self._scale, time.monotonic())
+
+
+def estimate_tokens(parts):
+    """Rough prompt token estimate: ~4 ASCII characters per token, one per CJK character."""
+    total = 0
+    for part in parts:
+        ascii_chars = sum(1 for ch in part if ord(ch) < 128)
+        total += ascii_chars // 4 + (len(part) - ascii_chars)
+    return total
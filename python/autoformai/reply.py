@@ -0,0 +1,20 @@
+import json
+
+
+def extract_json_from_response(response_text):
+    """Extract JSON from response text, handling markdown code fences."""
+    json_text = response_text.strip()
+    if json_text.startswith("```json"):
+        # Remove markdown code fences
+        json_text = json_text[7:]  # Remove ```json
+        if json_text.endswith("```"):
+            json_text = json_text[:-3]  # Remove ```
+        json_text = json_text.strip()
+    elif json_text.startswith("```"):
+        # Remove generic code fences
+        json_text = json_text[3:]
+        if json_text.endswith("```"):
+            json_text = json_text[:-3]
+        json_text = json_text.strip()
+    
+    return json.loads(json_text)
@@ -0,0 +1,85 @@
+from .compact import CODED_TYPES
+from .validate import DATE_FIELDS, FIELD_LIMITS, TIME_FIELDS
+
+# 結構化輸出：依表單產生response_schema，回覆保證是可解析的JSON
+STRUCTURED_INSTRUCTION = (
+    "Reply with the JSON object described by the response schema: key qN holds the answer "
+    "to question N (questions counted from 0 in the order above, one per grid row)."
+)
+
+
+def answer_key(index):
+    return f"q{index}"
+
+
+def _fields_schema(fields, required):
+    """Date/time object with the bounds the validator enforces (validate.FIELD_LIMITS)."""
+    return {
+        'type': 'OBJECT',
+        'properties': {name: {'type': 'INTEGER', 'minimum': FIELD_LIMITS[name][0], 'maximum': FIELD_LIMITS[name][1]}
+                       for name in fields},
+        'property_ordering': list(fields),
+        'required': list(fields) if required else [],
+    }
+
+
+def _choice_schema(options, required, compact):
+    if compact:
+        return {'type': 'INTEGER', 'minimum': 0, 'maximum': max(len(options) - 1, 0)}
+    values = list(options)
+    if not required and "" not in values:
+        values.append("")
+    return {'type': 'STRING', 'enum': values}
+
+
+def question_schema(section, question, compact=False):
+    """Schema for the answer to one question (one grid row)."""
+    type = section.type
+    options = question.options or ()
+    multiple = type == 4 or (type == 7 and question.selection_type == 1)
+    if type == 5:
+        numbers = [int(option) for option in options if option.lstrip('-').isdigit()]
+        if numbers:
+            return {'type': 'INTEGER', 'minimum': min(numbers), 'maximum': max(numbers)}
+        return _choice_schema(options, question.required, False)
+    if type in CODED_TYPES and options:
+        item = _choice_schema(options, True, compact)
+        if multiple:
+            return {'type': 'ARRAY', 'items': item, 'min_items': 1 if question.required else 0}
+        return _choice_schema(options, question.required, compact)
+    if type == 9:
+        return _fields_schema(DATE_FIELDS, question.required)
+    if type == 10:
+        return _fields_schema(TIME_FIELDS, question.required)
+    return {'type': 'STRING'}
+
+
+def form_response_schema(form, count=1, compact=False):
+    """``response_schema`` for answering ``form``: an object with one key per question.
+
+    Choice and grid options become enums (or index ranges in compact mode),
+    linear scales integer bounds, and dates/times objects with bounded integer
+    fields. The API schema has no per-position array items, hence the object;
+    :func:`structured_to_answers` turns it back into the usual answer list.
+    With ``count > 1`` the schema is an array of exactly ``count`` such objects.
+    """
+    properties = {}
+    required = []
+    for index, (section, question) in enumerate(form.iter_questions()):
+        key = answer_key(index)
+        schema = question_schema(section, question, compact)
+        title = section.title if section.type != 7 else f"{section.title} - {question.columns}"
+        schema['description'] = str(title)[:200]
+        properties[key] = schema
+        required.append(key)
+    schema = {'type': 'OBJECT', 'properties': properties, 'property_ordering': list(properties), 'required': required}
+    if count > 1:
+        schema = {'type': 'ARRAY', 'items': schema, 'min_items': count, 'max_items': count}
+    return schema
+
+
+def structured_to_answers(form, data):
+    """Answer list from a structured reply object; lists (plain JSON replies) pass through."""
+    if not isinstance(data, dict):
+        return data
+    return [data.get(answer_key(index)) for index in range(form.question_count)]
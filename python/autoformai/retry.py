@@ -0,0 +1,136 @@
+import random
+import re
+import time
+
+# 錯誤分類：哪些錯誤值得重試
+RATE_LIMIT = 'rate_limit'
+SERVER = 'server'
+NETWORK = 'network'
+FATAL = 'fatal'
+RETRYABLE_KINDS = (RATE_LIMIT, SERVER, NETWORK)
+
+RETRYABLE_STATUS = {408: SERVER, 429: RATE_LIMIT, 500: SERVER, 502: SERVER, 503: SERVER, 504: SERVER}
+RATE_LIMIT_STATUS_NAMES = ('RESOURCE_EXHAUSTED', 'TOO_MANY_REQUESTS')
+SERVER_STATUS_NAMES = ('UNAVAILABLE', 'INTERNAL', 'DEADLINE_EXCEEDED')
+
+_retry_hint = re.compile(r'retry(?:[ _-]?delay|[ -]after| in)\W*(?:seconds\W*)?(\d+(?:\.\d+)?)', re.IGNORECASE)
+_network_names = ('Timeout', 'ConnectError', 'ConnectionError', 'ProtocolError', 'ReadError', 'WriteError')
+
+
+def _retry_info_delay(details):
+    """``retryDelay`` of a google.rpc.RetryInfo entry in an API error payload ({"error": {"details": [...]}})."""
+    if not isinstance(details, dict):
+        return None
+    error = details.get('error', details)
+    for item in error.get('details', ()) if isinstance(error, dict) else ():
+        if isinstance(item, dict) and str(item.get('@type', '')).endswith('RetryInfo'):
+            try:
+                return float(str(item.get('retryDelay', '')).rstrip('s'))
+            except ValueError:
+                return None
+    return None
+
+
+def _header_delay(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    value = headers.get('retry-after') if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def classify_error(error):
+    """Return ``(kind, retry_after)`` for an exception raised by an SDK call.
+
+    ``kind`` is ``rate_limit`` (429 / RESOURCE_EXHAUSTED), ``server`` (5xx,
+    timeouts on the server side), ``network`` (connection problems) or
+    ``fatal``. ``retry_after`` is the server's retry hint in seconds, taken
+    from a RetryInfo detail, a Retry-After header or the error message.
+    Works on google.genai and google.api_core errors alike by looking at
+    ``code``/``status`` rather than importing either SDK.
+    """
+    code = getattr(error, 'code', None)
+    if callable(code):
+        # grpc-style errors expose code() instead of an int
+        code = None
+    status = str(getattr(error, 'status', '') or '').upper()
+    kind = FATAL
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        kind = RETRYABLE_STATUS[code]
+    elif status in RATE_LIMIT_STATUS_NAMES:
+        kind = RATE_LIMIT
+    elif status in SERVER_STATUS_NAMES:
+        kind = SERVER
+    elif isinstance(error, (ConnectionError, TimeoutError)) or any(
+            name in type(error).__name__ for name in _network_names):
+        kind = NETWORK
+    elif 'RESOURCE_EXHAUSTED' in str(error):
+        kind = RATE_LIMIT
+
+    retry_after = _retry_info_delay(getattr(error, 'details', None))
+    if retry_after is None:
+        retry_after = _header_delay(error)
+    if retry_after is None and kind != FATAL:
+        match = _retry_hint.search(str(error))
+        retry_after = float(match.group(1)) if match else None
+    return kind, retry_after
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped at ``max_delay``.
+
+    A server retry hint is honoured as the minimum wait (plus a little jitter
+    so that workers throttled together do not come back together).
+    """
+
+    def __init__(self, retries=4, base_delay=1.0, max_delay=60.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number ``attempt + 1``."""
+        if retry_after:
+            return retry_after + random.uniform(0, min(self.base_delay, retry_after * 0.1 + 0.1))
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def call_with_retry(call, policy, limiter=None, on_event=None, cancelled=None):
+    """Run ``call()`` and retry it on transient errors according to ``policy``.
+
+    ``call`` should acquire its own rate-limit slot, so every attempt is paced.
+    Errors need ``kind``/``retry_after`` attributes (``GenerationError`` has
+    them); anything else is raised at once. Rate-limit errors also throttle
+    the shared ``limiter``, successes let it ramp back up. ``on_event`` is told
+    ``retried``/``recovered``/``failed`` once per call that needed them.
+    Setting ``cancelled`` (a threading.Event) cuts a backoff short, and the
+    error that caused it is raised.
+    """
+    attempt = 0
+    while True:
+        try:
+            result = call()
+        except Exception as e:
+            kind = getattr(e, 'kind', FATAL)
+            if kind == RATE_LIMIT and limiter is not None:
+                limiter.throttle(getattr(e, 'retry_after', None))
+            if kind not in RETRYABLE_KINDS or attempt >= policy.retries:
+                if on_event is not None and (attempt or kind in RETRYABLE_KINDS):
+                    on_event('failed')
+                raise
+            if on_event is not None and attempt == 0:
+                on_event('retried')
+            delay = policy.delay(attempt, getattr(e, 'retry_after', None))
+            if cancelled is None:
+                time.sleep(delay)
+            elif cancelled.wait(delay):
+                raise
+            attempt += 1
+            continue
+        if limiter is not None:
+            limiter.recover()
+        if attempt and on_event is not None:
+            on_event('recovered')
+        return result
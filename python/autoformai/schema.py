@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Question:
+    """One answerable item; a grid section has one Question per row.
+
+    ``options``, ``min``/``max``, ``columns`` and ``selection_type`` are only
+    set for the section types that use them and are None otherwise.
+    """
+    __slots__ = ('entry_id', 'required', 'options', 'min', 'max', 'columns', 'selection_type')
+
+    entry_id: int
+    required: int
+    options: tuple
+    min: object
+    max: object
+    columns: object
+    selection_type: object
+
+    def to_dict(self):
+        result = {'entry_id': self.entry_id, 'required': self.required}
+        for key in ('selection_type', 'columns', 'options', 'min', 'max'):
+            value = getattr(self, key)
+            if value is not None:
+                result[key] = list(value) if key == 'options' else value
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        options = data.get('options')
+        return cls(
+            entry_id=data['entry_id'],
+            required=data['required'],
+            options=tuple(options) if options is not None else None,
+            min=data.get('min'),
+            max=data.get('max'),
+            columns=data.get('columns'),
+            selection_type=data.get('selection_type'),
+        )
+
+
+@dataclass(frozen=True)
+class Section:
+    """A form item (SECTION_TYPE index in ``type``) and its questions."""
+    __slots__ = ('title', 'type', 'questions')
+
+    title: str
+    type: int
+    questions: tuple
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'type': self.type,
+            'questions': [question.to_dict() for question in self.questions],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['title'], data['type'], tuple(Question.from_dict(q) for q in data['questions']))
+
+
+@dataclass(frozen=True)
+class Form:
+    """A parsed form, shared read-only by every response of a run.
+
+    Answers are kept outside the form as a sequence aligned with
+    ``iter_questions()`` order, one value per question.
+    """
+    __slots__ = ('sections',)
+
+    sections: tuple
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    @property
+    def question_count(self):
+        return sum(len(section.questions) for section in self.sections)
+
+    def iter_questions(self):
+        """Yield ``(section, question)`` pairs in answer order."""
+        for section in self.sections:
+            for question in section.questions:
+                yield section, question
+
+    def to_dict(self):
+        """The JSON-friendly list-of-dicts layout, as stored in the form cache."""
+        return [section.to_dict() for section in self.sections]
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(tuple(Section.from_dict(section) for section in data))
@@ -0,0 +1,146 @@
+import json
+import re
+
+from .compact import decode_answer
+from .response_schema import answer_key
+from .validate import check_answer
+
+# 回覆開頭允許的markdown code fence（```json）
+_fence = re.compile(r'```[A-Za-z]*\s*')
+
+
+class JsonElementScanner:
+    """Incremental scanner for a streamed JSON reply.
+
+    :meth:`feed` takes the reply text chunk by chunk and returns the top-level
+    elements completed so far, parsed: values for an array, ``(key, value)``
+    pairs for an object. A leading markdown code fence is skipped. Raises
+    ValueError as soon as the text cannot be the expected JSON (prose instead
+    of an array/object, or an element that does not parse).
+    """
+
+    def __init__(self):
+        self.kind = None
+        self.closed = False
+        self._prefix = []
+        self._element = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        elements = []
+        for char in text:
+            if self.closed:
+                break
+            if self.kind is None:
+                self._start(char)
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                self._element.append(char)
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in '[{':
+                self._depth += 1
+            elif char in ']}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush(elements)
+                    self.closed = True
+                    continue
+            elif char == ',' and self._depth == 1:
+                self._flush(elements)
+                continue
+            self._element.append(char)
+        return elements
+
+    def _start(self, char):
+        if char in '[{':
+            prefix = ''.join(self._prefix).strip()
+            if prefix and not _fence.fullmatch(prefix):
+                raise ValueError(f"reply does not start with JSON: {prefix[:40]!r}")
+            self.kind = char
+            self._depth = 1
+            return
+        self._prefix.append(char)
+        prefix = ''.join(self._prefix).lstrip()
+        if prefix and not ('```'.startswith(prefix) or _fence.fullmatch(prefix)):
+            raise ValueError(f"reply does not start with JSON: {prefix[:40]!r}")
+
+    def _flush(self, elements):
+        text = ''.join(self._element).strip()
+        self._element = []
+        if not text:
+            return
+        if self.kind == '[':
+            elements.append(json.loads(text))
+        else:
+            elements.extend(json.loads('{' + text + '}').items())
+
+
+class ReplyChecker:
+    """Checks a streamed reply for ``count`` answer sets of ``form`` while it arrives.
+
+    :meth:`feed` raises ValueError once the reply can no longer yield a usable
+    answer set, so the caller can cancel the stream instead of waiting for
+    (and paying for) the rest: the reply is not JSON, has the wrong shape, or
+    an element does not parse. With ``strict`` (no repair re-asks allowed),
+    a single-set reply is also given up at its first answer that fails
+    validation, since the whole set would be rejected anyway. Answers are
+    checked by position until the first multi-row grid of a plain array
+    reply, where a nested grid answer could shift the positions.
+    """
+
+    def __init__(self, form, count=1, compact=False, strict=False):
+        self.form = form
+        self.count = count
+        self.compact = compact
+        self.strict = strict and count == 1
+        self.scanner = JsonElementScanner()
+        self.elements = 0
+        self._questions = list(form.iter_questions())
+        self._keys = {answer_key(index): index for index in range(len(self._questions))}
+        self._positional = True
+
+    def feed(self, text):
+        for element in self.scanner.feed(text):
+            self._check(element)
+
+    def _check(self, element):
+        position = self.elements
+        self.elements += 1
+        if self.count > 1:
+            if self.scanner.kind != '[':
+                raise ValueError(f"expected a JSON array of {self.count} answer sets")
+            if not isinstance(element, (list, dict)):
+                raise ValueError(f"answer set {position + 1} is not an array or object")
+            return
+        if not self.strict:
+            return
+        if self.scanner.kind == '{':
+            key, value = element
+            index = self._keys.get(key)
+        else:
+            index, value = position, element
+            if index < len(self._questions):
+                section = self._questions[index][0]
+                if section.type == 7 and len(section.questions) > 1:
+                    self._positional = False
+            if not self._positional:
+                return
+        if index is None or index >= len(self._questions):
+            return
+        section, question = self._questions[index]
+        if self.compact:
+            value = decode_answer(section, question, value)
+        try:
+            check_answer(section, question, value)
+        except ValueError as e:
+            raise ValueError(f"answer #{index}: {e}") from e
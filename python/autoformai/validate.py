@@ -0,0 +1,270 @@
+import difflib
+import json
+import re
+from collections import namedtuple
+
+from .form import question_to_string
+
+# difflib ratio needed before a near-miss is accepted as an option
+FUZZY_CUTOFF = 0.8
+
+FIELD_LIMITS = {
+    'year': (1, 9999),
+    'month': (1, 12),
+    'day': (1, 31),
+    'hour': (0, 23),
+    'minute': (0, 59),
+}
+DATE_FIELDS = ('year', 'month', 'day')
+TIME_FIELDS = ('hour', 'minute')
+
+REPAIR_INSTRUCTIONS = [
+    "Some answers in a form response were invalid. Answer ONLY the questions listed below again.",
+    "Return a JSON object whose keys are the question numbers shown after '#' and whose values are the corrected answers.",
+    "For choice questions use one of the listed options exactly. For linear scales use a number within the options.",
+    "For date format use: {\"year\": YYYY, \"month\": MM, \"day\": DD}",
+    "For time format use: {\"hour\": HH, \"minute\": MM}",
+]
+
+ValidationResult = namedtuple('ValidationResult', ['answers', 'problems', 'fixed', 'repaired'])
+ValidationResult.__new__.__defaults__ = (0,)
+ValidationResult.__doc__ = """Checked answers for one response.
+
+``answers`` is aligned with the form's question order, ``problems`` maps the
+index of every answer that could not be fixed locally to the reason,
+``fixed`` counts local corrections and ``repaired`` answers recovered by
+re-asking the model.
+"""
+
+
+def _is_blank(value):
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _canonical(value):
+    """``value`` with its type normalised, so 7, 7.0 and "7" (or "05" and 5) compare equal."""
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and re.fullmatch(r'-?\d+', value):
+        return int(value)
+    return value
+
+
+def _match_option(value, options):
+    """Return the option ``value`` refers to, allowing case, spacing and small typos."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    text = str(value)
+    if text in options:
+        return text
+    folded = text.strip().casefold()
+    for option in options:
+        if option.strip().casefold() == folded:
+            return option
+    close = difflib.get_close_matches(text.strip(), [option for option in options if option], n=1, cutoff=FUZZY_CUTOFF)
+    return close[0] if close else None
+
+
+def _check_choice(value, options):
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    option = _match_option(value, options)
+    if option is None:
+        raise ValueError(f"{value!r} is not one of the options")
+    return option
+
+
+def _check_checkbox(value, options):
+    items = value if isinstance(value, list) else [value]
+    if isinstance(value, str) and ',' in value and _match_option(value, options) is None:
+        # "A, C" instead of ["A", "C"]
+        items = [item.strip() for item in value.split(',')]
+    result = []
+    for item in items:
+        option = _match_option(item, options)
+        if option is None:
+            raise ValueError(f"{item!r} is not one of the options")
+        if option not in result:
+            result.append(option)
+    return result
+
+
+def _check_scale(value, question):
+    """Clamp a linear-scale answer to the numeric range of its options.
+
+    The form data stores the scale's end labels in ``min``/``max``; the numeric
+    bounds come from the options themselves ("1".."10").
+    """
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    option = _match_option(value, question.options)
+    if option is not None:
+        return option
+    numbers = [int(option) for option in question.options if option.lstrip('-').isdigit()]
+    try:
+        number = int(round(float(str(value).strip())))
+    except ValueError:
+        raise ValueError(f"{value!r} is not a number on the scale") from None
+    if not numbers:
+        raise ValueError(f"{value!r} is not one of the options")
+    return str(min(max(number, min(numbers)), max(numbers)))
+
+
+def _check_fields(value, fields):
+    """Normalise a date/time answer to a dict of in-range integers."""
+    if isinstance(value, str):
+        # "2024-05-01", "09:30" and similar
+        numbers = re.findall(r'\d+', value)
+        if len(numbers) < len(fields):
+            raise ValueError(f"{value!r} is not a valid {'/'.join(fields)} value")
+        value = dict(zip(fields, numbers))
+    if not isinstance(value, dict):
+        raise ValueError(f"expected an object with {', '.join(fields)}")
+    result = {}
+    for field in fields:
+        field_value = value.get(field)
+        if field_value is None or field_value == "":
+            continue
+        try:
+            number = int(field_value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} {field_value!r} is not a number") from None
+        low, high = FIELD_LIMITS[field]
+        result[field] = min(max(number, low), high)
+    if not result:
+        raise ValueError(f"expected an object with {', '.join(fields)}")
+    return result
+
+
+def check_answer(section, question, value):
+    """Return ``value`` corrected for ``question``, or raise ValueError with the reason."""
+    type = section.type
+    if _is_blank(value):
+        if question.required:
+            raise ValueError("required question left blank")
+        return [] if type == 4 else ""
+
+    if type == 2 or type == 3:
+        return _check_choice(value, question.options)
+    if type == 4:
+        return _check_checkbox(value, question.options)
+    if type == 5:
+        return _check_scale(value, question)
+    if type == 7:
+        if question.selection_type == 1:
+            return _check_checkbox(value, question.options)
+        return _check_choice(value, question.options)
+    if type == 9:
+        return _check_fields(value, DATE_FIELDS)
+    if type == 10:
+        return _check_fields(value, TIME_FIELDS)
+    if type == 0 or type == 1:
+        if isinstance(value, list) and all(isinstance(item, (str, int, float)) for item in value):
+            return ", ".join(str(item) for item in value)
+        if isinstance(value, (dict, list)):
+            raise ValueError("expected a text answer")
+        return str(value)
+    return value
+
+
+def _align(form, answers):
+    """Expand grids answered as one nested array per grid instead of one answer per row."""
+    missing = form.question_count - len(answers)
+    if missing <= 0:
+        return list(answers), 0
+    aligned = []
+    position = 0
+    expanded = 0
+    for section in form.sections:
+        rows = len(section.questions)
+        value = answers[position] if position < len(answers) else None
+        if (section.type == 7 and 1 < rows and rows - 1 <= missing
+                and isinstance(value, list) and len(value) == rows):
+            aligned.extend(value)
+            position += 1
+            missing -= rows - 1
+            expanded += 1
+        else:
+            aligned.extend(answers[position:position + rows])
+            position += rows
+    return aligned, expanded
+
+
+def validate_answers(form, answers):
+    """Check one answer set against the parsed form, fixing what can be fixed locally.
+
+    Handles option membership (with fuzzy matching), scale bounds, grid shapes,
+    date/time objects, required questions and wrong-length arrays. Raises
+    ValueError only when ``answers`` is not an array at all.
+    """
+    if not isinstance(answers, list):
+        raise ValueError("answer set is not a JSON array")
+    question_count = form.question_count
+    aligned, fixed = _align(form, answers)
+    if len(aligned) > question_count:
+        aligned = aligned[:question_count]
+        fixed += 1
+
+    result = []
+    problems = {}
+    for index, (section, question) in enumerate(form.iter_questions()):
+        value = aligned[index] if index < len(aligned) else None
+        try:
+            checked = check_answer(section, question, value)
+        except ValueError as e:
+            problems[index] = str(e) if index < len(aligned) else "missing answer"
+            checked = value
+        else:
+            # A change of type only (the schema's integer 7 becoming the option "7") is not a fix
+            if index < len(aligned) and _canonical(checked) != _canonical(value):
+                fixed += 1
+        result.append(checked)
+    return ValidationResult(result, problems, fixed)
+
+
+def repair_prompt(form, answers, problems):
+    """Prompt parts asking the model to re-answer only the questions in ``problems``."""
+    questions = list(form.iter_questions())
+    parts = list(REPAIR_INSTRUCTIONS)
+    for index in sorted(problems):
+        section, question = questions[index]
+        previous = json.dumps(answers[index], ensure_ascii=False)
+        parts.append(f"#{index}\n{question_to_string(section, question)}\n原本的回答:{previous}（{problems[index]}）")
+    return parts
+
+
+def repair_answers(form, result, ask, attempts=1):
+    """Re-ask the model about the failing answers of ``result``, up to ``attempts`` times.
+
+    ``ask`` takes prompt parts and returns the parsed JSON reply; replies that
+    are not an object of ``{"index": answer}`` are ignored.
+    """
+    repaired = result.repaired
+    for _ in range(attempts):
+        if not result.problems:
+            break
+        reply = ask(repair_prompt(form, result.answers, result.problems))
+        if not isinstance(reply, dict):
+            continue
+        answers = list(result.answers)
+        for key, value in reply.items():
+            try:
+                index = int(str(key).lstrip('#'))
+            except ValueError:
+                continue
+            if index in result.problems:
+                answers[index] = value
+        checked = validate_answers(form, answers)
+        repaired += len(result.problems) - len(checked.problems)
+        result = ValidationResult(checked.answers, checked.problems, result.fixed, repaired)
+    return result
+
+
+def describe_problems(problems):
+    return "; ".join(f"#{index}: {reason}" for index, reason in sorted(problems.items()))
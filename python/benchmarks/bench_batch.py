@@ -0,0 +1,112 @@
+"""End-to-end throughput of ai_batch_form.py against the local mock Gemini server.
+
+Starts benchmarks/mock_gemini.py in-process, then runs ai_batch_form.py as a
+subprocess for each fixture / batch / --per-call / --concurrency setting and
+reads the --metrics summary of each run: throughput, API and per-call
+latency percentiles, retries, yield (valid responses / requested) and the
+reply text the mock actually produced (less when --stream cancels replies).
+Needs the google-genai package (to point the client at the mock); no API key
+or network:
+
+    python benchmarks/bench_batch.py [--latency 0.3] [--rate-429 0.05] [--malformed 0.02]
+    python benchmarks/bench_batch.py --fixtures form_200q --batch 200 --concurrency 1 8 32 --per-call 1 5
+    python benchmarks/bench_batch.py --invalid 0.2 --chunk-delay 0.02 -- --stream --repair-attempts 0
+    python benchmarks/bench_batch.py --slow 0.03 --slow-factor 10 --batch 1000 -- --hedge
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+import mock_gemini  # noqa: E402
+
+
+def run(server, fixture, batch, per_call, concurrency, extra, workdir):
+    """One ai_batch_form.py run; returns (wall seconds, metrics summary, exit code)."""
+    metrics_path = os.path.join(workdir, "metrics.jsonl")
+    command = [
+        sys.executable, os.path.join(ROOT, "ai_batch_form.py"),
+        "--form-url", f"{server.base_url}/forms/d/e/{fixture}/viewform", "--no-cache",
+        "--batch", str(batch), "--per-call", str(per_call), "--concurrency", str(concurrency),
+        # The mock has no quota; keep the limiter out of the way unless asked for
+        "--rpm", "1000000", "--tpm", "0",
+        "--output", os.path.join(workdir, "responses.jsonl"), "--metrics", metrics_path,
+    ] + extra
+    env = dict(os.environ, GOOGLE_GEMINI_BASE_URL=server.base_url, GEMINI_API_KEY="mock")
+    env.pop("GEMINI_API_KEYS", None)
+    start = time.perf_counter()
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    summary = None
+    if os.path.exists(metrics_path):
+        with open(metrics_path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("type") == "summary":
+                    summary = record
+    if summary is None:
+        sys.stderr.write(completed.stdout[-2000:] + completed.stderr[-2000:])
+    return wall, summary, completed.returncode
+
+
+def percentiles(summary, stage):
+    values = summary["stages"].get(stage)
+    if not values:
+        return "-"
+    return "/".join(f"{values[key]:.2f}" for key in ("p50", "p95", "p99"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--fixtures", nargs="+", default=["form_10q", "form_50q"])
+    parser.add_argument("--batch", nargs="+", type=int, default=[100])
+    parser.add_argument("--per-call", dest="per_call", nargs="+", type=int, default=[1, 5])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=0.2, help="Median mock latency in seconds (default: 0.2)")
+    parser.add_argument("--slow", type=float, default=0.0, help="Fraction of mock calls that are stragglers")
+    parser.add_argument("--slow-factor", dest="slow_factor", type=float, default=10.0,
+                        help="How many times longer a straggler takes (default: 10)")
+    parser.add_argument("--rate-429", dest="rate_429", type=float, default=0.0)
+    parser.add_argument("--malformed", type=float, default=0.0)
+    parser.add_argument("--invalid", type=float, default=0.0, help="Rate of replies with a blank required answer")
+    parser.add_argument("--chunk-delay", dest="chunk_delay", type=float, default=0.0,
+                        help="Mock seconds per 64 characters of output (default: 0)")
+    parser.add_argument("--retry-delay", dest="retry_delay", type=float, default=0.2)
+    parser.add_argument("extra", nargs=argparse.REMAINDER,
+                        help="Further ai_batch_form.py options after --, e.g. -- --compact --dedup-attempts 0")
+    args = parser.parse_args()
+    extra = [option for option in args.extra if option != "--"]
+
+    server = mock_gemini.start(latency=args.latency, rate_429=args.rate_429, malformed=args.malformed,
+                               retry_delay=args.retry_delay, invalid=args.invalid, chunk_delay=args.chunk_delay,
+                               slow=args.slow, slow_factor=args.slow_factor)
+    print(f"mock: latency {args.latency:g}s ({args.slow:g} of calls {args.slow_factor:g}x slower), "
+          f"429 rate {args.rate_429:g}, malformed rate {args.malformed:g}, invalid rate {args.invalid:g}, {args.chunk_delay:g}s per chunk")
+    print(f"{'fixture':<10} {'batch':>5} {'per':>4} {'conc':>4} {'wall s':>7} {'resp/s':>7} {'yield':>6} "
+          f"{'requests':>8} {'out KB':>7} {'api p50/95/99 s':>16} {'call p50/95/99 s':>17}")
+    for fixture, batch, per_call, concurrency in itertools.product(
+            args.fixtures, args.batch, args.per_call, args.concurrency):
+        with server.lock:
+            server.counts["output_chars"] = 0
+        with tempfile.TemporaryDirectory() as workdir:
+            wall, summary, code = run(server, fixture, batch, per_call, concurrency, extra, workdir)
+        if summary is None:
+            print(f"{fixture:<10} {batch:>5} {per_call:>4} {concurrency:>4}   failed (exit code {code})")
+            continue
+        print(f"{fixture:<10} {batch:>5} {per_call:>4} {concurrency:>4} {wall:>7.2f} "
+              f"{summary['responses'] / wall:>7.1f} {summary['responses'] / batch:>6.0%} {summary['requests']:>8} "
+              f"{server.counts['output_chars'] / 1024:>7.1f} "
+              f"{percentiles(summary, 'api'):>16} {percentiles(summary, 'total'):>17}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Throughput of ``--mode bulk`` around the batch job itself.
+
+Runs ``run_batch`` in-process with the local StubBulkClient (bulk_stub.py)
+on a fixture form and times the two ends that run on this machine: writing
+and submitting the request file, and reading the result file back through
+parse, validation, URL building and the output file. No API key, network
+or SDK needed:
+
+    python benchmarks/bench_bulk.py [--fixture form_50q] [--batch 10000] [--per-call 1] [--invalid 0.02]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from autoformai.batch_run import add_batch_arguments, check_batch_arguments, run_batch  # noqa: E402
+from autoformai.form import parse_form_page  # noqa: E402
+from bulk_stub import StubBulkClient  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--fixture", default="form_50q")
+    parser.add_argument("--invalid", type=float, default=0.02, help="Rate of replies with a blank required answer")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    if args.batch == 1:
+        args.batch = 10000
+    args.mode = "bulk"
+    args.poll_interval = 0.01
+    check_batch_arguments(parser, args)
+
+    with open(os.path.join(HERE, "fixtures", args.fixture + ".html"), encoding="utf-8") as f:
+        form = parse_form_page(f.read())
+    with tempfile.TemporaryDirectory() as workdir:
+        args.output_file = os.path.join(workdir, "responses.jsonl")
+        client = StubBulkClient(os.path.join(workdir, "stub"), invalid=args.invalid)
+        start = time.perf_counter()
+        result = run_batch(form, "https://docs.google.com/forms/d/e/BENCH/viewform", args,
+                           log=lambda line: None, progress=lambda error: None, bulk_client=client)
+        wall = time.perf_counter() - start
+        size = os.path.getsize(args.output_file)
+    stages = result.metrics.summary()["stages"]
+    submit = stages["submit"]["sum"]
+    ingest = wall - submit - stages["job_wait"]["sum"]
+    print(f"{args.fixture}: {args.batch} responses, {args.per_call} per request, {result.succeeded} valid "
+          f"({result.failed} failed), output {size / 1024 / 1024:.1f} MB")
+    print(f"  write + submit requests {submit:7.2f} s   (stub answers included)")
+    print(f"  fetch + parse + URLs    {ingest:7.2f} s   {result.succeeded / ingest:8.0f} responses/s")
+    print(f"  whole run               {wall:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Microbenchmark: FB_PUBLIC_LOAD_DATA_ extraction from form pages.
+
+Compares the old ``re.findall`` + ``json.loads`` approach with
+``autoformai.form.extract_load_data``. Pass saved form pages as arguments,
+otherwise synthetic pages of several sizes and the pages in fixtures/ are
+used:
+
+    python benchmarks/bench_extract.py [page.html ...]
+"""
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autoformai.form import extract_load_data
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def regex_extract(text):
+    js_constants = re.findall(r'FB_PUBLIC_LOAD_DATA_.*?=(.*?);', text)
+    return json.loads(js_constants[0]) if js_constants else None
+
+
+def synthetic_page(question_count, padding_kb, semicolons=False):
+    """A form page with ``question_count`` choice questions and ``padding_kb`` of surrounding HTML/JS."""
+    sep = ";" if semicolons else ","
+    sections = []
+    for i in range(question_count):
+        options = [[f"Option {j}: a{sep} b"] for j in range(6)]
+        sections.append([i, f"Question {i}{sep} title", None, 2, [[1000 + i, options, 1]]])
+    data = [None, ["Form description", sections], "/forms", "Synthetic form"]
+    padding = "<div class=\"x\">" + "lorem ipsum " * 80 + "</div>\n"
+    filler = padding * max(1, padding_kb * 1024 // len(padding))
+    return (
+        "<html><head><script>var _docs_flag_initialData = {};</script></head><body>"
+        + filler
+        + "<script>var FB_PUBLIC_LOAD_DATA_ = " + json.dumps(data, ensure_ascii=False) + ";</script>"
+        + filler
+        + "</body></html>"
+    )
+
+
+def bench(name, text, number):
+    regex_ok = True
+    try:
+        regex_extract(text)
+    except ValueError:
+        regex_ok = False
+    new_time = timeit.timeit(lambda: extract_load_data(text), number=number) / number
+    line = f"{name:<28} {len(text) / 1024:>8.0f} KB   extract_load_data {new_time * 1000:8.3f} ms"
+    if regex_ok:
+        old_time = timeit.timeit(lambda: regex_extract(text), number=number) / number
+        line += f"   regex {old_time * 1000:8.3f} ms   x{old_time / new_time:5.1f}"
+    else:
+        line += "   regex    FAILED (semicolon inside the data)"
+    print(line)
+
+
+def main():
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, encoding="utf-8") as f:
+                bench(os.path.basename(path), f.read(), 50)
+        return
+    for questions, padding_kb in [(10, 50), (100, 250), (500, 1000)]:
+        bench(f"synthetic {questions}q", synthetic_page(questions, padding_kb), 50)
+    bench("synthetic 100q, semicolons", synthetic_page(100, 250, semicolons=True), 50)
+    for name in sorted(os.listdir(FIXTURES)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+                bench(f"fixture {name}", f.read(), 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Form lookups through ai_form_service.py: cold, cached and concurrent.
+
+Starts benchmarks/mock_gemini.py (for the fixture pages, served with
+--page-delay seconds of latency) and a FormService on a local port, then
+times over HTTP:
+
+- a cold lookup of each fixture (download + parse),
+- repeated lookups of the same form (served from the parsed-form cache),
+- N concurrent lookups of a form nobody asked for yet (one download shared
+  by all of them).
+
+    python benchmarks/bench_form_service.py [--page-delay 0.3] [--clients 50] [--repeat 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import mock_gemini  # noqa: E402
+from autoformai.form_service import FormService, FormServiceServer  # noqa: E402
+
+
+def start_service(service):
+    """Serve ``service`` on a free port in a background thread; returns the base URL."""
+    started = threading.Event()
+    address = []
+
+    def ready(server):
+        address.append(server.sockets[0].getsockname()[:2])
+        started.set()
+
+    thread = threading.Thread(target=asyncio.run, args=(FormServiceServer(service).serve("127.0.0.1", 0, ready),),
+                              daemon=True)
+    thread.start()
+    started.wait()
+    host, port = address[0]
+    return f"http://{host}:{port}"
+
+
+def lookup(base, form_url):
+    """Seconds for one /form request and its X-Cache header."""
+    start = time.perf_counter()
+    with urllib.request.urlopen(f"{base}/form?url={urllib.parse.quote(form_url)}") as response:
+        response.read()
+        return time.perf_counter() - start, response.headers.get("X-Cache")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--fixtures", nargs="+", default=["form_10q", "form_50q", "form_200q"])
+    parser.add_argument("--page-delay", dest="page_delay", type=float, default=0.3,
+                        help="Mock seconds to serve a form page (default: 0.3)")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent lookups of one new form (default: 50)")
+    parser.add_argument("--repeat", type=int, default=200, help="Cached lookups per fixture (default: 200)")
+    args = parser.parse_args()
+
+    pages = mock_gemini.start(page_delay=args.page_delay)
+    services = [FormService(allowed_hosts=["127.0.0.1"]) for _ in range(2)]
+    base = start_service(services[0])
+
+    def form_url(fixture):
+        return f"{pages.base_url}/forms/d/e/{fixture}/viewform"
+
+    print(f"mock pages: {args.page_delay:g}s each")
+    print(f"{'fixture':<10} {'cold ms':>8} {'cached p50 ms':>14} {'cached p99 ms':>14}")
+    for fixture in args.fixtures:
+        cold, _ = lookup(base, form_url(fixture))
+        cached = sorted(lookup(base, form_url(fixture))[0] for _ in range(args.repeat))
+        p99 = cached[min(len(cached) - 1, int(len(cached) * 0.99))]
+        print(f"{fixture:<10} {cold * 1000:>8.1f} {statistics.median(cached) * 1000:>14.2f} {p99 * 1000:>14.2f}")
+
+    # A second service, so the form is not cached yet
+    base = start_service(services[1])
+    fixture = args.fixtures[-1]
+    before = pages.counts["pages"]
+    with ThreadPoolExecutor(args.clients) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(lambda _: lookup(base, form_url(fixture)), range(args.clients)))
+        wall = time.perf_counter() - start
+    sources = {source: sum(1 for _, s in results if s == source) for source in ("miss", "coalesced", "hit")}
+    print(f"{args.clients} concurrent lookups of a new {fixture}: {wall:.2f}s, "
+          f"{pages.counts['pages'] - before} page download(s), {sources}")
+    for service in services:
+        service.close()
+    pages.shutdown()
+
+
+if __name__ == "__main__":
+    main()
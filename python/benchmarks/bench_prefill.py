@@ -0,0 +1,100 @@
+"""Microbenchmark: rendering pre-filled URLs.
+
+Compares a PrefillTemplate compiled once against walking the form for
+every response and percent-encoding each value with quote(), which is what
+the pre-template f-string code needs to produce the same, valid URLs. That
+f-string code without any encoding is timed too, as a reference only: its
+URLs break on ``&``, ``#``, ``=`` and spaces.
+
+    python benchmarks/bench_prefill.py [question_count] [responses]
+"""
+import os
+import random
+import sys
+import time
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autoformai.prefill import PrefillTemplate
+from autoformai.schema import Form, Question, Section
+
+URL = "https://docs.google.com/forms/d/e/FORM_ID/viewform"
+
+
+def synthetic_form(question_count):
+    """Mixed choice, checkbox, scale, text and date questions."""
+    sections = []
+    for i in range(question_count):
+        kind = (2, 4, 5, 0, 9)[i % 5]
+        options = None
+        if kind in (2, 4):
+            options = tuple(f"選項 {j} & more" for j in range(6))
+        elif kind == 5:
+            options = tuple(str(j) for j in range(1, 11))
+        question = Question(1000 + i, 1, options, None, None, None, None)
+        sections.append(Section(f"Question {i}", kind, (question,)))
+    return Form(tuple(sections))
+
+
+def random_answers(form, rng):
+    answers = []
+    for section, question in form.iter_questions():
+        if section.type == 4:
+            answers.append(rng.sample(question.options, 2))
+        elif question.options:
+            answers.append(rng.choice(question.options))
+        elif section.type == 9:
+            answers.append({"year": 2024, "month": rng.randint(1, 12), "day": rng.randint(1, 28)})
+        else:
+            answers.append(str(rng.randint(1, 50)))
+    return answers
+
+
+def fstring_render(url, form, answers, encode=str):
+    """The pre-template walk over every question; ``encode`` is applied to each value."""
+    result_strings = []
+    for (section, question), value in zip(form.iter_questions(), answers):
+        if section.type == 9:
+            for field in ("year", "month", "day"):
+                if value.get(field):
+                    result_strings.append(f"entry.{question.entry_id}_{field}={encode(value[field])}")
+        elif value:
+            if type(value) == list:
+                for item in value:
+                    result_strings.append(f"entry.{question.entry_id}={encode(item)}")
+            else:
+                result_strings.append(f"entry.{question.entry_id}={encode(value)}")
+    return url + "?" + "&".join(result_strings)
+
+
+def quote_value(value):
+    return quote(str(value), safe="")
+
+
+def timed(label, render, rows):
+    start = time.perf_counter()
+    for answers in rows:
+        render(answers)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {len(rows) / elapsed:>12,.0f} URLs/s")
+    return elapsed
+
+
+def main():
+    question_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    responses = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    form = synthetic_form(question_count)
+    rng = random.Random(0)
+    rows = [random_answers(form, rng) for _ in range(responses)]
+
+    print(f"{question_count} questions, {responses} responses")
+    timed("f-strings, no encoding (reference, invalid)", lambda a: fstring_render(URL, form, a), rows)
+    old = timed("f-strings + quote() per value (encoded)", lambda a: fstring_render(URL, form, a, quote_value), rows)
+    template = PrefillTemplate(URL, form)
+    new = timed("PrefillTemplate.render (encoded)", template.render, rows)
+    print(f"speedup over f-strings + quote() x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
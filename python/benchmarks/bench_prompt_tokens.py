@@ -0,0 +1,62 @@
+"""Prompt size per call: verbose vs compact form encoding.
+
+Uses the local token estimate (no API key needed) on synthetic forms or on
+saved form pages; ai_batch_form.py prints the API's exact counts at start-up.
+
+    python benchmarks/bench_prompt_tokens.py [page.html ...]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autoformai.batch_run import form_prompt
+from autoformai.form import parse_form_page
+from autoformai.ratelimit import estimate_tokens
+from autoformai.schema import Form, Question, Section
+
+
+def synthetic_form(question_count):
+    """Choice, checkbox, scale, grid and text questions with wordy options."""
+    sections = []
+    for i in range(question_count):
+        kind = (2, 4, 5, 7, 0)[i % 5]
+        if kind == 7:
+            options = ("Strongly disagree", "Disagree", "Neutral", "Agree", "Strongly agree")
+            questions = tuple(
+                Question(2000 + i * 10 + row, 1, options, None, None, f"Statement {row}", 0) for row in range(4)
+            )
+        else:
+            options = None
+            low = high = None
+            if kind in (2, 4):
+                options = tuple(f"選項 {j}：一個比較長的答案" for j in range(6))
+            elif kind == 5:
+                options = tuple(str(j) for j in range(1, 11))
+                low, high = "Not at all", "Extremely"
+            questions = (Question(1000 + i, 1, options, low, high, None, None),)
+        sections.append(Section(f"Question {i} about your experience", kind, questions))
+    return Form(tuple(sections))
+
+
+def report(label, form):
+    verbose = estimate_tokens(form_prompt(form))
+    compact = estimate_tokens(form_prompt(form, compact=True))
+    print(f"{label:<30} {form.question_count:>5} answers   verbose ~{verbose:>6}   "
+          f"compact ~{compact:>6}   -{1 - compact / verbose:.0%}")
+
+
+def main():
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, encoding='utf-8') as f:
+                form = parse_form_page(f.read())
+            if form:
+                report(os.path.basename(path), form)
+    else:
+        for question_count in (10, 50, 200):
+            report(f"synthetic {question_count} questions", synthetic_form(question_count))
+
+
+if __name__ == "__main__":
+    main()
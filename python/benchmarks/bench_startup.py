@@ -0,0 +1,63 @@
+"""Cold-start time of the command line scripts.
+
+Runs each script with ``--help`` in a fresh interpreter (median wall time of
+several runs) and lists the modules that took longest to load according to
+``python -X importtime``, then times importing the Gemini SDKs alone for
+comparison. No API key or network needed:
+
+    python benchmarks/bench_startup.py [runs] [top]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = ('ai_form.py', 'ai_batch_form.py', 'ai_jobs.py', 'ai_form_service.py')
+SDK_IMPORTS = ('google.genai', 'google.generativeai')
+
+
+def wall_time(command, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def slowest_imports(command, top):
+    """``(self microseconds, module)`` of the ``top`` modules that took longest to import."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        imports.append((int(own), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    baseline = wall_time([sys.executable, '-c', 'pass'], runs)
+    print(f"{'bare interpreter':<28} {baseline * 1000:7.0f} ms")
+    for script in SCRIPTS:
+        command = [sys.executable, script, '--help']
+        print(f"{script + ' --help':<28} {wall_time(command, runs) * 1000:7.0f} ms")
+        for own, name in slowest_imports(command, top):
+            print(f"    {name:<32} {own / 1000:7.1f} ms")
+    for module in SDK_IMPORTS:
+        command = [sys.executable, '-c', f'import {module}']
+        try:
+            print(f"{'import ' + module:<28} {wall_time(command, runs) * 1000:7.0f} ms")
+        except subprocess.CalledProcessError:
+            print(f"{'import ' + module:<28}     not installed")
+
+
+if __name__ == '__main__':
+    main()
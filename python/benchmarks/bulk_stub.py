@@ -0,0 +1,65 @@
+"""Local stand-in for the Gemini Batch API, for ``--mode bulk`` without quota.
+
+``StubBulkClient`` has the submit/poll/fetch methods of
+``autoformai.bulk.GeminiBulkClient``. A submitted request file is answered
+at once with answers drawn from each request's response schema (see
+mock_gemini.py), but the job reports ``running`` until ``delay`` seconds
+after submission. Job state lives in ``directory``, so a run interrupted
+while waiting can be resumed by a new process:
+
+    from bulk_stub import StubBulkClient
+    run_batch(form, url, args, bulk_client=StubBulkClient("/tmp/bulk-stub", delay=5))
+"""
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+
+import mock_gemini
+
+
+class StubBulkClient:
+    def __init__(self, directory, delay=0.0, invalid=0.0, failed=0.0, seed=0):
+        self.directory = directory
+        self.delay = delay
+        self.invalid = invalid
+        self.failed = failed
+        self.rng = random.Random(seed)
+        self.submitted = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, name.rsplit("/", 1)[-1] + suffix)
+
+    def submit(self, request_path, display_name):
+        name = f"batches/stub-{uuid.uuid4().hex[:12]}"
+        with open(request_path, encoding="utf-8") as requests, \
+                open(self._path(name, ".results.jsonl"), "w", encoding="utf-8") as results:
+            for line in requests:
+                item = json.loads(line)
+                roll = self.rng.random()
+                if roll < self.failed:
+                    record = {"key": item["key"], "error": {"code": 500, "message": "Internal error"}}
+                else:
+                    fault = "invalid" if roll < self.failed + self.invalid else None
+                    reply = mock_gemini.reply_text(item["request"], fault, self.rng.getrandbits(32))
+                    record = {"key": item["key"], "response": {
+                        "candidates": [{"content": {"role": "model", "parts": [{"text": reply}]},
+                                        "finishReason": "STOP"}],
+                        "usageMetadata": mock_gemini.usage_metadata(line, item["request"], reply),
+                    }}
+                results.write(json.dumps(record, ensure_ascii=False) + "\n")
+        with open(self._path(name, ".json"), "w", encoding="utf-8") as f:
+            json.dump({"display_name": display_name, "ready_at": time.time() + self.delay}, f)
+        self.submitted += 1
+        return name
+
+    def poll(self, name):
+        with open(self._path(name, ".json"), encoding="utf-8") as f:
+            job = json.load(f)
+        return ("succeeded" if time.time() >= job["ready_at"] else "running"), None
+
+    def fetch(self, name, destination):
+        shutil.copyfile(self._path(name, ".results.jsonl"), destination)
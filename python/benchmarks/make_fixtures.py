@@ -0,0 +1,69 @@
+"""Regenerate the saved form pages in benchmarks/fixtures/.
+
+Each page mimics a Google Form page: an ``FB_PUBLIC_LOAD_DATA_`` constant
+with a fixed mix of question types (short answer, paragraph, choice,
+dropdown, checkboxes, scale, grid, date, time), wrapped in surrounding
+HTML/JS. The output is deterministic, so the committed files only change
+when this script does:
+
+    python benchmarks/make_fixtures.py
+"""
+import json
+import os
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (file name, questions, KB of surrounding HTML)
+SIZES = [("form_10q", 10, 40), ("form_50q", 50, 120), ("form_200q", 200, 300)]
+
+# Section types in the order they repeat
+KINDS = (0, 2, 5, 4, 1, 3, 7, 9, 2, 10)
+KIND_LABELS = {0: "short answer", 1: "paragraph", 2: "choice", 3: "dropdown", 4: "checkboxes",
+               5: "scale", 7: "grid", 9: "date", 10: "time"}
+
+
+def section(number, kind):
+    entry = 100000 + number * 10
+    title = f"Question {number + 1}: {KIND_LABELS[kind]}; please answer"
+    required = 0 if number % 3 == 2 else 1
+    if kind in (0, 1, 9, 10):
+        questions = [[entry, None, required]]
+    elif kind in (2, 3, 4):
+        options = [[f"Option {j} & more; {'選項' if j % 2 else 'choice'}"] for j in range(5)]
+        questions = [[entry, options, required]]
+    elif kind == 5:
+        questions = [[entry, [[str(j)] for j in range(1, 11)], required, ["Not at all", "Very much"]]]
+    else:
+        columns = [["Never"], ["Sometimes"], ["Often"], ["Always"]]
+        questions = [
+            [entry + row, columns, required, [f"Row {row + 1}"], None, None, None, None, None, None, None, [0]]
+            for row in range(3)
+        ]
+    return [number, title, "Helper text for this question", kind, questions]
+
+
+def page(question_count, padding_kb):
+    sections = [section(i, KINDS[i % len(KINDS)]) for i in range(question_count)]
+    data = [None, ["Benchmark form description", sections], "/forms", f"Benchmark form ({question_count} questions)"]
+    padding = '<div class="freebirdFormviewerViewItemsItemItem">' + "lorem ipsum dolor sit amet " * 30 + "</div>\n"
+    filler = padding * max(1, padding_kb * 1024 // 2 // len(padding))
+    return (
+        "<!DOCTYPE html><html><head><script>var _docs_flag_initialData = {\"docs-offline\": false};</script></head>"
+        "<body>\n" + filler
+        + "<script type=\"text/javascript\" nonce=\"x\">var FB_PUBLIC_LOAD_DATA_ = "
+        + json.dumps(data, ensure_ascii=False) + "\n;</script>\n"
+        + filler + "</body></html>\n"
+    )
+
+
+def main():
+    os.makedirs(FIXTURES, exist_ok=True)
+    for name, questions, padding_kb in SIZES:
+        path = os.path.join(FIXTURES, name + ".html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(page(questions, padding_kb))
+        print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Local stand-in for the Gemini API and Google Forms, for offline benchmarks.
+
+Serves the saved pages in benchmarks/fixtures/ at
+``/forms/d/e/<fixture>/viewform`` and answers ``generateContent``,
+``streamGenerateContent`` (server-sent events), ``countTokens`` and
+``cachedContents`` the way the google-genai client expects. Replies are
+random answers drawn from the request's response schema, so every form
+works without configuration; repair re-asks, which carry no schema, get an
+answer for each question they list (other runs with ``--no-schema`` get an
+empty answer list). Latency, stragglers (a fraction of calls taking several times as
+long), output speed, 429 rate, malformed reply rate and the rate
+of replies whose first answer is left blank are configurable:
+
+    python benchmarks/mock_gemini.py --port 8700 --latency 0.5 --rate-429 0.05 --malformed 0.02
+    GOOGLE_GEMINI_BASE_URL=http://127.0.0.1:8700 GEMINI_API_KEY=mock \\
+        python ai_batch_form.py --form-url http://127.0.0.1:8700/forms/d/e/form_50q/viewform --no-cache
+
+Pointing the client at the mock needs the google-genai package (the legacy
+SDK has no base URL setting).
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+WORDS = ("often", "never", "twice a week", "about 20", "it depends", "mostly online", "3", "15", "no opinion")
+
+_form_path = re.compile(r"/forms/d/(?:e/)?([\w-]+)/viewform")
+# One question of a repair re-ask (validate.repair_prompt): "#N", then question_to_string()
+_repair_question = re.compile(r"#(\d+)\n問題:.*?\n類型:(\S+)\n(.*?)(?=\n#\d+\n問題:|\Z)", re.S)
+_repair_options = re.compile(r"選項:(\[.*?\])$", re.M)
+
+
+def _field(schema, snake, default=None):
+    """Schema keys arrive camelCased from the client, snake_cased from other callers."""
+    parts = snake.split("_")
+    camel = parts[0] + "".join(part.title() for part in parts[1:])
+    return schema.get(camel, schema.get(snake, default))
+
+
+def sample(schema, rng):
+    """A random value that satisfies ``schema`` (the subset form_response_schema produces)."""
+    kind = str(schema.get("type", "STRING")).upper()
+    if schema.get("enum"):
+        return rng.choice(schema["enum"])
+    if kind == "OBJECT":
+        value = {key: sample(sub, rng) for key, sub in schema.get("properties", {}).items()}
+        if "day" in value:
+            value["day"] = min(value["day"], 28)
+        return value
+    if kind == "ARRAY":
+        items = schema.get("items", {})
+        low = int(_field(schema, "min_items", 0))
+        high = int(_field(schema, "max_items", max(low, 3)))
+        if items.get("enum"):
+            return rng.sample(items["enum"], rng.randint(min(low, len(items["enum"])), min(high, len(items["enum"]))))
+        return [sample(items, rng) for _ in range(rng.randint(low, high))]
+    if kind in ("INTEGER", "NUMBER"):
+        return rng.randint(int(schema.get("minimum", 0)), int(schema.get("maximum", 10)))
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    return rng.choice(WORDS)
+
+
+class MockGemini(ThreadingHTTPServer):
+    """The mock server; counters are read by the benchmarks after a run."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.5, rate_429=0.0, malformed=0.0, retry_delay=1.0, seed=0,
+                 invalid=0.0, chunk_chars=64, chunk_delay=0.0, page_delay=0.0, slow=0.0, slow_factor=10.0):
+        super().__init__(address, MockHandler)
+        self.latency = latency
+        self.jitter = jitter
+        # Stragglers: a fraction ``slow`` of calls takes slow_factor times as long
+        self.slow = slow
+        self.slow_factor = slow_factor
+        self.rate_429 = rate_429
+        self.malformed = malformed
+        self.invalid = invalid
+        self.retry_delay = retry_delay
+        # Output speed: chunk_delay seconds per chunk_chars characters, streamed or not
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.page_delay = page_delay
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"generate": 0, "rate_limited": 0, "malformed": 0, "invalid": 0, "pages": 0,
+                       "output_chars": 0, "cancelled": 0, "slow": 0}
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def draw(self):
+        """Latency and fault for one generate call: ``(seconds, None | '429' | 'malformed' | 'invalid', rng seed)``."""
+        with self.lock:
+            self.counts["generate"] += 1
+            delay = self.latency * self.rng.lognormvariate(0, self.jitter) if self.latency else 0.0
+            if self.rng.random() < self.slow:
+                self.counts["slow"] += 1
+                delay *= self.slow_factor
+            roll = self.rng.random()
+            fault = None
+            if roll < self.rate_429:
+                fault = "429"
+            elif roll < self.rate_429 + self.malformed:
+                fault = "malformed"
+            elif roll < self.rate_429 + self.malformed + self.invalid:
+                fault = "invalid"
+            if fault is not None:
+                self.counts["rate_limited" if fault == "429" else fault] += 1
+            return delay, fault, self.rng.getrandbits(32)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def handle_error(self, request, client_address):
+        # Clients that cancel a reply (--stream, --hedge) may reset idle connections
+        if not isinstance(sys.exc_info()[1], ConnectionResetError):
+            super().handle_error(request, client_address)
+
+
+def repair_answers(request, rng):
+    """``{"N": answer}`` for the questions of a repair re-ask, or None when the request is not one."""
+    text = "\n".join(part.get("text", "") for content in request.get("contents", [])
+                     for part in content.get("parts", []) if isinstance(part, dict))
+    answers = {}
+    for number, kind, details in _repair_question.findall(text):
+        match = _repair_options.search(details)
+        options = ast.literal_eval(match.group(1)) if match else []
+        if kind == "日期":
+            answers[number] = {"year": rng.randint(1990, 2030), "month": rng.randint(1, 12), "day": rng.randint(1, 28)}
+        elif kind == "時間":
+            answers[number] = {"hour": rng.randint(0, 23), "minute": rng.randint(0, 59)}
+        elif options and (kind == "核取方塊" or "核取方格" in details):
+            answers[number] = [rng.choice(options)]
+        else:
+            answers[number] = rng.choice(options) if options else rng.choice(WORDS)
+    return answers or None
+
+
+def reply_text(request, fault, seed):
+    """The reply of one generate call, with ``fault`` applied."""
+    schema = (request.get("generationConfig") or {}).get("responseSchema")
+    if schema:
+        answers = sample(schema, random.Random(seed))
+    else:
+        # Repair re-asks carry no schema; answer the questions they list
+        answers = repair_answers(request, random.Random(seed)) or []
+    if fault == "invalid":
+        # A required answer left blank cannot be fixed locally
+        if isinstance(answers, dict) and answers:
+            answers[next(iter(answers))] = ""
+        elif answers and isinstance(answers[0], dict):
+            answers[0][next(iter(answers[0]))] = ""
+        elif answers:
+            answers[0] = ""
+    reply = json.dumps(answers, ensure_ascii=False)
+    if fault == "malformed":
+        reply = reply[:max(1, len(reply) // 2)]
+    return reply
+
+
+def usage_metadata(request_text, request, reply):
+    cached = 256 if request.get("cachedContent") else 0
+    return {"promptTokenCount": len(request_text) // 4 + cached, "cachedContentTokenCount": cached,
+            "candidatesTokenCount": len(reply) // 4}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200, content_type="application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        match = _form_path.search(self.path)
+        path = os.path.join(FIXTURES, match.group(1) + ".html") if match else None
+        if path is None or not os.path.exists(path):
+            return self._send("not found", 404, "text/plain")
+        time.sleep(self.server.page_delay)
+        with self.server.lock:
+            self.server.counts["pages"] += 1
+        with open(path, encoding="utf-8") as f:
+            self._send(f.read(), content_type="text/html; charset=utf-8")
+
+    def do_DELETE(self):
+        self._send({})
+
+    def do_POST(self):
+        text = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        request = json.loads(text or "{}")
+        if self.path.endswith(":countTokens"):
+            return self._send({"totalTokens": len(text) // 4})
+        if "cachedContents" in self.path:
+            return self._send({"name": f"cachedContents/mock{abs(hash(text)) % 10 ** 8}", "model": request.get("model")})
+        streaming = ":streamGenerateContent" in self.path
+        if ":generateContent" not in self.path and not streaming:
+            return self._send({"error": {"code": 404, "message": "unknown method", "status": "NOT_FOUND"}}, 404)
+
+        delay, fault, seed = self.server.draw()
+        time.sleep(delay)
+        if fault == "429":
+            return self._send({"error": {
+                "code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                             "retryDelay": f"{self.server.retry_delay:g}s"}],
+            }}, 429)
+        reply = reply_text(request, fault, seed)
+        size = self.server.chunk_chars
+        chunks = [reply[i:i + size] for i in range(0, len(reply), size)] or [""]
+        if streaming:
+            return self._stream(text, request, chunks)
+        time.sleep(self.server.chunk_delay * len(chunks))
+        self.server.count("output_chars", len(reply))
+        self._send({
+            "candidates": [{"content": {"role": "model", "parts": [{"text": reply}]}, "finishReason": "STOP"}],
+            "usageMetadata": usage_metadata(text, request, reply),
+        })
+
+    def _stream(self, request_text, request, chunks):
+        """Send ``chunks`` as server-sent events, one every ``chunk_delay`` seconds, until the client hangs up."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = ""
+        try:
+            for number, chunk in enumerate(chunks):
+                if number:
+                    time.sleep(self.server.chunk_delay)
+                sent += chunk
+                event = {"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]}}],
+                         "usageMetadata": usage_metadata(request_text, request, sent)}
+                if number == len(chunks) - 1:
+                    event["candidates"][0]["finishReason"] = "STOP"
+                data = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+                self.server.count("output_chars", len(chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count("cancelled")
+            self.close_connection = True
+
+
+def start(port=0, **options):
+    """Start a MockGemini on a background thread and return it (``port=0`` picks a free port)."""
+    server = MockGemini(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Gemini API and form pages for offline benchmarks")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=0.0, help="Median seconds per generate call (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Log-normal sigma of the latency (default: 0.5)")
+    parser.add_argument("--slow", type=float, default=0.0,
+                        help="Fraction of generate calls that are stragglers (default: 0)")
+    parser.add_argument("--slow-factor", dest="slow_factor", type=float, default=10.0,
+                        help="How many times longer a straggler takes (default: 10)")
+    parser.add_argument("--rate-429", dest="rate_429", type=float, default=0.0,
+                        help="Fraction of generate calls answered with 429 RESOURCE_EXHAUSTED (default: 0)")
+    parser.add_argument("--malformed", type=float, default=0.0,
+                        help="Fraction of replies cut off mid-JSON (default: 0)")
+    parser.add_argument("--invalid", type=float, default=0.0,
+                        help="Fraction of replies whose first answer is left blank (default: 0)")
+    parser.add_argument("--chunk-chars", dest="chunk_chars", type=int, default=64,
+                        help="Characters per streamed chunk (default: 64)")
+    parser.add_argument("--chunk-delay", dest="chunk_delay", type=float, default=0.0,
+                        help="Seconds to produce each chunk, streamed or not (default: 0)")
+    parser.add_argument("--retry-delay", dest="retry_delay", type=float, default=1.0,
+                        help="RetryInfo delay sent with 429s, in seconds (default: 1)")
+    parser.add_argument("--page-delay", dest="page_delay", type=float, default=0.0,
+                        help="Seconds to serve each form page (default: 0)")
+    args = parser.parse_args()
+    server = MockGemini(("127.0.0.1", args.port), args.latency, args.jitter, args.rate_429, args.malformed,
+                        args.retry_delay, invalid=args.invalid, chunk_chars=args.chunk_chars,
+                        chunk_delay=args.chunk_delay, page_delay=args.page_delay, slow=args.slow,
+                        slow_factor=args.slow_factor)
+    print(f"Mock Gemini API on {server.base_url} (forms at /forms/d/e/<fixture>/viewform)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
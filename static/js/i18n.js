@@ -56,6 +56,7 @@ const i18n = {
         'proxyError': '代理返回錯誤狀態碼: {0}',
         'proxyFailed': '代理 {0} 失敗: {1}',
         'proxyException': '代理 {0} 發生錯誤: {1}',
+        'formServiceFailed': '表單服務 {0} 失敗，改用其他方式: {1}',
 
         // API 錯誤訊息
         'apiRequestFail': 'API 請求失敗: {0}',
@@ -270,6 +271,7 @@ const i18n = {
         'proxyError': 'Proxy returned error status code: {0}',
         'proxyFailed': 'Proxy {0} failed: {1}',
         'proxyException': 'Error occurred with proxy {0}: {1}',
+        'formServiceFailed': 'Form service {0} failed, trying other methods: {1}',
 
         'faq5_q': 'Can I save form settings?',
         'faq5_a': 'Currently, saving settings is not supported. Each time you use the tool, you need to enter the information again. We plan to add a feature to save settings in future versions.',
@@ -285,6 +285,23 @@ document.addEventListener('DOMContentLoaded', function () {
      */
     async function getGoogleFormFromUrl(url) {
         try {
+            // 有設定本地表單服務 (python/ai_form_service.py) 時優先使用，它已解析好表單並有快取
+            const serviceUrl = getFormServiceUrl();
+            if (serviceUrl) {
+                try {
+                    const serviceResponse = await fetch(`${serviceUrl}/form?url=${encodeURIComponent(url)}`, {
+                        credentials: 'omit'
+                    });
+                    if (serviceResponse.ok) {
+                        return await serviceResponse.json();
+                    }
+                    const errorData = await serviceResponse.json().catch(() => ({}));
+                    console.warn(i18n.getText('formServiceFailed', [serviceUrl, errorData.error || serviceResponse.status]));
+                } catch (serviceError) {
+                    console.warn(i18n.getText('formServiceFailed', [serviceUrl, serviceError.message]));
+                }
+            }
+
             // 使用瀏覽器原生 fetch 先嘗試，這在本地開發時可能不起作用但值得一試
             try {
                 const directResponse = await fetch(url, {
@@ -367,6 +384,22 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    /**
+     * 取得本地表單服務的網址
+     * 來源依序為 <meta name="form-service-url">、localStorage.formServiceUrl；都沒有則不使用
+     * @returns {string} - 服務網址（不含結尾的 /），未設定時為空字串
+     */
+    function getFormServiceUrl() {
+        const meta = document.querySelector('meta[name="form-service-url"]');
+        let serviceUrl = (meta && meta.content) || '';
+        try {
+            serviceUrl = serviceUrl || localStorage.getItem('formServiceUrl') || '';
+        } catch (storageError) {
+            // 瀏覽器禁用 localStorage 時忽略
+        }
+        return serviceUrl.trim().replace(/\/+$/, '');
+    }
+
     /**
      * 解析 Google Form HTML
      * @param {string} html - 表單 HTML 文本